@@ -0,0 +1,108 @@
+"""
+Cached einsum contractions
+
+The subscripts of the recurring contractions (traces, partial traces,
+reduced density matrices, mixing and gate application) depend only on
+the number of modes and the modes involved, so they are built once and
+memoised. The contraction order (np.einsum_path) additionally depends on
+the operand shapes (i.e. the cutoff) and is memoised per
+(subscripts, shapes).
+
+Subscripts use the integer sublist form of np.einsum, a subscript is a
+tuple (input sublists, output sublist). Unlike the letter form, it is not
+limited to 26 labels (13 density matrix modes). NumPy accepts 52 labels
+in the sublist form, which is more than any density matrix that fits in
+memory needs.
+"""
+
+import functools
+
+import numpy as np
+
+
+def _interleave(subscripts, operands):
+    inputs, output = subscripts
+    args = []
+    for operand, sublist in zip(operands, inputs):
+        args += [operand, list(sublist)]
+    return args + [list(output)]
+
+
+@functools.lru_cache(maxsize=None)
+def einsum_path(subscripts, shapes):
+    """
+    Returns the optimal contraction path for the operands of given shapes
+    """
+    # Zero-strided views, so that no memory is allocated for planning
+    operands = [np.broadcast_to(np.zeros((), dtype=np.complex128), s) for s in shapes]
+    return np.einsum_path(*_interleave(subscripts, operands), optimize="optimal")[0]
+
+
+def einsum(subscripts, *operands):
+    """
+    np.einsum with the memoised contraction path
+    """
+    path = einsum_path(subscripts, tuple(np.shape(op) for op in operands))
+    return np.einsum(*_interleave(subscripts, operands), optimize=path)
+
+
+@functools.lru_cache(maxsize=None)
+def trace_subscripts(num_modes):
+    """
+    Full trace of the density matrix with interleaved (ket, bra) indices
+    """
+    return ((tuple(i for i in range(num_modes) for _ in (0, 1)),), ())
+
+
+@functools.lru_cache(maxsize=None)
+def partial_trace_subscripts(num_modes, traced_modes):
+    """
+    Traces out the traced_modes, the rest keeps the interleaved indices
+    """
+    in_list = []
+    out_list = []
+    for i in range(num_modes):
+        if i in traced_modes:
+            in_list += [2 * i, 2 * i]
+        else:
+            in_list += [2 * i, 2 * i + 1]
+            out_list += [2 * i, 2 * i + 1]
+    return ((tuple(in_list),), tuple(out_list))
+
+
+@functools.lru_cache(maxsize=None)
+def reduced_dm_subscripts(num_modes, kept_modes):
+    """
+    Reduced density matrix of the kept_modes (ordered by the mode index)
+    """
+    traced_modes = tuple(m for m in range(num_modes) if m not in kept_modes)
+    return partial_trace_subscripts(num_modes, traced_modes)
+
+
+@functools.lru_cache(maxsize=None)
+def mix_subscripts(num_modes):
+    """
+    Outer product of the ket with its conjugate into the density matrix
+    """
+    left = tuple(range(0, 2 * num_modes, 2))
+    right = tuple(range(1, 2 * num_modes, 2))
+    return ((left, right), tuple(range(2 * num_modes)))
+
+
+@functools.lru_cache(maxsize=None)
+def gate_subscripts(num_modes, modes):
+    """
+    Application of the gate with (out1, in1, ...) indices to the
+    density matrix, U rho U^dagger
+    """
+    in_list = list(range(2 * num_modes))
+    out_list = list(in_list)
+    # New labels for the output indices of the gate modes
+    label = 2 * num_modes
+    for m in modes:
+        out_list[2 * m] = label
+        out_list[2 * m + 1] = label + 1
+        label += 2
+    left = [k for m in modes for k in (out_list[2 * m], in_list[2 * m])]
+    right = [k for m in modes for k in (out_list[2 * m + 1], in_list[2 * m + 1])]
+    return ((tuple(left), tuple(in_list), tuple(right)), tuple(out_list))
@@ -17,4 +17,16 @@ from .ops import (
     apply_channel,
     apply_gate_einsum,
     tensor,
+    beamsplitter_batch,
+    displacement_batch,
+    squeezing_batch,
+    phase_batch,
+)
+from .operator_cache import (
+    operator_cache,
+    cached_beamsplitter,
+    cached_displacement,
+    cached_squeezing,
+    cached_phase,
+    cached_kerr,
 )
@@ -0,0 +1,157 @@
+"""
+Multithreaded gate kernels
+
+Numba kernels, which apply one and two mode gates to the ket or the
+density matrix in place. The state is viewed as a stack of vectors along
+the gate axes, the stack (spectator indices) is distributed over the
+threads with prange and the kernels release the GIL. The number of
+threads is set with set_num_threads. Gates are passed as compressed
+sparse rows, so that only the nonzero elements are visited (passive
+gates conserve the photon number and are mostly zero).
+
+Gates use the (out1, in1, out2, in2) index layout. Modes may have
+different truncations, the dimensions are taken from the state.
+"""
+
+import numba
+import numpy as np
+from numba import njit, prange
+
+# Independent parts of the simulation are executed in forked processes,
+# the TBB pool doesn't survive the fork (the parent hangs at exit), so
+# OpenMP is preferred. NUMBA_THREADING_LAYER still takes precedence.
+numba.config.THREADING_LAYER_PRIORITY = ["omp", "tbb", "workqueue"]
+
+
+def set_num_threads(num_threads=None):
+    """
+    Sets the number of threads used by the kernels, None uses all of
+    the available cores
+    """
+    if num_threads is None:
+        num_threads = numba.config.NUMBA_NUM_THREADS
+    numba.set_num_threads(num_threads)
+
+
+def get_num_threads():
+    return numba.get_num_threads()
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def _apply_axis(state, chunks, indptr, indices, data):
+    """
+    state has the shape (outer, d, inner), the (CSR) matrix is applied
+    along the middle axis
+    """
+    outer, d, inner = state.shape
+    for chunk in prange(chunks):
+        tmp = np.empty((d, inner), dtype=state.dtype)
+        for o in range(chunk * outer // chunks, (chunk + 1) * outer // chunks):
+            tmp[:] = state[o]
+            for a in range(d):
+                for i in range(inner):
+                    state[o, a, i] = 0
+                for k in range(indptr[a], indptr[a + 1]):
+                    b = indices[k]
+                    for i in range(inner):
+                        state[o, a, i] += data[k] * tmp[b, i]
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def _apply_two_axes(state, chunks, indptr, indices, data):
+    """
+    state has the shape (outer, d1, middle, d2, inner), the (CSR) matrix
+    with the (out1 out2, in1 in2) rows and columns is applied along the
+    axes d1 and d2
+    """
+    outer, d1, middle, d2, inner = state.shape
+    total = outer * middle
+    for chunk in prange(chunks):
+        tmp = np.empty((d1 * d2, inner), dtype=state.dtype)
+        for j in range(chunk * total // chunks, (chunk + 1) * total // chunks):
+            o = j // middle
+            m = j % middle
+            for a in range(d1):
+                for b in range(d2):
+                    tmp[a * d2 + b] = state[o, a, m, b]
+            for a in range(d1):
+                for b in range(d2):
+                    row = a * d2 + b
+                    for i in range(inner):
+                        state[o, a, m, b, i] = 0
+                    for k in range(indptr[row], indptr[row + 1]):
+                        c = indices[k]
+                        for i in range(inner):
+                            state[o, a, m, b, i] += data[k] * tmp[c, i]
+
+
+def _chunks(total):
+    """
+    Splits the stack into a few chunks per thread, so that the scratch
+    buffers are allocated once per chunk
+    """
+    return max(1, min(total, 4 * numba.get_num_threads()))
+
+
+def _sparse(matrix):
+    """
+    Compressed sparse rows of the gate, gates are often sparse
+    (e.g. the photon number conserving beam splitter)
+    """
+    rows, cols = np.nonzero(matrix)
+    indptr = np.searchsorted(rows, np.arange(matrix.shape[0] + 1))
+    return indptr, cols, np.ascontiguousarray(matrix[rows, cols])
+
+
+def _apply(state, mat, axes):
+    """
+    Applies the gate with the (out1, in1, ...) indices along the axes
+    of the contiguous state, in place
+    """
+    shape = state.shape
+    mat = np.asarray(mat, dtype=state.dtype)
+    if len(axes) == 1:
+        (axis,) = axes
+        view = state.reshape(
+            int(np.prod(shape[:axis])), shape[axis], int(np.prod(shape[axis + 1:]))
+        )
+        _apply_axis(view, _chunks(view.shape[0]), *_sparse(mat))
+        return
+    first, second = axes
+    if first > second:
+        mat = mat.transpose((2, 3, 0, 1))
+        first, second = second, first
+    d1, d2 = shape[first], shape[second]
+    matrix = mat.transpose((0, 2, 1, 3)).reshape(d1 * d2, d1 * d2)
+    view = state.reshape(
+        int(np.prod(shape[:first])),
+        d1,
+        int(np.prod(shape[first + 1:second])),
+        d2,
+        int(np.prod(shape[second + 1:])),
+    )
+    _apply_two_axes(
+        view, _chunks(view.shape[0] * view.shape[2]), *_sparse(matrix)
+    )
+
+
+def apply_gate_ket(mat, state, modes, n):
+    """
+    Applies the one or two mode gate to the ket in place
+    """
+    # pylint: disable=unused-argument
+    state = np.ascontiguousarray(state)
+    _apply(state, mat, list(modes))
+    return state
+
+
+def apply_gate_dm(mat, state, modes, n):
+    """
+    Applies the one or two mode gate to the density matrix with the
+    interleaved (ket, bra) indices in place, U rho U^dagger
+    """
+    # pylint: disable=unused-argument
+    state = np.ascontiguousarray(state)
+    _apply(state, mat, [2 * m for m in modes])
+    _apply(state, np.conj(mat), [2 * m + 1 for m in modes])
+    return state
@@ -0,0 +1,254 @@
+"""
+Matrix product states
+
+Pure state of a chain of Fock modes stored as a tensor train, every site
+holds the tensor A[left bond, photon number, right bond]. The state is kept
+in the mixed canonical form around the orthogonality center, so that the
+SVD truncation after a gate is optimal and local observables only need the
+center tensor.
+
+Gates acting on several modes first bring the modes next to each other
+with a swap network, the modes stay where the swaps left them (the chain
+order is tracked), so that repeated interactions of the same modes don't
+pay for the swaps again. After every multi-site operation the bonds are
+truncated to the maximal bond dimension and the error budget, the
+discarded weight is accumulated.
+
+Traced out modes stay in the chain as the purification of the remaining
+modes, projected modes are contracted into their neighbour. The norm is
+not restored after truncations and projections, observables are
+normalized when they are read.
+
+Gates use the (out1, in1, out2, in2, ...) index layout.
+"""
+
+import numpy as np
+
+from quasi._math.states import FockState
+
+
+class MPS:
+    """
+    Matrix product state with the bond truncation
+    """
+
+    def __init__(self, num_modes, cutoff, max_bond=None, tolerance=0.0):
+        self.cutoff = cutoff
+        self.max_bond = max_bond
+        self.tolerance = tolerance
+        vacuum = np.zeros((1, cutoff, 1), dtype=np.complex128)
+        vacuum[0, 0, 0] = 1.0
+        self.tensors = [vacuum.copy() for _ in range(num_modes)]
+        # Mode label at every chain position, None for the traced out modes
+        self.sites = list(range(num_modes))
+        # Labels of the live modes, ordered by the mode index
+        self.modes = list(range(num_modes))
+        self.center = 0
+        self.discarded_weight = 0.0
+
+    @property
+    def num_modes(self):
+        return len(self.modes)
+
+    def position(self, mode):
+        """
+        Chain position of the mode (given by its index)
+        """
+        return self.sites.index(self.modes[mode])
+
+    def bond_dimensions(self):
+        return [t.shape[2] for t in self.tensors[:-1]]
+
+    def _move_center(self, target):
+        """
+        Moves the orthogonality center with QR decompositions
+        """
+        while self.center < target:
+            c = self.center
+            l, d, r = self.tensors[c].shape
+            q, rest = np.linalg.qr(self.tensors[c].reshape(l * d, r))
+            self.tensors[c] = q.reshape(l, d, -1)
+            self.tensors[c + 1] = np.tensordot(rest, self.tensors[c + 1], axes=(1, 0))
+            self.center += 1
+        while self.center > target:
+            c = self.center
+            l, d, r = self.tensors[c].shape
+            q, rest = np.linalg.qr(self.tensors[c].reshape(l, d * r).T)
+            self.tensors[c] = q.T.reshape(-1, d, r)
+            self.tensors[c - 1] = np.tensordot(
+                self.tensors[c - 1], rest.T, axes=(2, 0)
+            )
+            self.center -= 1
+
+    def _bond(self, s):
+        """
+        Number of the singular values kept, the smallest bond which
+        discards at most the tolerance (relative weight) and fits into
+        the maximal bond dimension
+        """
+        weights = s**2
+        total = weights.sum()
+        if total == 0:
+            return 1
+        tail = np.cumsum(weights[::-1])[::-1] / total
+        chi = max(1, int(np.sum(tail > self.tolerance)))
+        if self.max_bond is not None:
+            chi = min(chi, self.max_bond)
+        if chi < len(s):
+            self.discarded_weight += float(tail[chi])
+        return chi
+
+    def _split(self, theta, start):
+        """
+        Splits the block tensor (left, d1, ..., dk, right) back into the
+        sites start, ..., start + k - 1 with truncated SVDs, the center
+        ends on the last site
+        """
+        size = theta.ndim - 2
+        for j in range(size - 1):
+            l, d = theta.shape[:2]
+            u, s, vh = np.linalg.svd(theta.reshape(l * d, -1), full_matrices=False)
+            chi = self._bond(s)
+            self.tensors[start + j] = u[:, :chi].reshape(l, d, chi)
+            theta = (s[:chi, None] * vh[:chi]).reshape((chi,) + theta.shape[2:])
+        self.tensors[start + size - 1] = theta
+        self.center = start + size - 1
+
+    def _block(self, start, size):
+        """
+        Contracts the neighbouring sites into the block tensor
+        """
+        theta = self.tensors[start]
+        for j in range(1, size):
+            theta = np.tensordot(theta, self.tensors[start + j], axes=(-1, 0))
+        return theta
+
+    def _swap(self, p):
+        """
+        Swaps the sites p and p + 1
+        """
+        self._move_center(p)
+        theta = self._block(p, 2).transpose((0, 2, 1, 3))
+        self._split(theta, p)
+        self.sites[p], self.sites[p + 1] = self.sites[p + 1], self.sites[p]
+
+    def _gather(self, labels):
+        """
+        Brings the modes next to each other with swaps, returns the first
+        position of the block and the labels in the chain order
+        """
+        ordered = sorted(labels, key=self.sites.index)
+        start = self.sites.index(ordered[0])
+        for j, label in enumerate(ordered[1:], start=1):
+            p = self.sites.index(label)
+            while p > start + j:
+                self._swap(p - 1)
+                p -= 1
+        return start, ordered
+
+    def apply_gate(self, operator, modes):
+        """
+        Applies the gate with (out1, in1, ...) indices to the modes
+        """
+        if isinstance(modes, int):
+            modes = [modes]
+        labels = [self.modes[m] for m in modes]
+        size = len(labels)
+        if size == 1:
+            p = self.sites.index(labels[0])
+            self._move_center(p)
+            self.tensors[p] = np.einsum("ij,ajb->aib", operator, self.tensors[p])
+            return
+
+        start, ordered = self._gather(labels)
+        # Gate indices reordered to the chain order, (outs..., ins...)
+        perm = [labels.index(label) for label in ordered]
+        gate = np.transpose(
+            operator, [2 * i for i in perm] + [2 * i + 1 for i in perm]
+        )
+        self._move_center(start)
+        theta = self._block(start, size)
+        theta = np.tensordot(
+            gate, theta, axes=(list(range(size, 2 * size)), list(range(1, size + 1)))
+        )
+        # (outs..., left, right) -> (left, outs..., right)
+        theta = np.moveaxis(theta, size, 0)
+        self._split(theta, start)
+
+    def trace(self):
+        """
+        Squared norm of the state
+        """
+        if not self.tensors:
+            return 1.0
+        return float(np.sum(np.abs(self.tensors[self.center]) ** 2))
+
+    def reduced_dm(self, mode):
+        """
+        Normalized reduced density matrix of the mode
+        """
+        p = self.position(mode)
+        self._move_center(p)
+        tensor = self.tensors[p]
+        rho = np.einsum("adb,aeb->de", tensor, tensor.conj())
+        return rho / np.trace(rho).real
+
+    def fock_probs(self, mode):
+        return np.diagonal(self.reduced_dm(mode)).real
+
+    def mean_photon(self, mode):
+        probs = self.fock_probs(mode)
+        return float(np.sum(np.arange(len(probs)) * probs))
+
+    def remove_mode(self, mode, outcome=None):
+        """
+        Removes the mode, it is traced out (kept in the chain as the
+        purification) or projected onto the outcome number state
+        """
+        label = self.modes.pop(mode)
+        p = self.sites.index(label)
+        if outcome is None:
+            self.sites[p] = None
+            return
+        self._move_center(p)
+        projected = self.tensors[p][:, outcome, :]
+        del self.tensors[p]
+        del self.sites[p]
+        if p > 0:
+            self.tensors[p - 1] = np.tensordot(
+                self.tensors[p - 1], projected, axes=(2, 0)
+            )
+            self.center = p - 1
+        elif self.tensors:
+            self.tensors[0] = np.tensordot(projected, self.tensors[0], axes=(1, 0))
+
+    def to_state(self) -> FockState:
+        """
+        Contracts the chain into the (unnormalized) FockState of the live
+        modes, the state is mixed if some modes were traced out
+        """
+        theta = self._block(0, len(self.tensors))
+        theta = theta.reshape(theta.shape[1:-1])
+        order = [self.sites.index(label) for label in self.modes]
+        if all(site is not None for site in self.sites):
+            return FockState(
+                np.transpose(theta, order),
+                self.num_modes,
+                cutoff_dim=self.cutoff,
+                pure=True,
+                normalized=False,
+            )
+        traced = [p for p, site in enumerate(self.sites) if site is None]
+        rho = np.tensordot(theta, theta.conj(), axes=(traced, traced))
+        kept = [p for p in range(len(self.sites)) if p not in traced]
+        n = len(kept)
+        transpose_list = [
+            k for p in order for k in (kept.index(p), n + kept.index(p))
+        ]
+        return FockState(
+            np.transpose(rho, transpose_list),
+            self.num_modes,
+            cutoff_dim=self.cutoff,
+            pure=False,
+            normalized=False,
+        )
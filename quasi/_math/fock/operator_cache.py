@@ -0,0 +1,189 @@
+"""
+Operator cache
+
+Bounded LRU cache of the Fock gate matrices. Gates are keyed by
+(gate kind, rounded parameters, cutoff, dtype), so repeated device
+invocations, parameter sweeps and shots reuse the built operators.
+The cache can optionally be persisted on disk, the operators are stored
+as plain arrays (npz) and the keys as JSON metadata, so loading a cache
+file never unpickles anything.
+"""
+
+import json
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from quasi._math.fock import ops
+
+GATE_BUILDERS = {
+    "beamsplitter": ops.beamsplitter,
+    "displacement": ops.displacement,
+    "squeezing": ops.squeezing,
+    "phase": ops.phase,
+    "kerr": ops.kerr,
+}
+
+
+class OperatorCache:
+    """
+    Least recently used cache of gate operators
+    """
+
+    def __init__(self, maxsize=256, decimals=12, path=None):
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self.path = path
+        self.operators = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, kind, params, cutoff, dtype):
+        """
+        Builds the cache key, parameters are rounded so that numerically
+        equal parameters share the operator
+        """
+        rounded = tuple(round(float(p), self.decimals) for p in params)
+        return (kind, rounded, int(cutoff), np.dtype(dtype).str)
+
+    def get(self, kind, *params, cutoff, dtype=np.complex128):
+        """
+        Returns the (read-only) operator, building it on a miss
+        """
+        if kind not in GATE_BUILDERS:
+            raise UnknownGateException(f"Operator cache has no builder for {kind}")
+        key = self.key(kind, params, cutoff, dtype)
+        operator = self.operators.get(key)
+        if operator is not None:
+            self.hits += 1
+            self.operators.move_to_end(key)
+            return operator
+
+        self.misses += 1
+        # Operators are built in double precision, the recurrences lose
+        # accuracy in single precision
+        operator = GATE_BUILDERS[kind](*params, cutoff).astype(dtype)
+        operator.setflags(write=False)
+        self.operators[key] = operator
+        while len(self.operators) > self.maxsize:
+            self.operators.popitem(last=False)
+        return operator
+
+    def resize(self, maxsize):
+        """
+        Changes the maximal number of cached operators
+        """
+        self.maxsize = maxsize
+        while len(self.operators) > self.maxsize:
+            self.operators.popitem(last=False)
+
+    def stats(self):
+        """
+        Returns the hit/miss statistics
+        """
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.operators),
+            "maxsize": self.maxsize,
+            "hit_rate": self.hits / requests if requests else 0.0,
+        }
+
+    def clear(self):
+        """
+        Drops all of the cached operators and resets the statistics
+        """
+        self.operators.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def save(self, path=None):
+        """
+        Persists the cached operators on disk
+        """
+        path = Path(path or self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        keys = [list(key) for key in self.operators]
+        arrays = {f"op_{i}": op for i, op in enumerate(self.operators.values())}
+        # File object, so that numpy doesn't append the .npz suffix
+        with open(path, "wb") as file:
+            np.savez(file, keys=np.array(json.dumps(keys)), **arrays)
+
+    def load(self, path=None):
+        """
+        Loads the operators persisted with save, missing file is ignored.
+        Every operator has to match the shape and the dtype of its key.
+        """
+        path = Path(path or self.path)
+        if not path.exists():
+            return
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                keys = json.loads(str(data["keys"]))
+                items = [(key, data[f"op_{i}"]) for i, key in enumerate(keys)]
+        except (OSError, KeyError, TypeError, ValueError) as exc:
+            raise InvalidCacheException(f"{path} is not an operator cache") from exc
+        for key, operator in items:
+            key = self._validate(key, operator, path)
+            operator.setflags(write=False)
+            self.operators[key] = operator
+        self.resize(self.maxsize)
+
+    @staticmethod
+    def _validate(key, operator, path):
+        """
+        Checks the loaded operator against its key and returns the key
+        in the form used by the cache
+        """
+        try:
+            kind, params, cutoff, dtype = key
+            params = tuple(float(p) for p in params)
+            key = (kind, params, int(cutoff), np.dtype(dtype).str)
+        except (TypeError, ValueError) as exc:
+            raise InvalidCacheException(f"Invalid key {key} in {path}") from exc
+        if not isinstance(kind, str) or kind not in GATE_BUILDERS:
+            raise InvalidCacheException(f"Unknown gate {kind} in {path}")
+        ndim = 4 if kind == "beamsplitter" else 2
+        if operator.shape != (key[2],) * ndim or operator.dtype.str != key[3]:
+            raise InvalidCacheException(
+                f"Operator {key} in {path} has the shape {operator.shape} "
+                f"and dtype {operator.dtype}"
+            )
+        return key
+
+
+operator_cache = OperatorCache()
+
+
+def cached_beamsplitter(theta, phi, cutoff, dtype=np.complex128):
+    return operator_cache.get("beamsplitter", theta, phi, cutoff=cutoff, dtype=dtype)
+
+
+def cached_displacement(r, phi, cutoff, dtype=np.complex128):
+    return operator_cache.get("displacement", r, phi, cutoff=cutoff, dtype=dtype)
+
+
+def cached_squeezing(r, phi, cutoff, dtype=np.complex128):
+    return operator_cache.get("squeezing", r, phi, cutoff=cutoff, dtype=dtype)
+
+
+def cached_phase(theta, cutoff, dtype=np.complex128):
+    return operator_cache.get("phase", theta, cutoff=cutoff, dtype=dtype)
+
+
+def cached_kerr(k, cutoff, dtype=np.complex128):
+    return operator_cache.get("kerr", k, cutoff=cutoff, dtype=dtype)
+
+
+class UnknownGateException(Exception):
+    """
+    Raised when the cache is asked for a gate it can't build
+    """
+
+
+class InvalidCacheException(Exception):
+    """
+    Raised when the persisted cache doesn't match its metadata
+    """
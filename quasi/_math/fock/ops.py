@@ -1,11 +1,13 @@
-import string
-from itertools import chain, product
+import functools
+from itertools import product
 
 import numpy as np
 from numba import njit, prange
 from scipy.linalg import expm as matrixExp
 from scipy.special import factorial
 from quasi._math.states import FockState
+from quasi._math import contractions
+from quasi._math.fock import kernels
 
 r"""
 The functions implemented here is derived from this paper:
@@ -15,7 +17,6 @@ https://arxiv.org/pdf/2004.11002.pdf
 
 
 def_type = np.complex128
-indices = string.ascii_lowercase
 
 
 def genOfRange(size):
@@ -99,15 +100,16 @@ def a(cutoff):
 
     return np.diag(data, 1)
 
-@njit
+@functools.lru_cache(maxsize=None)
 def fock_operator(n, cut):
-    op = adagger(cut)
-    if n == 1:
-        return op
-    else:
-        for _ in prange(n-1):
-            op = op @ op
-        return op
+    r"""
+    The number state preparation operator :math:`(a^\dagger)^n / \sqrt{n!}`,
+    which maps the vacuum onto :math:`\ket{n}`. Cached, the returned
+    operator is read-only.
+    """
+    op = np.linalg.matrix_power(adagger(cut), n) / np.sqrt(factorial(n))
+    op.setflags(write=False)
+    return op
 
 @njit
 def adagger(cutoff):
@@ -160,8 +162,99 @@ def phase(theta, cutoff):
     return np.array(np.diag([np.exp(1j * n * theta) for n in range(cutoff)]))
 
 
-def vacuum_state(n, cutoff):
-    state = np.zeros([cutoff for i in range(n)], dtype=np.complex128)
+@njit(parallel=True)
+def _beamsplitter_batch(thetas, phis, cutoff):
+    ret = np.zeros((len(thetas), cutoff, cutoff, cutoff, cutoff), dtype=def_type)
+    for k in prange(len(thetas)):
+        ret[k] = beamsplitter(thetas[k], phis[k], cutoff)
+    return ret
+
+
+@njit(parallel=True)
+def _displacement_batch(rs, phis, cutoff):
+    ret = np.zeros((len(rs), cutoff, cutoff), dtype=def_type)
+    for k in prange(len(rs)):
+        ret[k] = displacement(rs[k], phis[k], cutoff)
+    return ret
+
+
+@njit(parallel=True)
+def _squeezing_batch(rs, phis, cutoff):
+    ret = np.zeros((len(rs), cutoff, cutoff), dtype=def_type)
+    for k in prange(len(rs)):
+        ret[k] = squeezing(rs[k], phis[k], cutoff)
+    return ret
+
+
+def _batch_params(*params):
+    """
+    Broadcasts the parameters against each other and flattens them
+    """
+    params = np.broadcast_arrays(*[np.asarray(p, dtype=np.float64) for p in params])
+    shape = params[0].shape
+    return shape, [p.ravel().copy() for p in params]
+
+
+def beamsplitter_batch(thetas, phis, cutoff):
+    """
+    Beamsplitters for the arrays of parameters, stacked into the array
+    of the shape (*params.shape, D, D, D, D)
+    """
+    shape, (thetas, phis) = _batch_params(thetas, phis)
+    ret = _beamsplitter_batch(thetas, phis, cutoff)
+    return ret.reshape(shape + ret.shape[1:])
+
+
+def displacement_batch(rs, phis, cutoff):
+    """
+    Displacements for the arrays of parameters, shape (*params.shape, D, D)
+    """
+    shape, (rs, phis) = _batch_params(rs, phis)
+    ret = _displacement_batch(rs, phis, cutoff)
+    return ret.reshape(shape + ret.shape[1:])
+
+
+def squeezing_batch(rs, phis, cutoff):
+    """
+    Squeezing gates for the arrays of parameters, shape (*params.shape, D, D)
+    """
+    shape, (rs, phis) = _batch_params(rs, phis)
+    ret = _squeezing_batch(rs, phis, cutoff)
+    return ret.reshape(shape + ret.shape[1:])
+
+
+def phase_batch(thetas, cutoff):
+    """
+    Phase shifts for the array of angles, shape (*thetas.shape, D, D)
+    """
+    thetas = np.asarray(thetas, dtype=np.float64)
+    diagonal = np.exp(1j * thetas[..., None] * np.arange(cutoff))
+    ret = np.zeros(thetas.shape + (cutoff, cutoff), dtype=def_type)
+    ret[..., np.arange(cutoff), np.arange(cutoff)] = diagonal
+    return ret
+
+
+def mode_dims(n, cutoff):
+    """
+    Per-mode dimensions, cutoff is either common for all of the modes
+    or a sequence with the truncation of every mode
+    """
+    if np.ndim(cutoff) == 0:
+        return [int(cutoff)] * n
+    return [int(d) for d in cutoff]
+
+
+def truncate_gate(mat, dims):
+    """
+    Truncates the gate with (out1, in1, ...) indices to the per-mode
+    dimensions, the gate has to be built with the cutoff >= max(dims)
+    """
+    index = tuple(slice(0, d) for d in dims for _ in (0, 1))
+    return mat[index]
+
+
+def vacuum_state(n, cutoff, dtype=def_type):
+    state = np.zeros(mode_dims(n, cutoff), dtype=dtype)
     state.ravel()[0] = 1.0 + 0.0j
     return state
 
@@ -219,10 +312,7 @@ def fock_probability(n, state):
 
 
 def mean_photon_number(state, mode,):
-    # pylint: disable=unused-argument
-    n = np.arange(state._cutoff)
-    probs = np.diagonal(state.reduced_dm(mode))
-    return np.sum(n*probs).real
+    return state.mean_photon(mode)
 
 
 @njit
@@ -295,41 +385,11 @@ def apply_gate_einsum(mat, state, modes, n):
     """
     # pylint: disable=unused-argument
 
-    size = len(modes)
-
     if n == 1:
         return np.dot(mat, np.dot(state, mat.conj().T))
 
-    in_str = indices[: n * 2]
-
-    j = genOfRange(n * 2)
-    out_str = "".join(
-        [
-            indices[n * 2 + next(j)] if i // 2 in modes else indices[i]
-            for i in range(n * 2)
-        ]
-    )
-
-    j = genOfRange(size * 2)
-    left_str = "".join(
-        [
-            out_str[modes[i // 2] * 2]
-            if (i % 2) == 0
-            else in_str[modes[i // 2] * 2]
-            for i in range(size * 2)
-        ]
-    )
-    right_str = "".join(
-        [
-            out_str[modes[i // 2] * 2 + 1]
-            if (i % 2) == 0
-            else in_str[modes[i // 2] * 2 + 1]
-            for i in range(size * 2)
-        ]
-    )
-
-    einstring = "".join([left_str, ",", in_str, ",", right_str, "->", out_str])
-    return np.einsum(einstring, mat, state, mat.conj())
+    einstring = contractions.gate_subscripts(n, tuple(modes))
+    return contractions.einsum(einstring, mat, state, mat.conj())
 
 
 def apply_gate_BLAS(mat, state, modes, n, trunc):
@@ -337,14 +397,16 @@ def apply_gate_BLAS(mat, state, modes, n, trunc):
     Gate application based on custom indexing and matrix multiplication.
     Assumes the input matrix has shape (out1, in1, ...).
 
-    This implementation uses indexing and BLAS. As per stack overflow,
-    einsum doesn't actually use BLAS but rather a c implementation. In theory
-    if reshaping is efficient this should be faster.
+    The state is transposed and reshaped into a stack of (dim, dim)
+    matrices, one for every combination of the spectator indices, and the
+    gate is applied to the whole stack with a single batched matmul.
+    Modes may have different truncations, the dimensions are taken
+    from the state.
     """
+    # pylint: disable=unused-argument
 
     size = len(modes)
-    dim = trunc**size
-    stshape = [trunc for i in range(size)]
+    dim = int(np.prod([np.shape(mat)[2 * i] for i in range(size)]))
 
     # Apply the following matrix transposition:
     # |m1><m1| |m2><m2| ... |mn><mn| -> |m1>|m2>...|mn><m1|<m2|...<mn|
@@ -363,14 +425,12 @@ def apply_gate_BLAS(mat, state, modes, n, trunc):
         transpose_list + [2 * i for i in modes] + [2 * i + 1 for i in modes]
     )
     view = np.transpose(state, transpose_list)
-    
 
-    # Apply matrix to each substate
-    ret = np.zeros([trunc for i in range(n * 2)], dtype=def_type)
-    for i in product(*([range(trunc) for j in range((n - size) * 2)])):
-        ret[i] = np.dot(
-            matview, np.dot(view[i].reshape((dim, dim)), matview.conj().T)
-        ).reshape(stshape + stshape)
+    # Apply matrix to all substates at once
+    view_shape = view.shape
+    view = view.reshape((-1, dim, dim))
+    ret = np.matmul(np.matmul(matview, view), matview.conj().T)
+    ret = ret.reshape(view_shape)
 
     # "untranspose" the return matrix ret
     untranspose_list = [0] * len(transpose_list)
@@ -380,6 +440,66 @@ def apply_gate_BLAS(mat, state, modes, n, trunc):
     return np.transpose(ret, untranspose_list)
 
 
+def apply_gate_ket(mat, state, modes, n):
+    """
+    Gate application to a pure state (ket with one index per mode).
+    Assumes the input matrix has shape (out1, in1, ...).
+    """
+    # pylint: disable=unused-argument
+    size = len(modes)
+    in_axes = [2 * i + 1 for i in range(size)]
+    ret = np.tensordot(mat, state, axes=(in_axes, list(modes)))
+    # Output indices of the gate are the leading axes of ret
+    return np.moveaxis(ret, list(range(size)), list(modes))
+
+
+def apply_gate_batch(mat, state, axes, batched=False):
+    """
+    Applies the gate with (out1, in1, ...) indices to the given axes of
+    the batch of states, the leading axis of the state is the batch.
+    The gate is either shared, or batched (with the leading batch axis).
+    """
+    size = len(axes)
+    n = state.ndim - 1
+    state_labels = list(range(1, n + 1))
+    out_labels = list(range(n + 1, n + 1 + size))
+    mat_labels = [k for j in range(size) for k in (out_labels[j], axes[j] + 1)]
+    if batched:
+        mat_labels = [0] + mat_labels
+    result_labels = list(state_labels)
+    for j, axis in enumerate(axes):
+        result_labels[axis] = out_labels[j]
+    return np.einsum(
+        mat, mat_labels, state, [0] + state_labels, [0] + result_labels,
+        optimize=True,
+    )
+
+
+def apply_gate(mat, state, modes, n, trunc, method="blas"):
+    """
+    Applies the gate to the mixed state using the selected method,
+    either "blas" (batched matmul), "einsum" or "numba" (multithreaded
+    kernel for one and two mode gates). The state is not modified.
+    """
+    if method == "numba" and len(modes) <= 2:
+        return kernels.apply_gate_dm(mat, state.copy(), modes, n)
+    return apply_gate_inplace(mat, state, modes, n, trunc, method)
+
+
+def apply_gate_inplace(mat, state, modes, n, trunc, method="blas"):
+    """
+    Same as apply_gate, but the "numba" kernel overwrites the state
+    and returns it, which avoids the copy of the state
+    """
+    if method == "numba" and len(modes) <= 2:
+        return kernels.apply_gate_dm(mat, state, modes, n)
+    if method in ("blas", "numba"):
+        return apply_gate_BLAS(mat, state, modes, n, trunc)
+    if method == "einsum":
+        return apply_gate_einsum(mat, state, modes, n)
+    raise ValueError(f"Unknown gate application method: {method}")
+
+
 def proj(i, j, trunc):
     r"""
     The projector :math:`P = \ket{j}\bra{i}`.
@@ -415,20 +535,12 @@ def lossChannel(T, trunc):
 
 
 def reduced_dm(state, modes, ):
-
-    keep_indices = indices[: 2 * len(modes)]
-    trace_indices = indices[2 * len(modes) : len(modes) + state._modes]
-
-    ind = [i * 2 for i in trace_indices]
-    ctr = 0
-
-    for m in range(state._modes):
-        if m in modes:
-            ind.insert(m, keep_indices[2 * ctr : 2 * (ctr + 1)])
-            ctr += 1
-
-    indStr = "".join(ind) + "->" + keep_indices
-    return np.einsum(indStr, state.dm())
+    if isinstance(modes, int):
+        modes = [modes]
+    indStr = contractions.reduced_dm_subscripts(
+        state._num_modes, tuple(sorted(modes))
+    )
+    return contractions.einsum(indStr, state.dm())
 
 
 def homodyne(state, phi, mode, hbar):
@@ -446,9 +558,10 @@ def homodyne(state, phi, mode, hbar):
 
 
 def calculate_trace(state):
-    eqn_indices = [[indices[idx]] * 2 for idx in range(state._num_modes)]
-    eqn = "".join(chain.from_iterable(eqn_indices))
-    return np.einsum(eqn, state.dm()).real
+    if state.is_pure:
+        return np.sum(np.abs(state.ket(normalize=False)) ** 2)
+    eqn = contractions.trace_subscripts(state._num_modes)
+    return contractions.einsum(eqn, state.dm(normalize=False)).real
 
 
 def partial_trace(state, n, modes):
@@ -457,26 +570,20 @@ def partial_trace(state, n, modes):
 
     Expects state to be in mixed state form.
     """
-    left_str = [
-        indices[2 * i] + indices[2 * i]
-        if i in modes
-        else indices[2 * i : 2 * i + 2]
-        for i in range(n)
-    ]
-    out_str = [
-        "" if i in modes else indices[2 * i : 2 * i + 2] for i in range(n)
-    ]
-    einstr = "".join(left_str + ["->"] + out_str)
+    if isinstance(modes, int):
+        modes = [modes]
+    einstr = contractions.partial_trace_subscripts(n, tuple(sorted(modes)))
+    return contractions.einsum(einstr, state)
 
-    return np.einsum(einstr, state)
 
-
-def vacuumStateMixed(n, trunc):
+def vacuumStateMixed(n, trunc, dtype=def_type):
     r"""
     The `n`-mode mixed vacuum state :math:`\ket{00\dots 0}\bra{00\dots 0}`
     """
 
-    state = np.zeros([trunc for i in range(n * 2)], dtype=def_type)
+    state = np.zeros(
+        [d for d in mode_dims(n, trunc) for _ in (0, 1)], dtype=dtype
+    )
     state.ravel()[0] = 1.0 + 0.0j
     return state
 
@@ -508,9 +615,62 @@ def cubicPhase(gamma, hbar, trunc):
     return ret
 
 
+def superoperator(kraus_ops):
+    r"""
+    Pre-contracts the Kraus operators of a single mode channel into the
+    superoperator :math:`S_{o o' i i'} = \sum_k K_{o i} K^*_{o' i'}`
+    """
+    kraus = np.asarray(kraus_ops)
+    return np.einsum("koi,kpj->opij", kraus, kraus.conj())
+
+
+def apply_superoperator(sop, state, mode, n):
+    """
+    Applies the single mode superoperator to the mixed state
+    in one contraction
+    """
+    # pylint: disable=unused-argument
+    ret = np.tensordot(sop, state, axes=([2, 3], [2 * mode, 2 * mode + 1]))
+    return np.moveaxis(ret, [0, 1], [2 * mode, 2 * mode + 1])
+
+
+def apply_kraus_stacked(kraus_ops, state, modes, n):
+    """
+    Applies the multimode channel, the Kraus operators are applied one
+    at a time and accumulated into a single output buffer. The dimensions
+    of the modes are taken from the state (modes may be truncated
+    differently).
+    """
+    # pylint: disable=unused-argument
+    size = len(modes)
+    ket_axes = [2 * m for m in modes]
+    bra_axes = [2 * m + 1 for m in modes]
+    dims = [state.shape[axis] for axis in ket_axes]
+    dim = int(np.prod(dims))
+    # (rest, ket, bra), so that K rho K^dagger is a batched matmul
+    front = state.ndim - 2 * size
+    moved = np.moveaxis(state, ket_axes + bra_axes, list(range(front, state.ndim)))
+    rest_shape = moved.shape[:front]
+    moved = moved.reshape(-1, dim, dim)
+
+    out_axes = [2 * i for i in range(size)]
+    in_axes = [2 * i + 1 for i in range(size)]
+    ret = None
+    for kraus in kraus_ops:
+        kraus = np.transpose(kraus, out_axes + in_axes).reshape(dim, dim)
+        term = kraus @ moved @ kraus.conj().T
+        if ret is None:
+            ret = term
+        else:
+            ret += term
+    ret = ret.reshape(list(rest_shape) + dims + dims)
+    return np.moveaxis(ret, list(range(front, state.ndim)), ket_axes + bra_axes)
+
+
 def apply_channel(state: FockState, kraus_ops, modes):
     """Master channel application function. Applies a channel represented by
-    Kraus operators.
+    Kraus operators. Single mode channels are applied as a pre-contracted
+    superoperator, multimode channels with the stacked Kraus operators.
 
     .. note::
             Always results in a mixed state.
@@ -519,11 +679,19 @@ def apply_channel(state: FockState, kraus_ops, modes):
         kraus_ops (list<array>): A list of Kraus operators
         modes (list<non-negative int>): The modes to apply the channel to
     """
-
-    states = [
-        apply_gate_einsum(k, state, modes, state._num_modes) for k in kraus_ops
-    ]
-    return sum(states)
+    if isinstance(modes, int):
+        modes = [modes]
+    modes = list(modes)
+    if len(modes) == 1:
+        return apply_superoperator(
+            superoperator(kraus_ops),
+            state.dm(normalize=False),
+            modes[0],
+            state._num_modes,
+        )
+    return apply_kraus_stacked(
+        kraus_ops, state.dm(normalize=False), modes, state._num_modes
+    )
 
 
 def norm(state: FockState):
@@ -553,11 +721,8 @@ def mix(state, n):
     shape of the input state.
     """
 
-    left_str = [indices[i] for i in range(0, 2 * n, 2)]
-    right_str = [indices[i] for i in range(1, 2 * n, 2)]
-    out_str = [indices[: 2 * n]]
-    einstr = "".join(left_str + [","] + right_str + ["->"] + out_str)
-    return np.einsum(einstr, state, state.conj())
+    einstr = contractions.mix_subscripts(n)
+    return contractions.einsum(einstr, state, state.conj())
 
 
 @njit
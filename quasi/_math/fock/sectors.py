@@ -0,0 +1,324 @@
+"""
+Photon number sectors
+
+Block-sparse representation of the density matrix, indexed by the total
+photon number. Sector N holds all of the Fock basis states with N photons
+in total (each mode below the cutoff) and the density matrix is stored as
+blocks rho[(N, M)] between the sectors N and M.
+
+Passive gates (beam splitters, phase shifters) conserve the photon number
+and act within the sectors. Any other operator (e.g. Kraus operators of a
+channel) is split into components, which change the photon number by a
+fixed amount, and couples the sectors explicitly. Memory and time scale
+with the occupied sectors instead of the cutoff.
+
+Gates use the (out1, in1, out2, in2, ...) index layout.
+"""
+
+from collections import defaultdict
+from itertools import product
+
+import numpy as np
+
+from quasi._math.states import FockState
+
+
+def _compositions(total, parts, cutoff):
+    """
+    Occupations of the `parts` modes with `total` photons, each below cutoff
+    """
+    if parts == 0:
+        if total == 0:
+            yield ()
+        return
+    for n in range(min(total, cutoff - 1), -1, -1):
+        for rest in _compositions(total - n, parts - 1, cutoff):
+            yield (n,) + rest
+
+
+def _as_matrix_tensor(operator, size):
+    """
+    Reorders the operator indices into (out1, out2, ..., in1, in2, ...)
+    """
+    operator = np.asarray(operator)
+    out_axes = [2 * i for i in range(size)]
+    in_axes = [2 * i + 1 for i in range(size)]
+    return operator.transpose(out_axes + in_axes)
+
+
+def _shift_components(operator, size):
+    """
+    Splits the operator into components, which change the number of
+    photons in its modes by a fixed amount. Returns {shift: operator}.
+    """
+    tensor = _as_matrix_tensor(operator, size)
+    cutoff = tensor.shape[0]
+    grid = np.indices(tensor.shape)
+    shift = grid[:size].sum(axis=0) - grid[size:].sum(axis=0)
+    components = {}
+    for d in np.unique(shift[tensor != 0]):
+        components[int(d)] = np.where(shift == d, tensor, 0)
+    if not components:
+        components[0] = np.zeros_like(tensor)
+    return components, cutoff
+
+
+class SectorState:
+    """
+    Density matrix stored as blocks between the photon number sectors
+    """
+
+    def __init__(self, num_modes, cutoff, dtype=np.complex128):
+        self.num_modes = num_modes
+        self.cutoff = cutoff
+        self.dtype = dtype
+        self.blocks = {}
+        self._bases = {}
+        self._plans = {}
+
+    def basis(self, total):
+        """
+        Returns the (dim, num_modes) array of occupations in the sector
+        and the lookup from occupation to the index
+        """
+        if total not in self._bases:
+            states = list(_compositions(total, self.num_modes, self.cutoff))
+            occupations = np.array(states, dtype=int).reshape(
+                len(states), self.num_modes
+            )
+            lookup = {s: i for i, s in enumerate(states)}
+            self._bases[total] = (occupations, lookup)
+        return self._bases[total]
+
+    def dim(self, total):
+        return len(self.basis(total)[0])
+
+    @classmethod
+    def vacuum(cls, num_modes, cutoff, dtype=np.complex128):
+        """
+        Vacuum state, single block in the zero photon sector
+        """
+        state = cls(num_modes, cutoff, dtype=dtype)
+        state.blocks[(0, 0)] = np.ones((1, 1), dtype=dtype)
+        return state
+
+    @classmethod
+    def from_dm(cls, dm, num_modes, cutoff, atol=0.0):
+        """
+        Builds the sector representation from the dense density matrix
+        with the interleaved (ket, bra) indices
+        """
+        state = cls(num_modes, cutoff, dtype=dm.dtype.type)
+        transpose_list = list(range(0, 2 * num_modes, 2)) + list(
+            range(1, 2 * num_modes, 2)
+        )
+        flat = np.transpose(dm, transpose_list).reshape(
+            cutoff**num_modes, cutoff**num_modes
+        )
+        max_total = num_modes * (cutoff - 1)
+        flat_indices = {}
+        for total in range(max_total + 1):
+            occupations, _ = state.basis(total)
+            flat_indices[total] = np.ravel_multi_index(
+                occupations.T, [cutoff] * num_modes
+            )
+        for n, m in product(range(max_total + 1), repeat=2):
+            block = flat[np.ix_(flat_indices[n], flat_indices[m])]
+            if np.any(np.abs(block) > atol):
+                state.blocks[(n, m)] = block
+        return state
+
+    def to_dm(self):
+        """
+        Returns the dense density matrix with the interleaved indices
+        """
+        size = self.cutoff**self.num_modes
+        flat = np.zeros((size, size), dtype=self.dtype)
+        shape = [self.cutoff] * self.num_modes
+        for (n, m), block in self.blocks.items():
+            rows = np.ravel_multi_index(self.basis(n)[0].T, shape)
+            cols = np.ravel_multi_index(self.basis(m)[0].T, shape)
+            flat[np.ix_(rows, cols)] = block
+        dm = flat.reshape(shape + shape)
+        transpose_list = [
+            k for i in range(self.num_modes) for k in (i, i + self.num_modes)
+        ]
+        return np.transpose(dm, transpose_list)
+
+    def trace(self):
+        return sum(
+            np.trace(block).real for (n, m), block in self.blocks.items() if n == m
+        )
+
+    def normalize(self):
+        trace = self.trace()
+        for key in self.blocks:
+            self.blocks[key] = self.blocks[key] / trace
+
+    def all_fock_probs(self):
+        """
+        Fock basis probabilities, computed from the diagonal blocks
+        """
+        probs = np.zeros([self.cutoff] * self.num_modes)
+        for (n, m), block in self.blocks.items():
+            if n == m:
+                probs[tuple(self.basis(n)[0].T)] = np.diagonal(block).real
+        return probs
+
+    def occupied_sectors(self):
+        return sorted({n for n, _ in self.blocks} | {m for _, m in self.blocks})
+
+    def _plan(self, total, modes, shift):
+        """
+        Groups the basis states of the sector by the photon number in the
+        gate modes. For every group returns the input and output local
+        occupations and the (rest, local) index arrays into the source
+        and target sectors.
+        """
+        key = (total, tuple(modes), shift)
+        if key in self._plans:
+            return self._plans[key]
+        target = total + shift
+        occupations, _ = self.basis(total)
+        _, target_lookup = self.basis(target)
+        rest_modes = [m for m in range(self.num_modes) if m not in modes]
+        local_totals = occupations[:, modes].sum(axis=1)
+        plan = []
+        for k in np.unique(local_totals):
+            local_in = list(_compositions(int(k), len(modes), self.cutoff))
+            local_out = list(
+                _compositions(int(k) + shift, len(modes), self.cutoff)
+            )
+            if not local_out:
+                continue
+            in_lookup = {l: i for i, l in enumerate(local_in)}
+            rests = {}
+            source = []
+            for index, occupation in enumerate(occupations):
+                if local_totals[index] != k:
+                    continue
+                rest = tuple(occupation[rest_modes])
+                if rest not in rests:
+                    rests[rest] = len(rests)
+                    source.append([0] * len(local_in))
+                local = tuple(occupation[modes])
+                source[rests[rest]][in_lookup[local]] = index
+            destination = []
+            for rest in rests:
+                row = []
+                for local in local_out:
+                    occupation = [0] * self.num_modes
+                    for m, value in zip(rest_modes, rest):
+                        occupation[m] = value
+                    for m, value in zip(modes, local):
+                        occupation[m] = value
+                    row.append(target_lookup[tuple(occupation)])
+                destination.append(row)
+            plan.append(
+                (
+                    np.array(local_in, dtype=int),
+                    np.array(local_out, dtype=int),
+                    np.array(source, dtype=int),
+                    np.array(destination, dtype=int),
+                )
+            )
+        self._plans[key] = plan
+        return plan
+
+    def _apply_rows(self, component, modes, shift, total, matrix):
+        """
+        Applies the operator component (which changes the photon number by
+        shift) to the rows of the matrix, which are indexed by the sector
+        """
+        target = total + shift
+        result = np.zeros((self.dim(target), matrix.shape[1]), dtype=self.dtype)
+        size = len(modes)
+        for local_in, local_out, source, destination in self._plan(
+            total, modes, shift
+        ):
+            index = tuple(local_out[:, j][:, None] for j in range(size)) + tuple(
+                local_in[:, j][None, :] for j in range(size)
+            )
+            block = component[index]
+            gathered = matrix[source]
+            result[destination] += np.einsum("ab,rbc->rac", block, gathered)
+        return result
+
+    def _valid(self, total):
+        return 0 <= total <= self.num_modes * (self.cutoff - 1)
+
+    def apply_kraus(self, kraus_ops, modes):
+        """
+        Applies the channel sum_k K rho K^dagger, the Kraus operators act
+        on the given modes
+        """
+        if isinstance(modes, int):
+            modes = [modes]
+        modes = list(modes)
+        size = len(modes)
+        new_blocks = defaultdict(lambda: 0)
+        for operator in kraus_ops:
+            components, _ = _shift_components(operator, size)
+            for (n, m), block in self.blocks.items():
+                for d_left, left in components.items():
+                    if not self._valid(n + d_left):
+                        continue
+                    rows = self._apply_rows(left, modes, d_left, n, block)
+                    for d_right, right in components.items():
+                        if not self._valid(m + d_right):
+                            continue
+                        cols = self._apply_rows(
+                            right, modes, d_right, m, rows.conj().T
+                        )
+                        new_blocks[(n + d_left, m + d_right)] += cols.conj().T
+        self.blocks = dict(new_blocks)
+
+    def apply_gate(self, operator, modes):
+        """
+        Applies the gate, passive gates keep the blocks in their sectors
+        """
+        self.apply_kraus([operator], modes)
+
+
+class SectorFockState(FockState):
+    r"""Read-only FockState view of the sector representation. Probabilities
+    and the trace are computed from the diagonal blocks, the dense density
+    matrix is only assembled when it is requested (dm, reduced_dm).
+    """
+
+    def __init__(self, sectors, hbar=2):
+        super().__init__(
+            None,
+            sectors.num_modes,
+            cutoff_dim=sectors.cutoff,
+            hbar=hbar,
+            pure=False,
+            normalized=False,
+        )
+        self.sectors = sectors
+
+    @property
+    def trace(self):
+        if self._trace is None:
+            self._trace = float(self.sectors.trace())
+        return self._trace
+
+    def _normalize(self):
+        if self._data is None:
+            self._data = self.sectors.to_dm()
+        super()._normalize()
+
+    def dm(self, normalize=True) -> np.ndarray:
+        if self._data is None:
+            self._data = self.sectors.to_dm()
+        return super().dm(normalize)
+
+    def all_fock_probs(self):
+        probs = self.sectors.all_fock_probs()
+        trace = self.trace
+        return probs / trace if trace > 0 else probs
+
+    def fock_marginal(self, mode):
+        mode = mode[0] if isinstance(mode, (list, tuple)) else mode
+        others = tuple(m for m in range(self._num_modes) if m != mode)
+        return np.sum(self.all_fock_probs(), axis=others)
@@ -0,0 +1,47 @@
+"""
+Hafnians
+
+The (loop) hafnian is computed with the dynamic programming over the
+subsets of the row indices, every subset is expanded along its lowest
+index. The cost is O(2^n n) for the n x n matrix, which is sufficient for
+the photon numbers seen by the detectors.
+"""
+
+import numpy as np
+from numba import njit
+
+
+@njit
+def _subset_hafnian(mat, loops):
+    n = mat.shape[0]
+    table = np.zeros(1 << n, dtype=np.complex128)
+    table[0] = 1.0
+    for mask in range(1, 1 << n):
+        i = 0
+        while not (mask >> i) & 1:
+            i += 1
+        rest = mask ^ (1 << i)
+        value = mat[i, i] * table[rest] if loops else 0.0j
+        for j in range(i + 1, n):
+            if (rest >> j) & 1:
+                value += mat[i, j] * table[rest ^ (1 << j)]
+        table[mask] = value
+    return table[(1 << n) - 1]
+
+
+def hafnian(mat):
+    """
+    Hafnian of the symmetric matrix, the sum over the perfect matchings
+    """
+    mat = np.asarray(mat, dtype=np.complex128)
+    if mat.shape[0] % 2:
+        return 0.0j
+    return _subset_hafnian(mat, False)
+
+
+def loop_hafnian(mat):
+    """
+    Loop hafnian of the symmetric matrix, the sum over the matchings
+    which may include loops (weighted by the diagonal)
+    """
+    return _subset_hafnian(np.asarray(mat, dtype=np.complex128), True)
@@ -0,0 +1,123 @@
+"""
+Gaussian operations
+
+Gaussian states are described by the vector of means and the covariance
+matrix of the quadratures in the (x_1, ..., x_n, p_1, ..., p_n) ordering,
+the vacuum covariance is hbar/2 times the identity. Gaussian gates act as
+the symplectic matrix S and the displacement d:
+
+    means -> S means + d,    cov -> S cov S^T
+
+Fock basis probabilities are computed from the loop hafnian of the
+matrix A of the state (Hamilton et al., Gaussian boson sampling).
+"""
+
+from math import factorial
+
+import numpy as np
+
+from quasi._math.gaussian.hafnian import loop_hafnian
+
+
+class GaussianOperation:
+    """
+    Symplectic matrix and the displacement acting on the given number
+    of modes (ordered as the modes the operation is applied to)
+    """
+
+    def __init__(self, symplectic=None, displacement=None, size=1):
+        self.symplectic = (
+            np.identity(2 * size) if symplectic is None else symplectic
+        )
+        self.displacement = (
+            np.zeros(2 * size) if displacement is None else displacement
+        )
+        self.size = size
+
+
+def passive(unitary):
+    """
+    Symplectic matrix of the passive transformation a -> U a
+    """
+    unitary = np.atleast_2d(unitary)
+    return np.block([[unitary.real, -unitary.imag], [unitary.imag, unitary.real]])
+
+
+def phase(theta):
+    return GaussianOperation(passive(np.exp(1j * theta)))
+
+
+def beamsplitter(theta, phi):
+    """
+    Beamsplitter with the same convention as the Fock beamsplitter
+    """
+    t = np.cos(theta)
+    r = np.exp(1j * phi) * np.sin(theta)
+    return GaussianOperation(passive([[t, -np.conj(r)], [r, t]]), size=2)
+
+
+def squeezing(r, phi):
+    """
+    Single mode squeezing with the complex parameter r exp(i phi)
+    """
+    ch = np.cosh(r)
+    sh = np.sinh(r)
+    symplectic = np.array(
+        [
+            [ch - sh * np.cos(phi), -sh * np.sin(phi)],
+            [-sh * np.sin(phi), ch + sh * np.cos(phi)],
+        ]
+    )
+    return GaussianOperation(symplectic)
+
+
+def displacement(r, phi, hbar=2):
+    alpha = r * np.exp(1j * phi)
+    return GaussianOperation(
+        displacement=np.sqrt(2 * hbar) * np.array([alpha.real, alpha.imag])
+    )
+
+
+def expand(matrix, modes, n):
+    """
+    Embeds the symplectic matrix acting on the modes into n modes
+    """
+    size = len(modes)
+    indices = list(modes) + [m + n for m in modes]
+    full = np.identity(2 * n)
+    full[np.ix_(indices, indices)] = matrix.reshape(2 * size, 2 * size)
+    return full
+
+
+def quadrature_indices(modes, n):
+    return list(modes) + [m + n for m in modes]
+
+
+def fock_prob(means, cov, pattern, hbar=2):
+    """
+    Probability of the photon number pattern, the state is given by
+    the means and the covariance matrix of the modes in the pattern
+    """
+    n = len(pattern)
+    # Complex (a, a^dagger) representation
+    w = np.block(
+        [[np.identity(n), 1j * np.identity(n)], [np.identity(n), -1j * np.identity(n)]]
+    ) / np.sqrt(2)
+    q = w @ cov @ w.conj().T / hbar + np.identity(2 * n) / 2
+    q_inv = np.linalg.inv(q)
+    x = np.block(
+        [[np.zeros((n, n)), np.identity(n)], [np.identity(n), np.zeros((n, n))]]
+    )
+    a_mat = x @ (np.identity(2 * n) - q_inv).conj()
+    beta = w @ means / np.sqrt(hbar)
+    gamma = (beta.conj() @ q_inv).conj()
+    prefactor = np.exp(-0.5 * beta.conj() @ q_inv @ beta) / np.sqrt(
+        np.linalg.det(q)
+    )
+
+    indices = np.repeat(np.arange(n), pattern)
+    indices = np.concatenate([indices, indices + n])
+    reduced = a_mat[np.ix_(indices, indices)]
+    np.fill_diagonal(reduced, gamma[indices])
+    norm = np.prod([factorial(k) for k in pattern])
+    return float((prefactor * loop_hafnian(reduced)).real / norm)
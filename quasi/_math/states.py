@@ -1,10 +1,24 @@
 import abc
-import string
 
 import numpy as np
 
+from quasi._math import contractions
+from quasi._math.gaussian import ops as gaussian_ops
 
-indices = string.ascii_lowercase
+
+def diagonal_view(dm):
+    r"""Zero-copy view of the diagonal :math:`\rho_{n_1 n_1, n_2 n_2, \dots}`
+    of the density matrix with the interleaved (ket, bra) indices, the
+    view has one index per mode. Strides of the ket and bra indices of
+    every mode are added, so that the diagonal is read in place.
+    """
+    strides = dm.strides
+    return np.lib.stride_tricks.as_strided(
+        dm,
+        shape=dm.shape[::2],
+        strides=[strides[k] + strides[k + 1] for k in range(0, dm.ndim, 2)],
+        writeable=False,
+    )
 
 
 class State(abc.ABC):
@@ -22,14 +36,18 @@ class FockState(State):
     Args:
         state_data (array): the state representation in the Fock basis
         num_modes (int): the number of modes in the state
-        pure (bool): True if the state is a pure state, false if the state is mixed
-        cutoff_dim (int): the Fock basis truncation size
+        cutoff_dim (int or list[int]): the Fock basis truncation size,
+            common for all of the modes or given for every mode
         hbar (float): (default 2) The value of :math:`\hbar` in the definition of :math:`\x` and :math:`\p` (see :ref:`opcon`)
-        mode_names (Sequence): (optional) this argument contains a list providing mode names
-            for each mode in the state
+        pure (bool): True if state_data is a ket (one index per mode),
+            False if it is a density matrix (two indices per mode)
+        normalized (bool): False if state_data is not normalized, the state
+            is then normalized lazily, when it is read for the first time
     """
 
-    def __init__(self, state_data, num_modes, cutoff_dim, hbar=2):
+    def __init__(
+        self, state_data, num_modes, cutoff_dim, hbar=2, pure=False, normalized=True
+    ):
         # pylint: disable=too-many-arguments
 
         super().__init__(num_modes, hbar)
@@ -37,8 +55,50 @@ class FockState(State):
         self._data = state_data
         self._cutoff = cutoff_dim
         self._num_modes = num_modes
+        self._pure = pure
+        self._normalized = normalized
+        self._trace = None
+        self._cdfs = {}
         self._basis = "fock"
 
+    @property
+    def is_pure(self):
+        r"""True if the state is represented by a ket"""
+        return self._pure
+
+    @property
+    def is_normalized(self):
+        r"""False until the lazily normalized state is read"""
+        return self._normalized
+
+    @property
+    def trace(self):
+        r"""Trace of the state data (squared norm of the ket), as stored
+        before the lazy normalization
+        """
+        if self._trace is None:
+            if self._pure:
+                self._trace = float(np.sum(np.abs(self._data) ** 2))
+            else:
+                self._trace = float(np.sum(diagonal_view(self._data).real))
+        return self._trace
+
+    def _normalize(self):
+        if self._normalized:
+            return
+        trace = self.trace
+        if trace > 0:
+            # Python floats keep the precision of the data
+            self._data = self._data / (trace**0.5 if self._pure else trace)
+        self._normalized = True
+
+    @property
+    def dims(self):
+        r"""Truncation of every mode"""
+        if np.ndim(self._cutoff) == 0:
+            return [self._cutoff] * self._num_modes
+        return list(self._cutoff)
+
     @property
     def cutoff_dim(self):
         r"""The numerical truncation of the Fock space used by the underlying state.
@@ -49,9 +109,34 @@ class FockState(State):
         """
         return self._cutoff
 
-    def dm(self) -> np.ndarray:
+    def ket(self, normalize=True) -> np.ndarray:
+        r"""Returns the ket of the pure state
+
+        Raises:
+            ValueError: if the state is mixed
+        """
+        if not self._pure:
+            raise ValueError("Mixed state has no ket representation")
+        if normalize:
+            self._normalize()
         return self._data
 
+    def dm(self, normalize=True) -> np.ndarray:
+        r"""Returns the density matrix, with the indices ordered as
+        :math:`(\text{ket}_1, \text{bra}_1, \text{ket}_2, \text{bra}_2, \dots)`,
+        pure states are mixed on demand
+        """
+        if normalize:
+            self._normalize()
+        if not self._pure:
+            return self._data
+        ket = self._data
+        rho = np.tensordot(ket, ket.conj(), axes=0)
+        transpose_list = [
+            k for m in range(self._num_modes) for k in (m, m + self._num_modes)
+        ]
+        return np.transpose(rho, transpose_list)
+
     def all_fock_probs(self):
         r"""Probabilities of all possible Fock basis states for the current circuit state.
 
@@ -68,38 +153,141 @@ class FockState(State):
                 containing the Fock state probabilities, where :math:`D` is the Fock basis cutoff truncation
         """
 
-        dm = self.dm()
-        num_axes = len(dm.shape)
-        evens = [k for k in range(0, num_axes, 2)]
-        odds = [k for k in range(1, num_axes, 2)]
-        flat_size = np.prod([dm.shape[k] for k in range(0, num_axes, 2)])
-        transpose_list = evens + odds
-        probs = np.diag(
-            np.reshape(
-                np.transpose(dm, transpose_list), [flat_size, flat_size]
-            )
-        ).real
-
-        return np.reshape(probs, [self._cutoff] * self._num_modes)
+        self._normalize()
+        if self._pure:
+            return np.abs(self._data) ** 2
+        return np.array(diagonal_view(self._data).real)
+
+    def fock_marginal(self, mode):
+        r"""Photon number distribution of the mode, read from the diagonal
+        without forming the reduced density matrix"""
+        mode = mode[0] if isinstance(mode, (list, tuple)) else mode
+        self._normalize()
+        others = tuple(m for m in range(self._num_modes) if m != mode)
+        if self._pure:
+            return np.sum(np.abs(self._data) ** 2, axis=others)
+        return np.sum(diagonal_view(self._data).real, axis=others)
     
+    def _cdf(self, modes):
+        r"""Cumulative distribution of the joint photon numbers of the
+        modes (flattened), built once per set of modes"""
+        if modes not in self._cdfs:
+            probs = self.all_fock_probs()
+            others = tuple(m for m in range(self._num_modes) if m not in modes)
+            probs = np.sum(probs, axis=others)
+            # Order the axes as requested
+            probs = np.transpose(probs, np.argsort(np.argsort(modes)))
+            cdf = np.cumsum(probs.ravel())
+            self._cdfs[modes] = (cdf / cdf[-1], probs.shape)
+        return self._cdfs[modes]
+
+    def sample(self, shots, modes=None, rng=None):
+        r"""Draws the joint photon number samples of the modes (all of the
+        modes by default).
+
+        Args:
+            shots (int): number of the samples
+            modes (list[int]): measured modes, the others are traced out
+            rng (np.random.Generator): random number generator, e.g. the
+                seeded Simulation.get_rng()
+
+        Returns:
+            array: integer array of the shape (shots, len(modes))
+        """
+        if modes is None:
+            modes = range(self._num_modes)
+        if isinstance(modes, int):
+            modes = [modes]
+        if rng is None:
+            rng = np.random.default_rng()
+        cdf, shape = self._cdf(tuple(modes))
+        indices = np.searchsorted(cdf, rng.random(shots), side="right")
+        # Guards against the rounding of the last cdf element
+        indices = np.minimum(indices, len(cdf) - 1)
+        return np.stack(np.unravel_index(indices, shape), axis=-1)
+
     def reduced_dm(self, modes, ):
 
-        keep_indices = indices[: 2 * len(modes)]
-        trace_indices = indices[2 * len(modes) : len(modes) + self._num_modes]
+        if isinstance(modes, int):
+            modes = [modes]
+        # The modes of the reduced state follow the mode order
+        modes = sorted(modes)
+        self._normalize()
+        if self._pure:
+            # Contract the ket with its conjugate over the traced modes
+            ket = np.moveaxis(self._data, modes, list(range(len(modes))))
+            kept = ket.shape[: len(modes)]
+            ket = ket.reshape((int(np.prod(kept)), -1))
+            rho = (ket @ ket.conj().T).reshape(kept + kept)
+            transpose_list = [
+                k for m in range(len(modes)) for k in (m, m + len(modes))
+            ]
+            return np.transpose(rho, transpose_list)
+
+        indStr = contractions.reduced_dm_subscripts(
+            self._num_modes, tuple(modes)
+        )
+        return contractions.einsum(indStr, self.dm())
+
+    def mean_photon(self, mode, **kwargs):
+        # pylint: disable=unused-argument
+        mode = mode[0] if isinstance(mode, (list, tuple)) else mode
+        probs = self.fock_marginal(mode)
+        n = np.arange(len(probs))
+        return np.sum(n*probs)
+
+
+class GaussianState(State):
+    r"""Class for the representation of Gaussian states.
+
+    Args:
+        means (array): vector of the quadrature means in the
+            :math:`(x_1, \dots, x_n, p_1, \dots, p_n)` ordering
+        cov (array): covariance matrix of the quadratures
+        num_modes (int): the number of modes in the state
+        hbar (float): (default 2) The value of :math:`\hbar`, the vacuum
+            covariance matrix is :math:`\hbar/2` times the identity
+    """
+
+    def __init__(self, means, cov, num_modes, hbar=2):
+        super().__init__(num_modes, hbar)
+        self._means = means
+        self._cov = cov
+        self._basis = "gaussian"
+
+    def means(self) -> np.ndarray:
+        return self._means
+
+    def cov(self) -> np.ndarray:
+        return self._cov
+
+    def reduced_gaussian(self, modes):
+        r"""Returns the means and the covariance matrix of the modes"""
+        if isinstance(modes, int):
+            modes = [modes]
+        indices = gaussian_ops.quadrature_indices(modes, self._num_modes)
+        return self._means[indices], self._cov[np.ix_(indices, indices)]
 
-        ind = [i * 2 for i in trace_indices]
-        ctr = 0
+    def fock_prob(self, pattern, modes=None):
+        r"""Probability of the photon number pattern in the given modes
+        (all of the modes by default), the other modes are traced out"""
+        if modes is None:
+            modes = list(range(self._num_modes))
+        means, cov = self.reduced_gaussian(modes)
+        return gaussian_ops.fock_prob(means, cov, pattern, self._hbar)
 
-        for m in range(self._num_modes):
-            if m in modes:
-                ind.insert(m, keep_indices[2 * ctr : 2 * (ctr + 1)])
-                ctr += 1
+    def all_fock_probs(self, cutoff, modes=None):
+        r"""Probabilities of all of the photon number patterns below the
+        cutoff in the given modes (all of the modes by default)"""
+        if modes is None:
+            modes = list(range(self._num_modes))
+        probs = np.zeros([cutoff] * len(modes))
+        for pattern in np.ndindex(*probs.shape):
+            probs[pattern] = self.fock_prob(pattern, modes)
+        return probs
 
-        indStr = "".join(ind) + "->" + keep_indices
-        return np.einsum(indStr, self.dm())
-  
     def mean_photon(self, mode, **kwargs):
         # pylint: disable=unused-argument
-        n = np.arange(self._cutoff)
-        probs = np.diagonal(self.reduced_dm(mode))
-        return np.sum(n*probs).real
+        mode = mode[0] if isinstance(mode, (list, tuple)) else mode
+        means, cov = self.reduced_gaussian(mode)
+        return (np.trace(cov) + means @ means) / (2 * self._hbar) - 0.5
@@ -70,3 +70,10 @@ class FockBackend(Backend):
         """
         Should Apply the operator to the correct mode
         """
+
+    @abstractmethod
+    def remove_mode(self, mode: int, outcome: int = None):
+        """
+        Should remove the mode from the state, tracing it out or
+        projecting it onto the outcome number state
+        """
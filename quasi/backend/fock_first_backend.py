@@ -6,8 +6,8 @@ import cmath
 from quasi.backend.backend import FockBackend
 from quasi.experiment import Experiment
 from quasi._math.fock import (a, adagger,
-                              squeezing, displacement,
-                              beamsplitter, phase)
+                              cached_squeezing, cached_displacement,
+                              cached_beamsplitter, cached_phase)
 
 
 class FockBackendFirst(FockBackend):
@@ -40,36 +40,45 @@ class FockBackendFirst(FockBackend):
         print(f"Dimensions {dimensions}")
         self.experiment.update_dimensions(dimensions)
 
+    def set_dtype(self, dtype):
+        """
+        Set the precision of the simulation, np.complex128 or np.complex64
+        """
+        self.experiment.set_dtype(dtype)
+
     def create(self, mode):
         """
         Return the creation operator
         """
-        return adagger(self.experiment.cutoff)
+        return adagger(self.experiment.cutoff).astype(self.experiment.dtype)
 
     def destroy(self, mode):
         """
         Return the annihilatio operator
         """
-        return a(self.experiment.cutoff)
+        return a(self.experiment.cutoff).astype(self.experiment.dtype)
 
     def squeeze(self, z: complex, mode):
         """
         Return the squeezing operator
         """
-        return squeezing(abs(z), cmath.phase(z), self.experiment.cutoff)
+        return cached_squeezing(
+            abs(z), cmath.phase(z), self.experiment.cutoff, self.experiment.dtype
+        )
 
     def displace(self, alpha: float, phi: float, mode):
         """
         Returns the displace operator
         """
-        return displacement(
+        return cached_displacement(
             alpha,
             phi,
-            self.experiment.cutoff
+            self.experiment.cutoff,
+            self.experiment.dtype
         )
 
     def phase_shift(self, theta: float, mode):
-        return phase(theta, self.experiment.cutoff)
+        return cached_phase(theta, self.experiment.cutoff, self.experiment.dtype)
 
     def number(self, mode):
         pass
@@ -79,6 +88,12 @@ class FockBackendFirst(FockBackend):
         print([*modes])
         self.experiment.add_operation(operator, modes)
 
+    def remove_mode(self, mode: int, outcome: int = None):
+        """
+        Removes the mode from the experiment
+        """
+        self.experiment.remove_mode(mode, outcome)
+
     def initialize_number_state(self, n: int, mode: int):
         """
         Initialize the number state
@@ -89,9 +104,10 @@ class FockBackendFirst(FockBackend):
         """
         Returns the beamsplitter operator
         """
-        return beamsplitter(
+        return cached_beamsplitter(
             theta,
             phi,
-            self.experiment.cutoff).transpose(
+            self.experiment.cutoff,
+            self.experiment.dtype).transpose(
                 (0, 2, 1, 3)
             )
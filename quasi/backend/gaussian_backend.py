@@ -0,0 +1,125 @@
+"""
+This module implements the Gaussian (covariance matrix) backend, which
+simulates Gaussian sources, passive linear optics and loss in O(n^2)
+memory
+"""
+import cmath
+
+import numpy as np
+
+from quasi.backend.backend import Backend
+from quasi._math.gaussian import ops
+from quasi._math.states import GaussianState
+
+
+class GaussianBackend(Backend):
+    """
+    Gaussian backend, the operator methods return the Gaussian operations
+    (symplectic matrix and displacement), which are applied immediately
+    by apply_operator
+    """
+
+    def __init__(self):
+        self.number_of_modes = 0
+        self.hbar = 2
+        self.means = np.zeros(0)
+        self.cov = np.zeros((0, 0))
+
+    def initialize(self):
+        """
+        Creates the vacuum state, run before the simulation
+        """
+        n = self.number_of_modes
+        self.means = np.zeros(2 * n)
+        self.cov = self.hbar / 2 * np.identity(2 * n)
+
+    def set_number_of_modes(self, number_of_modes):
+        """
+        Set the number of modes
+        """
+        self.number_of_modes = number_of_modes
+
+    def squeeze(self, z: complex, mode):
+        """
+        Return the squeezing operation
+        """
+        return ops.squeezing(abs(z), cmath.phase(z))
+
+    def displace(self, alpha: float, phi: float, mode):
+        """
+        Returns the displacement operation
+        """
+        return ops.displacement(alpha, phi, self.hbar)
+
+    def phase_shift(self, theta: float, mode):
+        return ops.phase(theta)
+
+    def beam_splitter(self, theta=0, phi=0):
+        """
+        Returns the beamsplitter operation
+        """
+        return ops.beamsplitter(theta, phi)
+
+    def apply_operator(self, operator: ops.GaussianOperation, modes):
+        """
+        Applies the Gaussian operation to the modes
+        """
+        if isinstance(modes, int):
+            modes = [modes]
+        n = self.number_of_modes
+        symplectic = ops.expand(operator.symplectic, modes, n)
+        self.means = symplectic @ self.means
+        self.means[ops.quadrature_indices(modes, n)] += operator.displacement
+        self.cov = symplectic @ self.cov @ symplectic.T
+
+    def loss(self, transmissivity: float, mode: int):
+        """
+        Applies the pure loss channel with the given transmissivity
+        """
+        indices = ops.quadrature_indices([mode], self.number_of_modes)
+        self.means[indices] *= np.sqrt(transmissivity)
+        self.cov[indices, :] *= np.sqrt(transmissivity)
+        self.cov[:, indices] *= np.sqrt(transmissivity)
+        self.cov[indices, indices] += (1 - transmissivity) * self.hbar / 2
+
+    def initialize_number_state(self, n: int, mode: int):
+        """
+        Number states (except for the vacuum) are not Gaussian
+        """
+        if n != 0:
+            raise NonGaussianOperationException(
+                "Number state is not Gaussian"
+            )
+
+    def remove_mode(self, mode: int, outcome: int = None):
+        """
+        Traces the mode out, projections onto the number states are not
+        Gaussian operations
+        """
+        if outcome is not None:
+            raise NonGaussianOperationException(
+                "Projection onto the number state is not Gaussian"
+            )
+        n = self.number_of_modes
+        kept = [m for m in range(n) if m != mode]
+        indices = ops.quadrature_indices(kept, n)
+        self.means = self.means[indices]
+        self.cov = self.cov[np.ix_(indices, indices)]
+        self.number_of_modes -= 1
+
+    def get_state(self) -> GaussianState:
+        return GaussianState(
+            self.means.copy(), self.cov.copy(), self.number_of_modes, self.hbar
+        )
+
+    def fock_prob(self, pattern, modes=None):
+        """
+        Probability of the photon number pattern (detector outcome)
+        """
+        return self.get_state().fock_prob(pattern, modes)
+
+
+class NonGaussianOperationException(Exception):
+    """
+    Raised when the operation can't be simulated by the Gaussian backend
+    """
@@ -0,0 +1,138 @@
+"""
+This module implements the matrix product state (MPS) Fock backend,
+suitable for circuits with many modes and low entanglement
+"""
+import cmath
+
+import numpy as np
+
+from quasi.backend.backend import FockBackend
+from quasi._math.fock import (a, adagger,
+                              cached_squeezing, cached_displacement,
+                              cached_beamsplitter, cached_phase)
+from quasi._math.fock.mps import MPS
+from quasi._math.fock.ops import fock_state
+
+
+class MPSBackend(FockBackend):
+    """
+    Fock backend, which keeps the state as the matrix product state.
+    Operators are applied immediately, bonds are truncated to the
+    maximal bond dimension and the error budget (discarded weight
+    allowed per truncation).
+    """
+
+    def __init__(self):
+        self.number_of_modes = 0
+        self.cutoff = 10
+        self.max_bond = None
+        self.tolerance = 0.0
+        self.state = None
+
+    def initialize(self):
+        """
+        Creates the vacuum state, run before the simulation
+        """
+        self.state = MPS(
+            self.number_of_modes,
+            self.cutoff,
+            max_bond=self.max_bond,
+            tolerance=self.tolerance,
+        )
+
+    def set_number_of_modes(self, number_of_modes):
+        """
+        Set the number of modes
+        """
+        self.number_of_modes = number_of_modes
+
+    def set_dimensions(self, dimensions):
+        """
+        Set the cutoff of the modes
+        """
+        self.cutoff = dimensions
+
+    def set_bond_dimension(self, max_bond):
+        """
+        Sets the maximal bond dimension, None disables the limit
+        """
+        self.max_bond = max_bond
+        if self.state is not None:
+            self.state.max_bond = max_bond
+
+    def set_error_budget(self, tolerance):
+        """
+        Sets the weight of the singular values, which can be discarded
+        in a single truncation
+        """
+        self.tolerance = tolerance
+        if self.state is not None:
+            self.state.tolerance = tolerance
+
+    def discarded_weight(self):
+        """
+        Returns the accumulated weight discarded by the truncations
+        """
+        return self.state.discarded_weight
+
+    def create(self, mode):
+        """
+        Return the creation operator
+        """
+        return adagger(self.cutoff)
+
+    def destroy(self, mode):
+        """
+        Return the annihilation operator
+        """
+        return a(self.cutoff)
+
+    def squeeze(self, z: complex, mode):
+        """
+        Return the squeezing operator
+        """
+        return cached_squeezing(abs(z), cmath.phase(z), self.cutoff)
+
+    def displace(self, alpha: float, phi: float, mode):
+        """
+        Returns the displace operator
+        """
+        return cached_displacement(alpha, phi, self.cutoff)
+
+    def phase_shift(self, theta: float, mode):
+        return cached_phase(theta, self.cutoff)
+
+    def number(self, mode):
+        return np.diag(np.arange(self.cutoff, dtype=np.complex128))
+
+    def beam_splitter(self, theta=0, phi=0):
+        """
+        Returns the beamsplitter operator
+        """
+        return cached_beamsplitter(theta, phi, self.cutoff).transpose((0, 2, 1, 3))
+
+    def apply_operator(self, operator, modes):
+        if self.state is None:
+            self.initialize()
+        self.state.apply_gate(operator, modes)
+
+    def initialize_number_state(self, n: int, mode: int):
+        """
+        Initialize the number state, the mode has to be in the vacuum
+        """
+        if isinstance(mode, int):
+            mode = [mode]
+        operator = np.outer(fock_state(n, self.cutoff), fock_state(0, self.cutoff))
+        self.apply_operator(operator, mode)
+
+    def remove_mode(self, mode: int, outcome: int = None):
+        """
+        Removes the mode from the state
+        """
+        self.state.remove_mode(mode, outcome)
+
+    def get_state(self):
+        """
+        Returns the full state, feasible for a small number of modes only
+        """
+        return self.state.to_state()
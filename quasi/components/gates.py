@@ -3,7 +3,12 @@ from builtins import str
 import requests
 
 from abc import ABC
-from quasi._math.fock import displacement, beamsplitter, phase, squeezing
+from quasi._math.fock import (
+    cached_displacement,
+    cached_beamsplitter,
+    cached_phase,
+    cached_squeezing,
+)
 
 
 class Components(ABC):
@@ -81,7 +86,7 @@ class Beamsplitter(Components):
 
     def get_operator(self):
         if self.math_equation is None:
-            self.matrix = beamsplitter(self.theta, self.phi, self.cutoff)
+            self.matrix = cached_beamsplitter(self.theta, self.phi, self.cutoff)
             return self.matrix
         else:
             raise NotImplementedError
@@ -112,7 +117,7 @@ class Displacment(Components):
 
     def get_operator(self):
         if self.math_equation is None:
-            self.matrix = displacement(self.r, self.phi, self.cutoff)
+            self.matrix = cached_displacement(self.r, self.phi, self.cutoff)
             return self.matrix
         else:
             raise NotImplementedError
@@ -143,7 +148,7 @@ class Squeezing(Components):
 
     def get_operator(self):
         if self.math_equation is None:
-            return squeezing(self.r, self.phi, self.cutoff)
+            return cached_squeezing(self.r, self.phi, self.cutoff)
         else:
             raise NotImplementedError
 
@@ -170,7 +175,7 @@ class Phase(Components):
 
     def get_operator(self):
         if self.math_equation is None:
-            self.matrix = phase(self.phi, self.cutoff)
+            self.matrix = cached_phase(self.phi, self.cutoff)
             return self.matrix
         else:
             raise NotImplementedError
@@ -100,6 +100,14 @@ class IdealBeamSplitter(GenericDevice):
         self.incomming_photons = []
         self.scheduled_event_time = None
 
+    def save_component_state(self):
+        # Waiting photons hold the envelopes, which are mutated in place,
+        # so the device can't be rolled back, only moved with its events
+        return self.incomming_photons, self.scheduled_event_time
+
+    def restore_component_state(self, state):
+        self.incomming_photons, self.scheduled_event_time = state
+
     @ensure_output_compute
     @wait_input_compute
     def compute_outputs(self):
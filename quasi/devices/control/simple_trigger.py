@@ -57,6 +57,12 @@ class SimpleTrigger(GenericDevice):
         self.simulation = Simulation.get_instance()
         self.simulation.schedule_event(0, self)
 
+    def save_state(self):
+        return self.time
+
+    def restore_state(self, state):
+        self.time = state
+
     @ensure_output_compute
     @coordinate_gui
     @wait_input_compute
@@ -58,6 +58,14 @@ class IdealDetector(GenericDevice):
 
     reference = None
 
+    def save_component_state(self):
+        # Measured envelopes are carried by the events, the detector
+        # itself doesn't hold any state
+        return None
+
+    def restore_component_state(self, state):
+        pass
+
     @ensure_output_compute
     @coordinate_gui
     @wait_input_compute
@@ -74,6 +82,7 @@ class IdealDetector(GenericDevice):
         signal = GenericIntSignal()
         print(outcome)
         signal.set_int(outcome[0])
+        self.simulation.record_result(self, time, outcome[0])
 
         results = [("output", signal, time)]
         return results
@@ -79,6 +79,12 @@ class IdealFiber(GenericFiber):
         super().__init__(name=name, uid=uid)
         self.length = None
 
+    def save_state(self):
+        return self.length
+
+    def restore_state(self, state):
+        self.length = state
+
     @ensure_output_compute
     @coordinate_gui
     @wait_input_compute
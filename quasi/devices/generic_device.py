@@ -13,6 +13,7 @@ from quasi.extra import Loggers, get_custom_logger
 from quasi.signals.generic_signal import GenericSignal
 from quasi.devices.port import Port
 from quasi.simulation import ModeManager
+from quasi.simulation.time_warp import RollbackNotSupportedException
 
 
 def log_action(method):
@@ -243,6 +244,62 @@ class GenericDevice(ABC):  # pylint: disable=too-few-public-methods
         else:
             raise DESActionNotDefined("Either des or des_action method must be defined")
 
+    def save_state(self):
+        """
+        Returns a snapshot of the device state, used by the optimistic
+        (Time Warp) simulation to roll the device back. Devices opt in
+        by implementing save_state and restore_state.
+        """
+        raise RollbackNotSupportedException(
+            f"{self.__class__.__name__} can't save its state"
+        )
+
+    def restore_state(self, state):
+        """
+        Restores the device state from the snapshot
+        """
+        raise RollbackNotSupportedException(
+            f"{self.__class__.__name__} can't restore its state"
+        )
+
+    @classmethod
+    def supports_rollback(cls) -> bool:
+        """
+        Returns True if device implements the state saving hooks
+        """
+        return (
+            cls.save_state is not GenericDevice.save_state
+            and cls.restore_state is not GenericDevice.restore_state
+        )
+
+    def save_component_state(self):
+        """
+        Returns a snapshot of the device state, which the worker process
+        executing the connected component of the device sends back to
+        the simulation (see Simulation.set_processes). The snapshot is
+        pickled together with the pending events of the component, so it
+        may share objects with them (e.g. envelopes held by the device).
+        Defaults to save_state.
+        """
+        return self.save_state()
+
+    def restore_component_state(self, state):
+        """
+        Restores the device state from the component snapshot
+        """
+        self.restore_state(state)
+
+    @classmethod
+    def supports_component_state(cls) -> bool:
+        """
+        Returns True if device implements the component state hooks
+        """
+        return cls.supports_rollback() or (
+            cls.save_component_state is not GenericDevice.save_component_state
+            and cls.restore_component_state
+            is not GenericDevice.restore_component_state
+        )
+
     def get_next_device_and_port(self, port: str):
         port = self.ports[port]
         if port.signal:
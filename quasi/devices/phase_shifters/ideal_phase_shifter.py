@@ -72,12 +72,19 @@ class IdealPhaseShifter(GenericDevice):
         self.register_signal(signal=theta_sig, port_label="theta")
         theta_sig.set_computed()
 
+    def save_state(self):
+        return self.theta
+
+    def restore_state(self, state):
+        self.theta = state
+
     @ensure_output_compute
     @coordinate_gui
     @wait_input_compute
     def compute_outputs(self, *args, **kwargs):
         simulation = Simulation.get_instance()
-        if simulation.simulation_type is SimulationType.FOCK:
+        # The Gaussian backend exposes the same operator interface
+        if simulation.simulation_type in (SimulationType.FOCK, SimulationType.GAUSSIAN):
             self.simulate_fock()
 
     def simulate_fock(self):
@@ -82,6 +82,12 @@ class IdealCoherentSource(GenericDevice):
         self.alpha = None
         self.phi = None
 
+    def save_state(self):
+        return self.alpha, self.phi
+
+    def restore_state(self, state):
+        self.alpha, self.phi = state
+
     def set_displacement(self, alpha: float, phi: float):
         """
         Sets the signals so that the source correctly displaces the vacuum
@@ -100,7 +106,8 @@ class IdealCoherentSource(GenericDevice):
     @wait_input_compute
     def compute_outputs(self, *args, **kwargs):
         simulation = Simulation.get_instance()
-        if simulation.simulation_type is SimulationType.FOCK:
+        # The Gaussian backend exposes the same operator interface
+        if simulation.simulation_type in (SimulationType.FOCK, SimulationType.GAUSSIAN):
             self.simulate_fock()
 
     def simulate_fock(self):
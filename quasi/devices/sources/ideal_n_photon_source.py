@@ -77,6 +77,12 @@ class IdealNPhotonSource(GenericDevice):
         photon_num_sig.set_computed()
     
 
+    def save_state(self):
+        return self.photon_num
+
+    def restore_state(self, state):
+        self.photon_num = state
+
     @ensure_output_compute
     @coordinate_gui
     @wait_input_compute
@@ -1,5 +1,9 @@
+import functools
+
 from quasi._math.states import FockState
-from quasi._math.fock import ops
+from quasi._math.fock import ops, kernels
+from quasi._math.fock.sectors import SectorFockState, SectorState
+from quasi.experiment.gate_fusion import fuse_operations
 
 import numpy as np
 
@@ -26,6 +30,18 @@ class Experiment:
         self.operations = []
         self.channels = []
         self.state = None
+        self.gate_method = "blas"
+        self.use_ket = True
+        self.fuse_gates = True
+        self.use_sectors = False
+        self.dtype = np.complex128
+        self.sector_state = None
+        self.batch_states = None
+        self.batch_expected_traces = None
+        self.expected_trace = 1.0
+        self.mode_cutoffs = None
+        self.layout = None
+        self._axes = []
         self.initialized = True  # Mark the instance as initialized
 
     def reset(self):
@@ -41,9 +57,57 @@ class Experiment:
         self.operations = []
         self.channels = []
         self.state = None
+        self.gate_method = "blas"
+        self.use_ket = True
+        self.fuse_gates = True
+        self.use_sectors = False
+        self.dtype = np.complex128
+        self.sector_state = None
+        self.batch_states = None
+        self.batch_expected_traces = None
+        self.expected_trace = 1.0
+        self.mode_cutoffs = None
+        self.layout = None
+        self._axes = []
+
+    def set_gate_method(self, method):
+        """
+        Selects the gate application method, "blas", "einsum" or
+        "numba" (multithreaded in place kernel, see Simulation.set_threads)
+        """
+        self.gate_method = method
+
+    def set_use_ket(self, use_ket):
+        """
+        Enables the pure state (ket) representation, which is used
+        until a channel mixes the state
+        """
+        self.use_ket = use_ket
+
+    def set_fuse_gates(self, fuse_gates):
+        """
+        Enables fusion of consecutive gates acting on the same modes
+        """
+        self.fuse_gates = fuse_gates
+
+    def set_use_sectors(self, use_sectors):
+        """
+        Enables the block-sparse photon number sector representation,
+        which is efficient for passive linear optics
+        """
+        self.use_sectors = use_sectors
+
+    def set_dtype(self, dtype):
+        """
+        Selects the precision of the state, np.complex64 halves the memory
+        and speeds up the contractions at the cost of the accuracy (see
+        precision_error). Operators are cast to the dtype when applied.
+        """
+        self.dtype = np.dtype(dtype).type
 
     def update_mode_number(self, num_modes):
         self.num_modes = num_modes
+        self.layout = None
 
 
     def update_dimensions(self, dimensions):
@@ -52,6 +116,27 @@ class Experiment:
         """
         self.cutoff = dimensions
 
+    def set_mode_cutoffs(self, mode_cutoffs):
+        """
+        Sets the truncation of every mode, the state size is then the
+        product of the per-mode dimensions. Gates and Kraus operators are
+        built with the global cutoff and truncated to the modes they act on.
+        None restores the global cutoff for all of the modes.
+        """
+        self.mode_cutoffs = None if mode_cutoffs is None else list(mode_cutoffs)
+
+    def _cutoff_dim(self):
+        if self.mode_cutoffs is None:
+            return self.cutoff
+        return [self.mode_cutoffs[m] for m in self._axes]
+
+    def _truncate(self, operator, modes):
+        if self.mode_cutoffs is None:
+            return operator
+        if isinstance(modes, int):
+            modes = [modes]
+        return ops.truncate_gate(operator, [self.mode_cutoffs[m] for m in modes])
+
     @staticmethod
     def get_instance():
         """
@@ -61,19 +146,112 @@ class Experiment:
             raise Exception("Experiment instance not created yet")
         return Experiment.__instance
 
+    def _original(self, modes):
+        """
+        Translates the current mode indices (compacted after mode
+        removals) into the indices of the initially allocated modes,
+        which are used by the recorded steps
+        """
+        if self.layout is None:
+            return modes
+        if isinstance(modes, int):
+            return self.layout[modes]
+        return [self.layout[m] for m in modes]
+
     def add_operation(self, operator, modes):
-        self.operations.append((operator, modes))
+        self.operations.append((operator, self._original(modes)))
 
-    def prepare_experiment(self):
-        ground_state = ops.vacuumStateMixed(self.num_modes, trunc=self.cutoff)
+    def add_channel(self, kraus_ops, modes):
+        """
+        Adds the channel given by its Kraus operators, channels are
+        applied after all of the operations
+        """
+        self.channels.append((kraus_ops, self._original(modes)))
+
+    def remove_mode(self, mode, outcome=None):
+        """
+        Removes the mode from the experiment, the mode is traced out or,
+        if the outcome is given, projected onto the outcome number state.
+        Following modes are shifted down by one index. Channels pending
+        on the removed mode are applied before it is removed.
+        """
+        if self.layout is None:
+            self.layout = list(range(self.num_modes))
+        original = self.layout.pop(mode)
+        pending = []
+        remaining = []
+        for channel, modes in self.channels:
+            modes = [modes] if isinstance(modes, int) else list(modes)
+            (pending if original in modes else remaining).append((channel, modes))
+        self.channels = remaining
+        self.operations.append((ModeRemoval(outcome, pending), [original]))
+
+    def _has_removals(self):
+        return any(isinstance(op, ModeRemoval) for op, _ in self.operations)
+
+    def prepare_experiment(self, num_modes=None):
+        """
+        Prepares the vacuum state of the first num_modes modes (all by
+        default), as a ket if the pure state representation is enabled
+        """
+        if num_modes is None:
+            num_modes = self.num_modes
+        self._axes = list(range(num_modes))
+        if self.use_ket:
+            ground_state = ops.vacuum_state(
+                num_modes, self._cutoff_dim(), dtype=self.dtype
+            )
+        else:
+            ground_state = ops.vacuumStateMixed(
+                num_modes, trunc=self._cutoff_dim(), dtype=self.dtype
+            )
         self.state = FockState(
             ground_state,
-            self.num_modes,
-            cutoff_dim=self.cutoff,
+            num_modes,
+            cutoff_dim=self._cutoff_dim(),
             hbar=self.hbar,
+            pure=self.use_ket,
         )
         return self.state
 
+    def _new_state(self, data, pure=False, normalized=False):
+        self.state = FockState(
+            state_data=data,
+            num_modes=len(self._axes),
+            cutoff_dim=self._cutoff_dim(),
+            hbar=self.hbar,
+            pure=pure,
+            normalized=normalized,
+        )
+
+    def _positions(self, modes):
+        """
+        Positions of the modes in the state, modes, which were not
+        allocated yet, are appended in the vacuum state
+        """
+        missing = [m for m in modes if m not in self._axes]
+        if missing:
+            dims = ops.mode_dims(
+                len(missing),
+                self.cutoff
+                if self.mode_cutoffs is None
+                else [self.mode_cutoffs[m] for m in missing],
+            )
+            if self.state.is_pure:
+                vacuum = ops.vacuum_state(len(missing), dims, dtype=self.dtype)
+                data = self.state.ket(normalize=False)
+            else:
+                vacuum = ops.vacuumStateMixed(len(missing), dims, dtype=self.dtype)
+                data = self.state.dm(normalize=False)
+            normalized = self.state.is_normalized
+            self._axes += missing
+            self._new_state(
+                np.tensordot(data, vacuum, axes=0),
+                pure=self.state.is_pure,
+                normalized=normalized,
+            )
+        return [self._axes.index(m) for m in modes]
+
     def prepare_multimode(self, data, modes):
         r"""
         Prepares a given mode or list of modes in the given state.
@@ -123,7 +301,7 @@ class Experiment:
         )
 
     def state_init(self, photon_number, modes):
-        self.state_preparations.append((photon_number, modes))
+        self.state_preparations.append((photon_number, self._original(modes)))
 
     def _state_init(self, state_preparation: int, modes):
         vector = ops.fock_state(state_preparation, self.cutoff)
@@ -138,47 +316,506 @@ class Experiment:
 
         self.alloc()
 
-    def execute(self):
-        self.prepare_experiment()
-        if len(self.state_preparations) > 0:
-            for photon_number, modes in self.state_preparations:
+    def _apply_gate(self, operator, modes):
+        """
+        Applies the gate to the current state, keeping the ket
+        representation if the state is pure
+        """
+        if isinstance(modes, int):
+            modes = [modes]
+        operator = self._truncate(operator, modes).astype(self.dtype, copy=False)
+        positions = self._positions(modes)
+        n = len(self._axes)
+        # The state is normalized lazily, when it is read
+        if self.state.is_pure and self.gate_method == "numba" and len(modes) <= 2:
+            new_st = kernels.apply_gate_ket(
+                operator, self.state.ket(normalize=False), positions, n
+            )
+        elif self.state.is_pure:
+            new_st = ops.apply_gate_ket(
+                operator, self.state.ket(normalize=False), positions, n
+            )
+        else:
+            new_st = ops.apply_gate_inplace(
+                operator,
+                self.state.dm(normalize=False),
+                positions,
+                n,
+                self.cutoff,
+                method=self.gate_method,
+            )
+        self._new_state(new_st, pure=self.state.is_pure)
+
+    def _init_number_state(self, photon_number, modes, prepared):
+        """
+        Prepares the number state by moving the vacuum amplitudes of the
+        mode into the slot of the photon number (a single strided
+        assignment). Only modes still in the vacuum, i.e. not in
+        prepared, can be initialized this way, the others fall back to
+        the preparation operator.
+        """
+        if isinstance(modes, int):
+            modes = [modes]
+        for mode in modes:
+            if mode in prepared:
+                # The operator doesn't preserve the norm of the occupied
+                # mode, the expected trace follows the state
+                before = self.state.trace
                 operator = ops.fock_operator(photon_number, self.cutoff)
-
-                new_st = ops.apply_gate_BLAS(
-                    operator, self.state.dm(), modes, self.num_modes, self.cutoff
+                self._apply_gate(operator, [mode])
+                if before > 0:
+                    self.expected_trace *= self.state.trace / before
+                continue
+            prepared.add(mode)
+            position = self._positions([mode])[0]
+            pure = self.state.is_pure
+            if pure:
+                data = self.state.ket(normalize=False)
+                axes = [position]
+            else:
+                data = self.state.dm(normalize=False)
+                axes = [2 * position, 2 * position + 1]
+            if photon_number >= data.shape[axes[0]]:
+                raise ValueError(
+                    f"Photon number {photon_number} exceeds the cutoff of mode {mode}"
                 )
+            if photon_number == 0:
+                continue
+            vacuum = [slice(None)] * data.ndim
+            number = [slice(None)] * data.ndim
+            for axis in axes:
+                vacuum[axis] = 0
+                number[axis] = photon_number
+            # The state was allocated by the execution and is not shared
+            data[tuple(number)] = data[tuple(vacuum)]
+            data[tuple(vacuum)] = 0
+            self._new_state(data, pure=pure, normalized=self.state.is_normalized)
+
+    def truncation_loss(self):
+        """
+        Returns the fraction of the norm, which was lost due to the
+        Fock space truncation. The state is renormalized when read, so
+        this is the only trace of the loss.
+        """
+        if self.expected_trace == 0:
+            return 0.0
+        return 1 - self.state.trace / self.expected_trace
 
-                new_st = new_st / ops.calculate_trace(self.state)
+    def precision_error(self):
+        """
+        Executes the recorded experiment in the selected precision and in
+        double precision and returns the largest absolute difference of
+        the Fock basis probabilities. The state of the selected precision
+        is kept. Meant to be run on a small sample circuit before a sweep.
+        """
+        dtype = self.dtype
+        self.dtype = np.complex128
+        try:
+            self.execute()
+            reference = self.state.all_fock_probs()
+        finally:
+            self.dtype = dtype
+        self.execute()
+        return float(np.max(np.abs(self.state.all_fock_probs() - reference)))
+
+    def _mix_state(self):
+        """
+        Converts the pure state into the density matrix representation
+        """
+        if self.state.is_pure:
+            self._new_state(
+                ops.mix(self.state.ket(normalize=False), len(self._axes)),
+                normalized=self.state.is_normalized,
+            )
+
+    def _apply_channel(self, channel, modes):
+        if isinstance(modes, int):
+            modes = [modes]
+        channel = [
+            self._truncate(k, modes).astype(self.dtype, copy=False) for k in channel
+        ]
+        positions = self._positions(modes)
+        self._mix_state()
+        self.data = ops.apply_channel(self.state, kraus_ops=channel, modes=positions)
+        self._new_state(self.data, normalized=self.state.is_normalized)
+
+    def _remove(self, removal, mode):
+        """
+        Applies the pending channels of the mode, then projects it onto
+        the outcome (if given) and traces it out
+        """
+        for channel, modes in removal.channels:
+            self._apply_channel(channel, modes)
+        position = self._positions([mode])[0]
+        pure = self.state.is_pure
+        if removal.outcome is not None:
+            before = self.state.trace
+            if pure:
+                index = [slice(None)] * len(self._axes)
+                index[position] = removal.outcome
+                data = self.state.ket(normalize=False)[tuple(index)]
+            else:
+                index = [slice(None)] * (2 * len(self._axes))
+                index[2 * position] = removal.outcome
+                index[2 * position + 1] = removal.outcome
+                data = self.state.dm(normalize=False)[tuple(index)]
+        else:
+            self._mix_state()
+            pure = False
+            data = ops.partial_trace(
+                self.state.dm(normalize=False), len(self._axes), [position]
+            )
+        del self._axes[position]
+        self._new_state(data, pure=pure)
+        if removal.outcome is not None and before > 0:
+            # Projection is not trace preserving, expected trace follows
+            # the probability of the outcome
+            self.expected_trace *= self.state.trace / before
+
+    def _order_axes(self):
+        """
+        Allocates the modes, which were never used and transposes the
+        state, so that the remaining modes are ordered by their index
+        """
+        removed = {
+            modes[0] for op, modes in self.operations if isinstance(op, ModeRemoval)
+        }
+        unused = [m for m in range(self.num_modes) if m not in removed]
+        self._positions(unused)
+        order = list(np.argsort(self._axes))
+        if order == list(range(len(order))):
+            return
+        if self.state.is_pure:
+            transpose_list = order
+            data = self.state.ket(normalize=False)
+        else:
+            transpose_list = [2 * p + i for p in order for i in (0, 1)]
+            data = self.state.dm(normalize=False)
+        normalized = self.state.is_normalized
+        self._axes = sorted(self._axes)
+        self._new_state(
+            np.transpose(data, transpose_list),
+            pure=self.state.is_pure,
+            normalized=normalized,
+        )
 
-                self.state = FockState(
-                    state_data=new_st,
-                    num_modes=self.num_modes,
-                    cutoff_dim=self.cutoff,
+    def _prepare_sectors(self, photon_number, modes, sectors):
+        """
+        Prepares the number state in the sector representation, the
+        preparation operator doesn't preserve the norm of an occupied
+        mode, so the expected trace follows the state
+        """
+        if isinstance(modes, int):
+            modes = [modes]
+        operator = ops.fock_operator(photon_number, self.cutoff).astype(self.dtype)
+        for mode in modes:
+            if photon_number >= self.cutoff:
+                raise ValueError(
+                    f"Photon number {photon_number} exceeds the cutoff of mode {mode}"
                 )
+            before = sectors.trace()
+            sectors.apply_gate(operator, [mode])
+            if before > 0:
+                self.expected_trace *= sectors.trace() / before
 
-        if len(self.operations) > 0:
+    def _execute_sectors(self):
+        """
+        Executes the experiment in the photon number sector representation,
+        the state is kept in the sectors, the dense density matrix is only
+        assembled when it is read
+        """
+        if self.mode_cutoffs is not None:
+            raise ValueError("Sector representation requires a common cutoff")
+        if self._has_removals():
+            raise ValueError("Sector representation doesn't support mode removal")
+        self.expected_trace = 1.0
+        sectors = SectorState.vacuum(self.num_modes, self.cutoff, dtype=self.dtype)
+        for photon_number, modes in self.state_preparations:
+            self._prepare_sectors(photon_number, modes, sectors)
+        operations = self.operations
+        if self.fuse_gates:
+            operations = fuse_operations(operations)
+        for operator, modes in operations:
+            sectors.apply_gate(np.asarray(operator, dtype=self.dtype), modes)
+        for channel, modes in self.channels:
+            sectors.apply_kraus(
+                [np.asarray(k, dtype=self.dtype) for k in channel], modes
+            )
+
+        self.sector_state = sectors
+        self.data = None
+        self.state = SectorFockState(sectors, hbar=self.hbar)
 
-            for operator, modes in self.operations:
-                new_st = ops.apply_gate_BLAS(
-                    operator, self.state.dm(), modes, self.num_modes, self.cutoff
-                )
-                new_st = new_st / ops.calculate_trace(self.state)
+    def execute(self):
+        if self.use_sectors:
+            self._execute_sectors()
+            return
+        self.expected_trace = 1.0
+        removals = self._has_removals()
+        # With mode removal the modes are allocated when first used,
+        # which keeps the state size bounded
+        self.prepare_experiment(0 if removals else None)
+        prepared = set()
+        for photon_number, modes in self.state_preparations:
+            self._init_number_state(photon_number, modes, prepared)
+
+        if len(self.operations) > 0:
+            for segment, removal in self._segments():
+                if self.fuse_gates:
+                    # Truncated before the fusion, the product of the
+                    # truncated gates differs from the truncated product
+                    segment = fuse_operations(
+                        [(self._truncate(op, modes), modes) for op, modes in segment]
+                    )
+                for operator, modes in segment:
+                    self._apply_gate(operator, modes)
+                if removal is not None:
+                    self._remove(*removal)
 
-                self.state = FockState(
-                    state_data=new_st,
-                    num_modes=self.num_modes,
-                    cutoff_dim=self.cutoff,
-                )
         if len(self.channels) > 0:
+            # Channels generally produce mixed states
+            self._mix_state()
             for channel, modes in self.channels:
-                self.data = ops.apply_channel(
-                    self.state, kraus_ops=channel, modes=modes
-                )
-                self.state = FockState(
-                    state_data=self.data,
-                    num_modes=self.num_modes,
-                    cutoff_dim=self.cutoff,
+                self._apply_channel(channel, modes)
+
+        if removals:
+            self._order_axes()
+
+    @staticmethod
+    def _is_batched(operator, modes):
+        """
+        Batched operators carry the leading batch axis
+        """
+        if isinstance(modes, int):
+            modes = [modes]
+        return np.ndim(operator) == 2 * len(modes) + 1
+
+    def execute_batch(self):
+        """
+        Executes the experiment for a batch of gate parameters. Operations
+        recorded with stacked operators (with the leading batch axis, e.g.
+        built by ops.beamsplitter_batch) take a different gate for every
+        batch element, the other operations are shared. All of the batch
+        elements are evolved together, returns the list of the (lazily
+        normalized) states, one for every batch element. The expected
+        trace of every element is kept in batch_expected_traces.
+        """
+        if self.mode_cutoffs is not None or self._has_removals():
+            raise ValueError(
+                "Batched execution requires a common cutoff and no mode removal"
+            )
+        sizes = {
+            len(operator)
+            for operator, modes in self.operations
+            if self._is_batched(operator, modes)
+        }
+        if len(sizes) > 1:
+            raise ValueError("Batched operations have different batch sizes")
+        batch = sizes.pop() if sizes else 1
+
+        n = self.num_modes
+        pure = self.use_ket and not self.channels
+        dims = [self.cutoff] * (n if pure else 2 * n)
+        state = np.zeros([batch] + dims, dtype=self.dtype)
+        state[(slice(None),) + (0,) * len(dims)] = 1.0
+        self.expected_trace = 1.0
+        self.batch_expected_traces = np.ones(batch)
+        for photon_number, modes in self.state_preparations:
+            state = self._prepare_batch(photon_number, modes, state, pure)
+        for operator, modes in self.operations:
+            state = self._apply_batch(operator, state, modes, pure)
+        for channel, modes in self.channels:
+            state = sum(self._apply_batch(k, state, modes, pure) for k in channel)
+
+        self.batch_states = [
+            FockState(
+                data,
+                n,
+                cutoff_dim=self.cutoff,
+                hbar=self.hbar,
+                pure=pure,
+                normalized=False,
+            )
+            for data in state
+        ]
+        return self.batch_states
+
+    def _prepare_batch(self, photon_number, modes, state, pure):
+        """
+        Prepares the number state in every batch element, the preparation
+        operator doesn't preserve the norm of an occupied mode, so the
+        expected trace of every element follows its own state
+        """
+        if isinstance(modes, int):
+            modes = [modes]
+        operator = ops.fock_operator(photon_number, self.cutoff)
+        for mode in modes:
+            if photon_number >= self.cutoff:
+                raise ValueError(
+                    f"Photon number {photon_number} exceeds the cutoff of mode {mode}"
                 )
+            before = self._batch_traces(state, pure)
+            state = self._apply_batch(operator, state, [mode], pure)
+            after = self._batch_traces(state, pure)
+            self.batch_expected_traces *= np.divide(
+                after, before, out=np.ones_like(after), where=before > 0
+            )
+        return state
+
+    def _batch_traces(self, state, pure):
+        """
+        Traces of the (unnormalized) states of the batch
+        """
+        batch = len(state)
+        if pure:
+            return np.sum(np.abs(state.reshape(batch, -1)) ** 2, axis=1)
+        n = (state.ndim - 1) // 2
+        kets = [1 + 2 * i for i in range(n)]
+        bras = [2 + 2 * i for i in range(n)]
+        dim = self.cutoff**n
+        rho = state.transpose([0] + kets + bras).reshape(batch, dim, dim)
+        return np.real(np.trace(rho, axis1=1, axis2=2))
+
+    def _apply_batch(self, operator, state, modes, pure):
+        """
+        Applies the (shared or batched) operator to the batch of states,
+        density matrices get U rho U^dagger
+        """
+        if isinstance(modes, int):
+            modes = [modes]
+        batched = self._is_batched(operator, modes)
+        operator = np.asarray(operator).astype(self.dtype, copy=False)
+        if pure:
+            return ops.apply_gate_batch(operator, state, modes, batched)
+        state = ops.apply_gate_batch(
+            operator, state, [2 * m for m in modes], batched
+        )
+        return ops.apply_gate_batch(
+            operator.conj(), state, [2 * m + 1 for m in modes], batched
+        )
+
+    def _segments(self):
+        """
+        Splits the operations into runs of gates separated by mode removals
+        """
+        segment = []
+        for operator, modes in self.operations:
+            if isinstance(operator, ModeRemoval):
+                yield segment, (operator, modes[0])
+                segment = []
+            else:
+                segment.append((operator, modes))
+        yield segment, None
+
+    def mode_groups(self):
+        """
+        Groups the modes, which are coupled by the preparations,
+        operations or channels. Groups are never entangled with each other.
+        """
+        parent = list(range(self.num_modes))
+
+        def find(m):
+            while parent[m] != m:
+                parent[m] = parent[parent[m]]
+                m = parent[m]
+            return m
+
+        steps = self.state_preparations + self.operations + self.channels
+        for _, modes in steps:
+            modes = [modes] if isinstance(modes, int) else list(modes)
+            for m in modes[1:]:
+                parent[find(m)] = find(modes[0])
+
+        groups = {}
+        for m in range(self.num_modes):
+            groups.setdefault(find(m), []).append(m)
+        return list(groups.values())
+
+    def _execute_group(self, group):
+        """
+        Executes the part of the experiment acting on the group of modes,
+        (in the worker process) and returns its unnormalized state
+        """
+        local = {m: i for i, m in enumerate(group)}
+
+        def remap(steps):
+            remapped = []
+            for op, modes in steps:
+                modes = [modes] if isinstance(modes, int) else list(modes)
+                if all(m in local for m in modes):
+                    remapped.append((op, [local[m] for m in modes]))
+            return remapped
+
+        self.state_preparations = remap(self.state_preparations)
+        self.operations = remap(self.operations)
+        self.channels = remap(self.channels)
+        self.num_modes = len(group)
+        if self.mode_cutoffs is not None:
+            self.mode_cutoffs = [self.mode_cutoffs[m] for m in group]
+        self.execute()
+        if self.state.is_pure:
+            return self.state.ket(normalize=False), True, self.expected_trace
+        return self.state.dm(normalize=False), False, self.expected_trace
+
+    def _group_cutoff(self, group):
+        if self.mode_cutoffs is None:
+            return self.cutoff
+        return [self.mode_cutoffs[m] for m in group]
+
+    def execute_parallel(self, max_processes=None):
+        """
+        Executes independent groups of modes in separate processes and
+        combines the resulting states with the tensor product
+        """
+        # pylint: disable=import-outside-toplevel
+        from quasi.simulation.parallel import fork_available, run_in_processes
+
+        groups = self.mode_groups()
+        if len(groups) < 2 or not fork_available() or self._has_removals():
+            self.execute()
+            return
+        jobs = [functools.partial(self._execute_group, g) for g in groups]
+        results = run_in_processes(jobs, max_processes=max_processes)
+
+        pure = all(p for _, p, _ in results)
+        states = [
+            st
+            if p == pure
+            else FockState(
+                st, len(g), self._group_cutoff(g), pure=p
+            ).dm(normalize=False)
+            for (st, p, _), g in zip(results, groups)
+        ]
+        self.expected_trace = float(np.prod([t for _, _, t in results]))
+        data = states[0]
+        for state in states[1:]:
+            data = np.tensordot(data, state, axes=0)
+        position = {m: p for p, m in enumerate(m for g in groups for m in g)}
+        if pure:
+            transpose_list = [position[m] for m in range(self.num_modes)]
+        else:
+            transpose_list = [
+                2 * position[m] + i for m in range(self.num_modes) for i in (0, 1)
+            ]
+        self.data = np.transpose(data, transpose_list)
+        self.state = FockState(
+            state_data=self.data,
+            num_modes=self.num_modes,
+            cutoff_dim=self._cutoff_dim(),
+            hbar=self.hbar,
+            pure=pure,
+            normalized=False,
+        )
+
+
+class ModeRemoval:
+    """
+    Step in the operations, which removes the mode from the state
+    """
+
+    def __init__(self, outcome=None, channels=None):
+        self.outcome = outcome
+        self.channels = channels or []
 
 
 class ExperimentInitializedException(Exception):
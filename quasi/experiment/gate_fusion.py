@@ -0,0 +1,88 @@
+"""
+Gate fusion
+
+Optimisation pass over the experiment operations. Runs of gates acting
+on the same set of modes are multiplied together into a single gate, so
+that the (full) state is contracted only once per run. Gates acting on
+disjoint modes commute, so a gate is fused with the last gate on the
+same modes as long as no gate in between overlaps with its modes.
+
+Gates use the (out1, in1, out2, in2, ...) index layout, every mode
+may have its own dimension (gates truncated to per-mode cutoffs).
+"""
+
+import numpy as np
+
+
+def _normalize_modes(modes):
+    if isinstance(modes, int):
+        return [modes]
+    return list(modes)
+
+
+def _to_matrix(gate, size):
+    """
+    Reshapes the gate tensor into a (dim, dim) matrix, where dim is the
+    product of the dimensions of its modes
+    """
+    gate = np.asarray(gate)
+    if size == 1:
+        return gate
+    dim = int(np.prod(gate.shape[::2]))
+    out_axes = [2 * i for i in range(size)]
+    in_axes = [2 * i + 1 for i in range(size)]
+    return gate.transpose(out_axes + in_axes).reshape(dim, dim)
+
+
+def _to_tensor(matrix, size, dims):
+    """
+    Inverse of the _to_matrix, dims are the dimensions of the modes
+    """
+    if size == 1:
+        return matrix
+    tensor = matrix.reshape(list(dims) * 2)
+    transpose_list = [k for i in range(size) for k in (i, i + size)]
+    return tensor.transpose(transpose_list)
+
+
+def _reorder(gate, modes, target_modes):
+    """
+    Permutes the gate indices, so that they follow the target mode order
+    """
+    if modes == target_modes:
+        return gate
+    position = [modes.index(m) for m in target_modes]
+    transpose_list = [2 * p + i for p in position for i in (0, 1)]
+    return np.transpose(gate, transpose_list)
+
+
+def fuse_operations(operations):
+    """
+    Returns the list of (operator, modes) with the gates on the same
+    mode set fused together, the result is equivalent to applying the
+    operations in the given order
+    """
+    fused = []
+    for operator, modes in operations:
+        modes = _normalize_modes(modes)
+        mode_set = set(modes)
+        target = None
+        for index in range(len(fused) - 1, -1, -1):
+            other_modes = fused[index][1]
+            if set(other_modes) == mode_set:
+                target = index
+                break
+            if mode_set & set(other_modes):
+                break
+
+        if target is None:
+            fused.append([operator, modes])
+            continue
+
+        previous, target_modes = fused[target]
+        size = len(modes)
+        dims = np.shape(previous)[::2]
+        operator = _reorder(np.asarray(operator), modes, target_modes)
+        matrix = _to_matrix(operator, size) @ _to_matrix(previous, size)
+        fused[target][0] = _to_tensor(matrix, size, dims)
+    return [(operator, modes) for operator, modes in fused]
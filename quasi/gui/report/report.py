@@ -1,8 +1,10 @@
 import flet as ft
 import logging
+from collections import deque
 
 class GuiLogHandler(logging.Handler):
     __instance = None
+    max_buffer_size = 10000
 
     def __new__(cls, *args, **kwargs):
         if cls.__instance is None:
@@ -13,8 +15,8 @@ class GuiLogHandler(logging.Handler):
         super().__init__()
         if not hasattr(self, 'initialized'):  # Prevents reinitialization
             self.output_control = output_control
-            self.log_buffer = []
-            self.new_buffer = []
+            self.log_buffer = deque(maxlen=self.max_buffer_size)
+            self.new_buffer = deque(maxlen=self.max_buffer_size)
             self.log_count = 0
             self.ready = False
 
@@ -39,6 +41,23 @@ class GuiLogHandler(logging.Handler):
             self.output_control.logs_control.update()
             self.log_buffer.clear()
 
+    def flush(self):
+        """
+        Flushes buffered entries to the gui, entries which can't be
+        displayed are dropped
+        """
+        self.flush_logs()
+        self.log_buffer.clear()
+        self.new_buffer.clear()
+
+    def set_max_buffer_size(self, size):
+        """
+        Bounds the number of log entries held while the gui isn't ready
+        """
+        self.max_buffer_size = size
+        self.log_buffer = deque(self.log_buffer, maxlen=size)
+        self.new_buffer = deque(self.new_buffer, maxlen=size)
+
     def set_ready(self, ready):
         self.ready = ready
         if ready:
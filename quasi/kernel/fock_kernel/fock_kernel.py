@@ -2,7 +2,12 @@
 This module implements a Fock Kernel
 """
 from typing import List
+
+import numpy as np
+
 from quasi.kernel.generic_kernel import GenericKernel
+from quasi._math import states
+from quasi._math.fock import ops
 
 
 class FockMode():
@@ -12,44 +17,316 @@ class FockMode():
     def __init__(self, truncation):
         self.truncation = truncation
 
+
 class FockState():
     """
-    This class keeps track of the modes
+    This class keeps track of a group of (mutually entangled) modes and
+    holds their state, a ket while the state is pure and a density matrix
+    otherwise. Every mode has its own truncation.
     """
-    def __init__(self, fock_mode: FockMode):
+    def __init__(self, fock_mode: FockMode, index: int):
+        self.modified = True
+        self.modes = [index]
+        self.fock_modes = [fock_mode]
+        self.pure = True
+        self.data = ops.vacuum_state(1, [fock_mode.truncation])
+
+    @property
+    def dims(self) -> List[int]:
+        return [fm.truncation for fm in self.fock_modes]
+
+    def local(self, modes):
+        """
+        Positions of the kernel modes in the state tensor
+        """
+        return [self.modes.index(m) for m in modes]
+
+    def mix(self):
+        """
+        Converts the ket into the density matrix
+        """
+        if self.pure:
+            self.data = ops.mix(self.data, len(self.modes))
+            self.pure = False
+
+    def apply_gate(self, operator, modes):
+        """
+        Applies the gate with (out1, in1, ...) indices, the gate is
+        truncated to the dimensions of the modes
+        """
+        local = self.local(modes)
+        operator = ops.truncate_gate(operator, [self.dims[i] for i in local])
+        n = len(self.modes)
+        if self.pure:
+            self.data = ops.apply_gate_ket(operator, self.data, local, n)
+        else:
+            self.data = ops.apply_gate_BLAS(operator, self.data, local, n, None)
+        self.modified = True
+
+    def apply_channel(self, kraus_ops, modes):
+        """
+        Applies the channel given by the Kraus operators
+        """
+        self.mix()
+        local = self.local(modes)
+        dims = [self.dims[i] for i in local]
+        kraus_ops = [ops.truncate_gate(k, dims) for k in kraus_ops]
+        n = len(self.modes)
+        if len(local) == 1:
+            self.data = ops.apply_superoperator(
+                ops.superoperator(kraus_ops), self.data, local[0], n
+            )
+        else:
+            self.data = ops.apply_kraus_stacked(kraus_ops, self.data, local, n)
+        self.modified = True
+
+    def merge(self, other: "FockState"):
+        """
+        Absorbs the other group with the tensor product
+        """
+        if self.pure != other.pure:
+            self.mix()
+            other.mix()
+        self.data = np.tensordot(self.data, other.data, axes=0)
+        self.modes += other.modes
+        self.fock_modes += other.fock_modes
         self.modified = True
-        pass
+
+    def _product_error(self, position, factor, rest):
+        """
+        Distance between the state and the product of its reduced states
+        """
+        product = np.tensordot(factor, rest, axes=0) / np.trace(factor)
+        # Move the mode from the front to its position in the group
+        product = np.moveaxis(product, [0, 1], [2 * position, 2 * position + 1])
+        return np.max(np.abs(product - self.data))
+
+    def split(self, mode: int, tolerance: float):
+        """
+        Splits the mode into its own group if it is in a product state
+        with the rest of the group, returns the new group or None
+        """
+        if len(self.modes) < 2:
+            return None
+        position = self.modes.index(mode)
+        n = len(self.modes)
+        if self.pure:
+            ket = np.moveaxis(self.data, position, 0)
+            rest_shape = ket.shape[1:]
+            u, s, vh = np.linalg.svd(
+                ket.reshape(ket.shape[0], -1), full_matrices=False
+            )
+            if len(s) > 1 and s[1] > tolerance * s[0]:
+                return None
+            factor = u[:, 0] * s[0]
+            rest = vh[0].reshape(rest_shape)
+        else:
+            others = [i for i in range(n) if i != position]
+            factor = ops.partial_trace(self.data, n, others)
+            rest = ops.partial_trace(self.data, n, [position])
+            if self._product_error(position, factor, rest) > tolerance:
+                return None
+            factor = factor / np.trace(factor)
+
+        group = FockState(self.fock_modes[position], mode)
+        group.pure = self.pure
+        group.data = factor
+        self.data = rest
+        del self.modes[position]
+        del self.fock_modes[position]
+        return group
+
+    def remove(self, mode: int, outcome: int = None):
+        """
+        Traces the mode out of the group, or projects it onto the outcome
+        """
+        position = self.modes.index(mode)
+        if outcome is not None and self.pure:
+            index = [slice(None)] * len(self.modes)
+            index[position] = outcome
+            self.data = self.data[tuple(index)]
+        elif outcome is not None:
+            index = [slice(None)] * (2 * len(self.modes))
+            index[2 * position] = outcome
+            index[2 * position + 1] = outcome
+            self.data = self.data[tuple(index)]
+        else:
+            self.mix()
+            self.data = ops.partial_trace(self.data, len(self.modes), [position])
+        del self.modes[position]
+        del self.fock_modes[position]
+        self.modified = True
+
+    def to_state(self) -> states.FockState:
+        """
+        Returns the state as the FockState of the math module
+        """
+        return states.FockState(
+            self.data, len(self.modes), cutoff_dim=self.dims, pure=self.pure
+        )
 
     def cleanup(self):
         if self.modified:
-            pass
+            self.modified = False
+
 
 class FockKernel(GenericKernel):
     """
     This class implements Fock Kernel,
     Fock Kernel allows modes to have varied truncations.
+
+    The state is factorised into groups of mutually entangled modes,
+    each group holds its own tensor. Groups are merged only when an
+    operation touches modes from several groups and split again, when
+    a mode is found in a product state with the rest of its group.
     """
     def __init__(self):
         """
         According to the special issue
         """
-        self.state = []
+        self.groups = []
         self.modes = []
+        self.mode_group = {}
+        self.split_tolerance = 1e-12
+        self.weight = 1.0
 
     def add_mode(self, truncation: int):  # pylint: disable=arguments-differ
         """
         Creates a new mode in vaccum state and returns the index of the mode
         """
         fm = FockMode(truncation)
+        index = len(self.modes)
         self.modes.append(fm)
-        self.state.append(FockState(fm))
+        group = FockState(fm, index)
+        group.modified = False
+        self.groups.append(group)
+        self.mode_group[index] = group
+        return index
 
+    def _group_for(self, modes) -> FockState:
+        """
+        Returns the group holding all of the modes, merging their
+        groups if needed
+        """
+        groups = []
+        for mode in modes:
+            group = self.mode_group[mode]
+            if not any(group is g for g in groups):
+                groups.append(group)
+        target = groups[0]
+        for group in groups[1:]:
+            target.merge(group)
+            self.groups = [g for g in self.groups if g is not group]
+            for mode in group.modes:
+                self.mode_group[mode] = target
+        return target
+
+    def apply_gate(self, operator, modes):
+        """
+        Applies the gate on the given modes, the gate has to be built
+        with the cutoff at least as large as the truncation of the modes
+        """
+        if isinstance(modes, int):
+            modes = [modes]
+        self._group_for(modes).apply_gate(operator, modes)
+        self._cleanup()
+
+    def apply_channel(self, kraus_ops, modes):
+        """
+        Applies the channel given by the Kraus operators on the given modes
+        """
+        if isinstance(modes, int):
+            modes = [modes]
+        self._group_for(modes).apply_channel(kraus_ops, modes)
+        self._cleanup()
+
+    def get_state(self) -> states.FockState:
+        """
+        Returns the state of all modes, ordered by the mode index.
+        The groups are combined with the tensor product. The state is
+        normalized lazily, projections reduce its trace.
+        """
+        live = list(range(len(self.modes)))
+        pure = all(g.pure for g in self.groups)
+        data = None
+        order = []
+        for group in self.groups:
+            group_data = group.data
+            if group.pure and not pure:
+                group_data = ops.mix(group_data, len(group.modes))
+            data = (
+                group_data
+                if data is None
+                else np.tensordot(data, group_data, axes=0)
+            )
+            order += group.modes
+        position = {m: p for p, m in enumerate(order)}
+        if pure:
+            transpose_list = [position[m] for m in live]
+        else:
+            transpose_list = [2 * position[m] + i for m in live for i in (0, 1)]
+        # Weight of the removed groups, which are no longer in the product
+        weight = np.sqrt(self.weight) if pure else self.weight
+        return states.FockState(
+            weight * np.transpose(data, transpose_list),
+            len(live),
+            cutoff_dim=[self.modes[m].truncation for m in live],
+            pure=pure,
+            normalized=False,
+        )
+
+    def group_sizes(self) -> List[int]:
+        """
+        Returns the number of modes in every group
+        """
+        return [len(g.modes) for g in self.groups]
+
+    def reset(self):
+        """
+        Drops all of the modes
+        """
+        self.groups = []
+        self.modes = []
+        self.mode_group = {}
+        self.weight = 1.0
 
     def _cleanup(self):
         """
         Determines if the modes could be split
         """
+        for group in list(self.groups):
+            if not group.modified:
+                continue
+            for mode in list(group.modes):
+                new_group = group.split(mode, self.split_tolerance)
+                if new_group is not None:
+                    new_group.modified = False
+                    self.groups.append(new_group)
+                    self.mode_group[mode] = new_group
+            group.cleanup()
 
-    def remove_mode(self, mode_index:int):  # pylint: disable=arguments-differ
-        pass
-
+    def remove_mode(self, mode_index:int, outcome: int = None):  # pylint: disable=arguments-differ
+        """
+        Removes the mode from its group, tracing it out or projecting it
+        onto the outcome number state. Following modes are shifted down
+        by one index.
+        """
+        group = self.mode_group.pop(mode_index)
+        if len(group.modes) == 1:
+            # The trace of the dropped group (the outcome probability
+            # if projected) is kept as the weight of the state
+            if group.pure:
+                probs = np.abs(group.data) ** 2
+            else:
+                probs = np.real(np.diag(group.data))
+            self.weight *= probs.sum() if outcome is None else probs[outcome]
+            self.groups = [g for g in self.groups if g is not group]
+        else:
+            group.remove(mode_index, outcome)
+        del self.modes[mode_index]
+        for group in self.groups:
+            group.modes = [m - 1 if m > mode_index else m for m in group.modes]
+        self.mode_group = {
+            m - 1 if m > mode_index else m: g for m, g in self.mode_group.items()
+        }
+        self._cleanup()
@@ -0,0 +1,183 @@
+"""
+Device graph
+
+Dependency graph of the registered devices, derived from the
+port/signal connections. Used to schedule the computation of the
+device outputs in topological order.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Set
+
+if TYPE_CHECKING:
+    from quasi.devices import GenericDevice
+
+
+def _port_signals(port):
+    if port.signal is None:
+        return []
+    if isinstance(port.signal, list):
+        return port.signal
+    return [port.signal]
+
+
+def _device_label(device) -> str:
+    if device.name is None:
+        return device.__class__.__name__
+    return f"{device.name} ({device.__class__.__name__})"
+
+
+class DeviceGraph:
+    """
+    Dependency graph of devices, edges point from the device computing
+    a signal to the devices consuming it
+    """
+
+    def __init__(self, devices: List["GenericDevice"]):
+        self.devices = list(devices)
+        self.upstream: Dict["GenericDevice", Set["GenericDevice"]] = {}
+        self.downstream: Dict["GenericDevice", Set["GenericDevice"]] = {
+            d: set() for d in self.devices
+        }
+        self.unconnected = []
+        for device in self.devices:
+            self.upstream[device] = set()
+            for port in device.ports.values():
+                if port.direction != "input":
+                    continue
+                for signal in _port_signals(port):
+                    producers = [
+                        p.device
+                        for p in signal.ports
+                        if p.direction == "output" and p.device is not device
+                    ]
+                    if not producers and not signal.computed.is_set():
+                        self.unconnected.append((device, port.label))
+                    for producer in producers:
+                        self.upstream[device].add(producer)
+                        self.downstream.setdefault(producer, set()).add(device)
+
+    def check_inputs(self):
+        """
+        Raises an exception if some input signal will never be computed
+        """
+        if self.unconnected:
+            missing = ", ".join(
+                f"{_device_label(d)}:{label}" for d, label in self.unconnected
+            )
+            raise UnconnectedInputException(
+                f"Following inputs are not connected to any output: {missing}"
+            )
+
+    def topological_waves(self) -> List[List["GenericDevice"]]:
+        """
+        Groups the devices into waves, all of the devices in a wave
+        depend only on the devices in the previous waves
+        """
+        in_degree = {
+            d: len([u for u in self.upstream[d] if u in self.upstream])
+            for d in self.devices
+        }
+        wave = [d for d in self.devices if in_degree[d] == 0]
+        waves = []
+        visited = 0
+        while wave:
+            waves.append(wave)
+            visited += len(wave)
+            next_wave = []
+            for device in wave:
+                for child in self.downstream.get(device, ()):
+                    if child not in in_degree:
+                        continue
+                    in_degree[child] -= 1
+                    if in_degree[child] == 0:
+                        next_wave.append(child)
+            wave = next_wave
+        if visited != len(self.devices):
+            cycle = ", ".join(
+                _device_label(d) for d in self.devices if in_degree[d] > 0
+            )
+            raise CyclicDependencyException(
+                f"Devices form a dependency cycle: {cycle}"
+            )
+        return waves
+
+    def connected_components(self) -> List[List["GenericDevice"]]:
+        """
+        Returns the groups of devices, which are (indirectly) connected
+        """
+        components = []
+        seen = set()
+        for device in self.devices:
+            if device in seen:
+                continue
+            component = []
+            stack = [device]
+            seen.add(device)
+            while stack:
+                current = stack.pop()
+                component.append(current)
+                neighbours = self.upstream.get(current, set()) | self.downstream.get(
+                    current, set()
+                )
+                for neighbour in neighbours:
+                    if neighbour not in seen and neighbour in self.upstream:
+                        seen.add(neighbour)
+                        stack.append(neighbour)
+            components.append(component)
+        return components
+
+    def order(self) -> List["GenericDevice"]:
+        """
+        Returns the devices in the topological order
+        """
+        return [d for wave in self.topological_waves() for d in wave]
+
+
+def _compute(device):
+    for port in device.ports.values():
+        if port.direction != "input":
+            continue
+        for signal in _port_signals(port):
+            if not signal.computed.is_set():
+                raise UncomputedSignalException(
+                    f"Input {port.label} of {_device_label(device)} "
+                    "was not computed by the upstream device"
+                )
+    device.compute_outputs()
+
+
+def execute_graph(graph: DeviceGraph, max_workers=None):
+    """
+    Computes the outputs of all devices in the topological order,
+    if max_workers is given the waves are computed in parallel
+    """
+    graph.check_inputs()
+    waves = graph.topological_waves()
+    if max_workers is None or max_workers <= 1:
+        for wave in waves:
+            for device in wave:
+                _compute(device)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for wave in waves:
+            # Propagates the exceptions raised by the devices
+            list(pool.map(_compute, wave))
+
+
+class CyclicDependencyException(Exception):
+    """
+    Raised when devices depend on each other in a cycle
+    """
+
+
+class UnconnectedInputException(Exception):
+    """
+    Raised when an input signal has no device, which would compute it
+    """
+
+
+class UncomputedSignalException(Exception):
+    """
+    Raised when upstream device didn't compute the signal
+    """
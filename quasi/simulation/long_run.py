@@ -0,0 +1,189 @@
+"""
+Long run support
+
+Observer devices (detectors, counters, ...) record their results with the
+simulation. In long-run mode the recorded results are flushed to disk in
+chunks at a fixed simulated-time cadence (or earlier, when the buffered
+results exceed the memory budget) and dropped from memory afterwards.
+"""
+
+import json
+import logging
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import mpmath
+import numpy as np
+
+from quasi.extra import Loggers
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+
+def _encode(value):
+    """
+    Converts values, which json can't handle natively
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, complex):
+        return [value.real, value.imag]
+    if isinstance(value, mpmath.mpf):
+        return float(value)
+    return str(value)
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of the process in bytes,
+    or None if it can't be determined on this platform
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class LongRunConfig:
+    """
+    Configuration of the long-run mode
+
+    flush_interval is given in simulated seconds,
+    memory_budget is the upper bound of buffered results in bytes
+    """
+
+    output_dir: str
+    flush_interval: mpmath.mpf
+    memory_budget: int = 64 * 1024**2
+    next_flush: mpmath.mpf = field(default=None)
+
+    def __post_init__(self):
+        self.flush_interval = mpmath.mpf(self.flush_interval)
+        if self.flush_interval <= 0:
+            raise ValueError("flush_interval must be positive")
+        if self.next_flush is None:
+            self.next_flush = self.flush_interval
+
+
+class ResultRecorder:
+    """
+    Collects results of the observer devices
+    """
+
+    def __init__(self):
+        self.records = []
+        self.buffered_bytes = 0
+        self.output_dir = None
+        self.chunks = 0
+        self.flushed_records = 0
+        self.high_water = {"buffered_bytes": 0, "event_queue": 0, "rss": None}
+
+    def set_output_dir(self, output_dir):
+        """
+        Results are flushed into the given directory
+        """
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+    def record(self, device, time, value):
+        """
+        Records a single result of a device, results are only kept when
+        they can be flushed (output directory is set), otherwise they
+        would accumulate without bound
+        """
+        if self.output_dir is None:
+            return
+        line = json.dumps(
+            {
+                "time": float(time),
+                "device": device.ref.uuid,
+                "name": device.name,
+                "value": value,
+            },
+            default=_encode,
+        )
+        self.records.append(line)
+        self.buffered_bytes += len(line) + 1
+        if self.buffered_bytes > self.high_water["buffered_bytes"]:
+            self.high_water["buffered_bytes"] = self.buffered_bytes
+
+    def results(self, device=None):
+        """
+        Returns the results which are still held in memory
+        """
+        records = [json.loads(line) for line in self.records]
+        if device is None:
+            return records
+        return [r for r in records if r["device"] == device.ref.uuid]
+
+    def flush(self):
+        """
+        Writes the buffered results to a new chunk and drops them from memory
+        """
+        if self.output_dir is None or not self.records:
+            return None
+        path = self.output_dir / f"results_{self.chunks:06d}.jsonl"
+        with open(path, "w", encoding="UTF-8") as f:
+            f.write("\n".join(self.records))
+            f.write("\n")
+        self.chunks += 1
+        self.flushed_records += len(self.records)
+        self.records = []
+        self.buffered_bytes = 0
+        return path
+
+    def track(self, event_queue_length):
+        """
+        Updates the event queue high-water mark
+        """
+        if event_queue_length > self.high_water["event_queue"]:
+            self.high_water["event_queue"] = event_queue_length
+
+    def report(self):
+        """
+        Returns the high-water marks of the run
+        """
+        self.high_water["rss"] = peak_rss()
+        return dict(
+            self.high_water,
+            chunks=self.chunks,
+            flushed_records=self.flushed_records,
+            buffered_records=len(self.records),
+        )
+
+    def clear(self):
+        self.records = []
+        self.buffered_bytes = 0
+        self.chunks = 0
+        self.flushed_records = 0
+        self.high_water = {"buffered_bytes": 0, "event_queue": 0, "rss": None}
+
+
+def load_results(output_dir):
+    """
+    Loads all of the flushed result chunks from the directory,
+    including the chunks of the components executed in parallel
+    """
+    records = []
+    for path in sorted(Path(output_dir).rglob("results_*.jsonl")):
+        with open(path, "r", encoding="UTF-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return sorted(records, key=lambda r: r["time"])
+
+
+def flush_log_handlers():
+    """
+    Flushes the handlers of the quasi loggers, so that buffering
+    handlers can drop their entries
+    """
+    for log_name in Loggers:
+        for handler in logging.getLogger(log_name.value).handlers:
+            handler.flush()
@@ -5,6 +5,8 @@ manager
 import uuid
 
 from quasi.simulation import Simulation
+from quasi.backend.backend import FockBackend
+from quasi.backend.gaussian_backend import GaussianBackend
 from quasi._math.fock.ops import vacuum_state
 
 
@@ -45,5 +47,16 @@ class ModeManager():
     def get_mode(self, mode_id: str):
         return self.modes[mode_id]
 
-    def remove_mode(self, mode_id: str) -> None:
-        pass
+    def remove_mode(self, mode_id: str, outcome: int = None) -> None:
+        """
+        Removes the measured (or discarded) mode, the backend traces it
+        out of the state (projecting it onto the outcome if given) and
+        the indices of the following modes are shifted down by one.
+        """
+        index = self.modes.pop(mode_id)
+        for key, value in self.modes.items():
+            if value > index:
+                self.modes[key] = value - 1
+        backend = self.simulation.get_backend()
+        if isinstance(backend, (FockBackend, GaussianBackend)):
+            backend.remove_mode(index, outcome)
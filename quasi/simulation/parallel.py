@@ -0,0 +1,142 @@
+"""
+Process-parallel execution of independent parts of the simulation
+
+Workers are forked, so that they inherit the assembled devices and the
+singletons. Each worker executes one independent part and sends back
+the recorded results and its log records, which are merged in the parent.
+On platforms without fork the parts are executed sequentially by the caller.
+
+Objects sent back to the parent (leftover events, device states) are
+serialized with dumps, references to the devices are replaced with their
+index, so that they are resolved to the devices of the parent by loads.
+"""
+
+import io
+import json
+import logging
+import multiprocessing
+import pickle
+import threading
+
+from quasi.extra import Loggers
+
+_JOBS = []
+
+
+def fork_available() -> bool:
+    """
+    Returns True if worker processes can be forked
+    """
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+class LogCollector(logging.Handler):
+    """
+    Collects log records in the worker process
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        record_dict = dict(record.__dict__)
+        record_dict["msg"] = record.getMessage()
+        record_dict["args"] = None
+        record_dict["exc_info"] = None
+        self.records.append(record_dict)
+
+
+def _collect_logs():
+    collector = LogCollector()
+    for log_name in Loggers:
+        logger = logging.getLogger(log_name.value)
+        logger.handlers = [collector]
+    return collector
+
+
+def _worker(index):
+    job = _JOBS[index]
+    collector = _collect_logs()
+    payload = job()
+    return payload, collector.records
+
+
+def run_in_processes(jobs, max_processes=None):
+    """
+    Executes the jobs (callables without arguments) in forked worker
+    processes and returns their results in the same order.
+    Log records emitted by the workers are re-emitted in the parent.
+    """
+    # pylint: disable=global-statement
+    global _JOBS
+    _JOBS = list(jobs)
+    try:
+        ctx = multiprocessing.get_context("fork")
+        # Jobs mutate the inherited singletons, so every job gets a fresh fork
+        with ctx.Pool(processes=max_processes, maxtasksperchild=1) as pool:
+            outputs = pool.map(_worker, range(len(_JOBS)), chunksize=1)
+    finally:
+        _JOBS = []
+
+    log_records = sorted(
+        (r for _, records in outputs for r in records), key=lambda r: r["created"]
+    )
+    for record_dict in log_records:
+        record = logging.makeLogRecord(record_dict)
+        logging.getLogger(record.name).handle(record)
+    return [payload for payload, _ in outputs]
+
+
+def merge_records(record_lists):
+    """
+    Merges serialized result records of the workers in time order
+    """
+    records = [line for lines in record_lists for line in lines]
+    return sorted(records, key=lambda line: json.loads(line)["time"])
+
+
+class _DevicePickler(pickle.Pickler):
+    def __init__(self, file, devices):
+        super().__init__(file)
+        self.index = {id(d): i for i, d in enumerate(devices)}
+
+    def persistent_id(self, obj):
+        if id(obj) in self.index:
+            return ("device", self.index[id(obj)])
+        if isinstance(obj, threading.Event):
+            # Computed flags of the signals
+            return ("event", obj.is_set())
+        return None
+
+
+class _DeviceUnpickler(pickle.Unpickler):
+    def __init__(self, file, devices):
+        super().__init__(file)
+        self.devices = devices
+
+    def persistent_load(self, pid):
+        kind, value = pid
+        if kind == "device":
+            return self.devices[value]
+        event = threading.Event()
+        if value:
+            event.set()
+        return event
+
+
+def dumps(obj, devices) -> bytes:
+    """
+    Serializes the object, the devices are stored as references
+    """
+    buffer = io.BytesIO()
+    _DevicePickler(buffer, devices).dump(obj)
+    return buffer.getvalue()
+
+
+def loads(data: bytes, devices):
+    """
+    Deserializes the object, the device references are resolved
+    to the given devices (same order as in dumps)
+    """
+    return _DeviceUnpickler(io.BytesIO(data), devices).load()
@@ -16,6 +16,7 @@ from quasi.gui.simulation import SimulationWrapper
 from quasi.gui.board.board import get_class_from_string
 from quasi.gui.board.ports import BoardConnector
 from quasi.extra import Loggers, get_custom_logger
+from quasi._math.fock import operator_cache
 
 
 class LengthPrefixedSocketHandler(logging.handlers.SocketHandler):
@@ -33,6 +34,11 @@ class JsonExecution:
         self.simulation_type = kwargs.get("sim_type")
         self.duration = kwargs.get("duration")
         self.port = kwargs.get("port")
+        self.output_dir = kwargs.get("output_dir")
+        self.flush_interval = kwargs.get("flush_interval")
+        self.memory_budget = kwargs.get("memory_budget")
+        self.coalescing_quantum = kwargs.get("coalescing_quantum")
+        self.operator_cache = kwargs.get("operator_cache")
         self.sw = SimulationWrapper()
         self.schemes = {}
 
@@ -77,6 +83,19 @@ class JsonExecution:
         simulation_logger = get_custom_logger(Loggers.Simulation)
         print(f"duration: {self.duration}")
 
+        if self.output_dir is not None and self.flush_interval is not None:
+            self.sw.simulation.enable_long_run(
+                output_dir=self.output_dir,
+                flush_interval=self.flush_interval,
+                memory_budget=self.memory_budget,
+            )
+
+        if self.coalescing_quantum is not None:
+            self.sw.simulation.set_coalescing_quantum(self.coalescing_quantum)
+
+        if self.operator_cache is not None:
+            operator_cache.load(self.operator_cache)
+
         match self.simulation_type:
             case "des":
                 try:
@@ -86,6 +105,9 @@ class JsonExecution:
                         f"An error occurred during DES simulation: {e}"
                     )
 
+        if self.operator_cache is not None:
+            operator_cache.save(self.operator_cache)
+
     def _get_scheme_dict(self, scheme):
         with open(scheme, "r", encoding="UTF-8") as f:
             self.schemes[scheme] = json.load(f)
@@ -111,6 +133,36 @@ def main():
     )
 
     parser.add_argument("--port", type=int, help="Log connection port", required=False)
+    parser.add_argument(
+        "--output_dir",
+        type=str,
+        required=False,
+        help="Directory, where results are flushed in long-run mode",
+    )
+    parser.add_argument(
+        "--flush_interval",
+        type=float,
+        required=False,
+        help="Simulated time between result flushes, enables long-run mode",
+    )
+    parser.add_argument(
+        "--memory_budget",
+        type=int,
+        required=False,
+        help="Maximal size of buffered results in bytes (long-run mode)",
+    )
+    parser.add_argument(
+        "--coalescing_quantum",
+        type=float,
+        required=False,
+        help="Events for the same device within this time are merged",
+    )
+    parser.add_argument(
+        "--operator_cache",
+        type=str,
+        required=False,
+        help="File, where the gate operator cache is persisted between runs",
+    )
 
     args = parser.parse_args()
 
@@ -5,17 +5,35 @@ Simulation Module
 # pylint: skip-file
 from typing import Type, TYPE_CHECKING
 from enum import Enum, auto
+import functools
 import uuid
-from threading import Thread
 import heapq
+from pathlib import Path
 import mpmath
+import numpy as np
 from quasi.extra import Loggers, get_custom_logger
 from dataclasses import dataclass
 from quasi.signals.generic_bool_signal import GenericBoolSignal
 from quasi.signals.generic_quantum_signal import GenericQuantumSignal
 from quasi.experiment.experiment_manager import Experiment
+from quasi._math.fock import kernels
 from quasi.backend.backend import FockBackend, Backend
 from quasi.backend.fock_first_backend import FockBackendFirst
+from quasi.backend.gaussian_backend import GaussianBackend
+from quasi.simulation.long_run import (
+    LongRunConfig,
+    ResultRecorder,
+    flush_log_handlers,
+)
+from quasi.simulation.time_warp import TimeWarpEngine
+from quasi.simulation.device_graph import DeviceGraph, execute_graph
+from quasi.simulation.parallel import (
+    dumps,
+    fork_available,
+    loads,
+    merge_records,
+    run_in_processes,
+)
 
 if TYPE_CHECKING:
     from quasi.devices import GenericDevice
@@ -134,6 +152,7 @@ class Simulation:
         if Simulation.__instance is None:
             Simulation.__instance = self
             self.backend = FockBackendFirst
+            self.fock_backend = FockBackendFirst
             self.devices = []
             self.initial_trigger_devices = []
             self.simulation_type = SimulationType.FOCK
@@ -142,6 +161,16 @@ class Simulation:
             mpmath.mp.prec = 256
             self.current_time = mpmath.mpf("0")
             self.end_time = mpmath.mpf("0")
+            self.recorder = ResultRecorder()
+            self.long_run = None
+            self.engine = None
+            self.max_workers = None
+            self.processes = None
+            self.coalescing_quantum = mpmath.mpf("0")
+            self.device_quanta = {}
+            self.rng = np.random.default_rng()
+            self.device_events = {}
+            self.coalesced_events = 0
         else:
             raise Exception("Simulation is a singleton class")
 
@@ -153,7 +182,84 @@ class Simulation:
         self.devices.append(device_information)
 
     def set_simulation_type(self, simulation_type: SimulationType):
+        """
+        Selects the simulation type, the Gaussian simulation switches to
+        the Gaussian backend and switching back to the Fock simulation
+        restores the previously used Fock backend
+        """
         self.simulation_type = simulation_type
+        if simulation_type == SimulationType.GAUSSIAN and not isinstance(
+            self.backend, GaussianBackend
+        ):
+            self.fock_backend = self.backend
+            self.backend = GaussianBackend()
+        elif simulation_type == SimulationType.FOCK and isinstance(
+            self.backend, GaussianBackend
+        ):
+            self.backend = self.fock_backend
+
+    def set_seed(self, seed):
+        """
+        Seeds the random number generator used for the measurement
+        sampling (e.g. FockState.sample)
+        """
+        self.rng = np.random.default_rng(seed)
+
+    def get_rng(self) -> np.random.Generator:
+        return self.rng
+
+    def set_max_workers(self, max_workers):
+        """
+        Number of worker threads used to compute independent devices
+        in Simulation.run and the partitions in run_time_warp, None
+        computes them sequentially
+        """
+        self.max_workers = max_workers
+
+    def set_threads(self, num_threads):
+        """
+        Number of threads used by the multithreaded gate kernels
+        (Experiment gate method "numba"), None uses all of the cores
+        """
+        kernels.set_num_threads(num_threads)
+
+    def set_processes(self, processes):
+        """
+        Number of worker processes used to execute independent connected
+        components of the scheme, None executes everything in this process
+        """
+        self.processes = processes
+
+    def _parallel_components(self):
+        """
+        Returns the connected components of the device graph, if they
+        should be executed in separate processes, otherwise None
+        """
+        if self.processes is None or self.processes <= 1 or not fork_available():
+            return None
+        graph = DeviceGraph([d.obj_ref for d in self.devices])
+        components = graph.connected_components()
+        if len(components) < 2:
+            return None
+        return components
+
+    def set_coalescing_quantum(self, quantum, device=None):
+        """
+        Events for the same device, which are scheduled within the quantum
+        (in seconds) of each other are merged into one event. If device is
+        given, the quantum applies only to this device. Quantum 0 merges
+        only events with exactly the same time.
+        """
+        quantum = mpmath.mpf(quantum)
+        if quantum < 0:
+            raise ValueError("Coalescing quantum must not be negative")
+        if device is None:
+            self.coalescing_quantum = quantum
+        else:
+            self.device_quanta[device] = quantum
+
+    def _get_quantum(self, device):
+        return self.device_quanta.get(device, self.coalescing_quantum)
 
     @classmethod
     def set_dimensions(cls, dimensions):
@@ -163,12 +269,188 @@ class Simulation:
     def get_dimensions(cls):
         return cls.dimensions
 
+    def enable_long_run(self, output_dir, flush_interval, memory_budget=None):
+        """
+        Enables the bounded-memory long-run mode. Recorded results are
+        flushed to output_dir every flush_interval simulated seconds or
+        whenever the buffered results exceed memory_budget bytes.
+        Events beyond the simulation horizon are kept in the queue.
+        """
+        kwargs = {}
+        if memory_budget is not None:
+            kwargs["memory_budget"] = memory_budget
+        self.long_run = LongRunConfig(
+            output_dir=output_dir,
+            flush_interval=flush_interval,
+            next_flush=self.current_time + mpmath.mpf(flush_interval),
+            **kwargs,
+        )
+        self.recorder.set_output_dir(output_dir)
+
+    def disable_long_run(self):
+        self.recorder.flush()
+        self.recorder.output_dir = None
+        self.long_run = None
+
+    def record_result(self, device, time, value):
+        """
+        Observer devices record their results using this method,
+        the results are kept only in the long-run mode
+        """
+        if self.long_run is None:
+            return
+        if self.engine is not None:
+            self.engine.record_result(device, time, value)
+        else:
+            self.recorder.record(device, time, value)
+
+    def _long_run_step(self):
+        self.recorder.track(len(self.event_queue))
+        config = self.long_run
+        if (
+            self.current_time >= config.next_flush
+            or self.recorder.buffered_bytes > config.memory_budget
+        ):
+            self._flush_results()
+            while config.next_flush <= self.current_time:
+                config.next_flush += config.flush_interval
+
+    def _flush_results(self):
+        """
+        Flushes results and drops stale in-memory buffers
+        """
+        self.recorder.flush()
+        self.event_map = {
+            key: event
+            for key, event in self.event_map.items()
+            if key[0] >= self.current_time
+        }
+        flush_log_handlers()
+
+    def _parallel_des_components(self):
+        """
+        Connected components for run_des, the workers send the device
+        states back, so all of the devices have to implement the component
+        state hooks (save_component_state, by default save_state)
+        """
+        components = self._parallel_components()
+        if components is None:
+            return None
+        unsupported = [
+            d.name
+            for d in self.devices
+            if not d.obj_ref.supports_component_state()
+        ]
+        if unsupported:
+            logger = get_custom_logger(Loggers.Simulation)
+            logger.info(
+                "Devices don't implement the component state hooks, "
+                f"executing sequentially: {', '.join(map(str, unsupported))}"
+            )
+            return None
+        return components
+
+    def _run_des_component(self, index, component):
+        """
+        Executed in the worker process, restricts the simulation
+        to the devices of the component. Returns the results, the events
+        beyond the horizon and the device states.
+        """
+        devices = [d.obj_ref for d in self.devices]
+        members = set(component)
+        self.processes = None
+        self.devices = [d for d in self.devices if d.obj_ref in members]
+        self.event_queue = [e for e in self.event_queue if e.device in members]
+        heapq.heapify(self.event_queue)
+        self.event_map = {
+            key: e for key, e in self.event_map.items() if e.device in members
+        }
+        self.device_events = {
+            key: e for key, e in self.device_events.items() if e.device in members
+        }
+        if self.long_run is not None:
+            self.recorder.set_output_dir(
+                Path(self.long_run.output_dir) / f"component_{index:03d}"
+            )
+        # Events beyond the horizon are left for the parent
+        self._process_events(strict=True)
+        if self.long_run is not None:
+            self._flush_results()
+        states = [device.save_component_state() for device in component]
+        return dumps(
+            (self.recorder.records, self.current_time, self.event_queue, states),
+            devices,
+        )
+
+    def _run_des_parallel(self, components):
+        logger = get_custom_logger(Loggers.Simulation)
+        logger.info(
+            f"Executing {len(components)} independent components in parallel"
+        )
+        jobs = [
+            functools.partial(self._run_des_component, i, c)
+            for i, c in enumerate(components)
+        ]
+        devices = [d.obj_ref for d in self.devices]
+        outputs = [
+            loads(output, devices)
+            for output in run_in_processes(jobs, max_processes=self.processes)
+        ]
+        self.recorder.records = merge_records(
+            [self.recorder.records] + [records for records, _, _, _ in outputs]
+        )
+        self.current_time = max([self.current_time] + [t for _, t, _, _ in outputs])
+        # The events were consumed by the workers, the leftover events
+        # and the device states are merged back
+        self.event_queue = []
+        self.event_map = {}
+        self.device_events = {}
+        for component, (_, _, events, states) in zip(components, outputs):
+            for device, state in zip(component, states):
+                device.restore_component_state(state)
+            for event in events:
+                self._enqueue(event)
+
+    def _enqueue(self, event):
+        """
+        Puts the (already merged) event back into the queue
+        """
+        heapq.heappush(self.event_queue, event)
+        quantum = self._get_quantum(event.device)
+        if quantum > 0:
+            bucket = int(mpmath.floor(mpmath.mpf(event.event_time) / quantum))
+            event.coalescing_key = (bucket, event.device)
+            self.device_events[event.coalescing_key] = event
+        else:
+            self.event_map[(event.event_time, event.device)] = event
+
     def run_des(self, simulation_time):
+        components = None
+        if self.engine is None:
+            components = self._parallel_des_components()
+        self.end_time += simulation_time
+        if components is not None:
+            self._run_des_parallel(components)
         logger = get_custom_logger(Loggers.Simulation)
         logger.info("Starting Simulation")
-        self.end_time += simulation_time
+        self._process_events(strict=self.long_run is not None)
+        if self.long_run is not None:
+            self._flush_results()
+            logger.info(f"Long run high-water marks: {self.recorder.report()}")
+
+    def _process_events(self, strict):
+        """
+        Processes the events until the end time, unless strict the first
+        event beyond the horizon is processed as well
+        """
+        logger = get_custom_logger(Loggers.Simulation)
         while self.event_queue and self.current_time <= self.end_time:
+            if strict and self.event_queue[0].event_time > self.end_time:
+                break
             event = heapq.heappop(self.event_queue)
+            key = getattr(event, "coalescing_key", None)
+            if key is not None and self.device_events.get(key) is event:
+                del self.device_events[key]
             time_as_float = float(event.event_time)
             logger.info(
                 f"[{time_as_float:.3e}s] Processing Event for {event.device.name} of type {event.device.__class__.__name__}"
@@ -179,9 +461,46 @@ class Simulation:
             key = (self.current_time, event.device)
             if key in self.event_map:
                 del self.event_map[key]
+            if self.long_run is not None:
+                self._long_run_step()
+
+    def run_time_warp(self, simulation_time, partitions=None, batch_size=16):
+        """
+        Optimistic alternative to run_des. Partitions (lists of devices,
+        by default every device is its own partition) are executed
+        speculatively by max_workers threads and rolled back on
+        straggler events. All devices must implement save_state and
+        restore_state.
+        """
+        logger = get_custom_logger(Loggers.Simulation)
+        logger.info("Starting Time Warp Simulation")
+        self.end_time += simulation_time
+        engine = TimeWarpEngine(
+            self,
+            partitions=partitions,
+            batch_size=batch_size,
+            max_workers=self.max_workers,
+        )
+        self.engine = engine
+        try:
+            statistics = engine.run(self.end_time)
+        finally:
+            self.engine = None
+        for event in engine.leftover_events():
+            self.schedule_event(
+                event.event_time, event.device, *event.args, **event.kwargs
+            )
+        return statistics
 
     def schedule_event(self, time, device, *args, **kwargs):
         event = SimulationEvent(time, device, *args, **kwargs)
+        if self.engine is not None:
+            self.engine.schedule_event(event)
+            return
+        quantum = self._get_quantum(device)
+        if quantum > 0:
+            self._schedule_coalesced(event, quantum)
+            return
         key = (time, device)
         if key in self.event_map:
             existing_event = self.event_map[key]
@@ -190,6 +509,28 @@ class Simulation:
             heapq.heappush(self.event_queue, event)
             self.event_map[key] = event
 
+    def _schedule_coalesced(self, event, quantum):
+        """
+        Merges the event into a pending event of the same device
+        within the quantum, or schedules it as a new event. Pending
+        events are keyed by the quantum bucket of their time, so only
+        the neighbouring buckets have to be searched.
+        """
+        bucket = int(mpmath.floor(mpmath.mpf(event.event_time) / quantum))
+        for b in (bucket, bucket - 1, bucket + 1):
+            existing = self.device_events.get((b, event.device))
+            if (
+                existing is not None
+                and abs(existing.event_time - event.event_time) <= quantum
+            ):
+                existing.merge_event(event)
+                self.coalesced_events += 1
+                return
+        heapq.heappush(self.event_queue, event)
+        # Events in the same bucket are always merged, the slot is free
+        event.coalescing_key = (bucket, event.device)
+        self.device_events[event.coalescing_key] = event
+
     def run(self):
         """
         Executes the experiment
@@ -200,24 +541,24 @@ class Simulation:
             self.backend.set_number_of_modes(modes)
             self.backend.set_dimensions(self.dimensions)
             self.backend.initialize()
+        elif isinstance(self.backend, GaussianBackend):
+            self.backend.set_number_of_modes(modes)
+            self.backend.initialize()
 
         for d in self.initial_trigger_devices:
             d = d.obj_ref
             sig = d.ports["TRIGGER"].signal
             sig.set_contents = True
             sig.set_computed()
-        processes = []
-        for d in self.devices:
-            p = Thread(target=d.obj_ref.compute_outputs, args=(d.obj_ref,))
-            processes.append(p)
-        for p in processes:
-            p.start()
-        for p in processes:
-            p.join()
+        graph = DeviceGraph([d.obj_ref for d in self.devices])
+        execute_graph(graph, max_workers=self.max_workers)
 
         if self.simulation_type == SimulationType.FOCK:
             exp = Experiment.get_instance()
-            exp.execute()
+            if self._parallel_components() is not None:
+                exp.execute_parallel(max_processes=self.processes)
+            else:
+                exp.execute()
 
     def register_triggers(self, *devices):
         """
@@ -0,0 +1,391 @@
+"""
+Optimistic (Time Warp) execution of the discrete event simulation
+
+Devices are grouped into partitions, each partition processes its own
+events speculatively, without waiting for the other partitions. When an
+event arrives in the past of a partition (straggler), the partition is
+rolled back: device states are restored from the incrementally saved
+snapshots and the events sent by the undone events are cancelled
+(anti-messages), which may cascade into other partitions.
+
+Partitions are executed in rounds by a pool of worker threads, every
+partition processes a batch of its events per round. Within a round the
+workers only touch their own partition, events and anti-messages for the
+other partitions are kept in the outbox of the sending partition and
+delivered between the rounds, where the stragglers roll the receiving
+partitions back.
+
+Snapshots and speculative results older than the global virtual time (GVT)
+can never be rolled back, they are committed and their memory reclaimed.
+
+Devices opt in by implementing GenericDevice.save_state and
+GenericDevice.restore_state.
+"""
+
+import heapq
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+import mpmath
+
+from quasi.extra import Loggers, get_custom_logger
+
+if TYPE_CHECKING:
+    from quasi.simulation.simulation import Simulation
+
+
+class ProcessedEvent:
+    """
+    Bookkeeping of a speculatively processed event
+    """
+
+    def __init__(self, time, device, events, saved_state):
+        self.time = time
+        self.device = device
+        self.events = events
+        self.saved_state = saved_state
+        self.sent = []
+        self.results = []
+
+
+class Partition:
+    """
+    Group of devices, which is simulated optimistically
+    """
+
+    def __init__(self, index, devices):
+        self.index = index
+        self.devices = list(devices)
+        self.pending = []
+        self.processed = []
+        # Events and anti-messages for the other partitions
+        self.outbox = []
+        self.lvt = mpmath.mpf("-inf")
+
+    def next_time(self):
+        """
+        Time of the next pending (not cancelled) event
+        """
+        while self.pending and self.pending[0][2].cancelled:
+            heapq.heappop(self.pending)
+        if self.pending:
+            return self.pending[0][2].event_time
+        return None
+
+
+class TimeWarpEngine:
+    """
+    Optimistic parallel discrete event engine
+    """
+
+    def __init__(
+        self, simulation: "Simulation", partitions=None, batch_size=16, max_workers=None
+    ):
+        self.simulation = simulation
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        if partitions is None:
+            partitions = [[d.obj_ref] for d in simulation.devices]
+        self.partitions = [Partition(i, p) for i, p in enumerate(partitions)]
+        self.partition_of = {}
+        for partition in self.partitions:
+            for device in partition.devices:
+                self.partition_of[device] = partition
+        self._counter = itertools.count()
+        # Partition and event processed by the current worker thread
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.gvt = mpmath.mpf("-inf")
+        self.statistics = {
+            "processed": 0,
+            "rolled_back": 0,
+            "rollbacks": 0,
+            "anti_messages": 0,
+        }
+        self._check_devices()
+
+    @property
+    def _current(self):
+        return getattr(self._local, "record", None)
+
+    @property
+    def _source(self):
+        return getattr(self._local, "partition", None)
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.statistics[key] += value
+
+    def _check_devices(self):
+        unsupported = [
+            device
+            for device in self.partition_of
+            if not device.supports_rollback()
+        ]
+        if unsupported:
+            names = ", ".join(
+                f"{d.name} ({d.__class__.__name__})" for d in unsupported
+            )
+            raise RollbackNotSupportedException(
+                "Following devices don't implement save_state/restore_state: "
+                + names
+            )
+
+    def _partition(self, device) -> Partition:
+        if device not in self.partition_of:
+            self.partitions[0].devices.append(device)
+            self.partition_of[device] = self.partitions[0]
+        return self.partition_of[device]
+
+    def _push(self, partition, event):
+        event.cancelled = False
+        event.record = None
+        if not hasattr(event, "sequence"):
+            event.sent_at = mpmath.mpf("-inf")
+            event.sequence = next(self._counter)
+        heapq.heappush(partition.pending, (event.event_time, event.sequence, event))
+
+    def schedule_event(self, event):
+        """
+        Delivers the event to the partition of the receiving device,
+        rolling the partition back if the event is a straggler. Events
+        for the other partitions are delivered after the round.
+        """
+        partition = self._partition(event.device)
+        if self._current is not None:
+            self._current.sent.append(event)
+            event.sent_at = self._current.time
+        else:
+            event.sent_at = mpmath.mpf("-inf")
+        event.sequence = next(self._counter)
+        event.cancelled = False
+        event.delivered = False
+        source = self._source
+        if source is not None and source is not partition:
+            source.outbox.append((False, event))
+            return
+        self._deliver(partition, event)
+
+    def _deliver(self, partition, event):
+        event.delivered = True
+        self._rollback(partition, event.event_time, event.device)
+        self._push(partition, event)
+
+    def record_result(self, device, time, value):
+        """
+        Speculative results are held back until they are committed
+        """
+        if self._current is None:
+            self.simulation.recorder.record(device, time, value)
+        else:
+            self._current.results.append((device, time, value))
+
+    def _rollback(self, partition, time, device):
+        """
+        Undoes processed events, which happened after the given time,
+        an event of the same device at the same time is undone as well,
+        so that it can be merged with the straggler
+        """
+        index = len(partition.processed)
+        i = index
+        while i > 0 and partition.processed[i - 1].time >= time:
+            i -= 1
+            record = partition.processed[i]
+            if record.time > time or record.device is device:
+                index = i
+        self._undo(partition, index)
+
+    def _cancel(self, event):
+        """
+        Anti-message: annihilates the previously sent event,
+        undoing its processing if it was already consumed
+        """
+        if event.cancelled:
+            return
+        if not getattr(event, "delivered", True):
+            # Still in the outbox
+            event.cancelled = True
+            return
+        partition = self._partition(event.device)
+        source = self._source
+        if source is not None and source is not partition:
+            source.outbox.append((True, event))
+            return
+        self._count("anti_messages")
+        if event.record is not None:
+            self._undo(partition, partition.processed.index(event.record))
+        event.cancelled = True
+
+    def _undo(self, partition, index):
+        """
+        Undoes the processed events starting with the given index,
+        restores the device states and cancels the sent events
+        """
+        undone = partition.processed[index:]
+        if not undone:
+            return
+        partition.processed = partition.processed[:index]
+        self._count("rollbacks")
+        self._count("rolled_back", len(undone))
+        for record in reversed(undone):
+            record.device.restore_state(record.saved_state)
+            for event in record.events:
+                self._push(partition, event)
+            for event in record.sent:
+                self._cancel(event)
+        partition.lvt = (
+            partition.processed[-1].time
+            if partition.processed
+            else mpmath.mpf("-inf")
+        )
+
+    def _process_next(self, partition, end_time):
+        next_time = partition.next_time()
+        if next_time is None or next_time > end_time:
+            return False
+        _, _, event = heapq.heappop(partition.pending)
+        device = event.device
+        # Events for the same device at the same time are merged
+        events = [event]
+        deferred = []
+        while partition.pending and partition.pending[0][0] == event.event_time:
+            entry = heapq.heappop(partition.pending)
+            if entry[2].cancelled:
+                continue
+            if entry[2].device is device:
+                events.append(entry[2])
+            else:
+                deferred.append(entry)
+        for entry in deferred:
+            heapq.heappush(partition.pending, entry)
+        # Merge in the order in which sequential simulation would schedule them
+        events.sort(key=lambda e: (e.sent_at, e.sequence))
+        event = events[0]
+
+        merged = event.__class__(
+            event.event_time,
+            device,
+            *event.args,
+            **dict(event.kwargs, signals=dict(event.kwargs["signals"])),
+        )
+        for other in events[1:]:
+            merged.merge_event(other)
+
+        record = ProcessedEvent(event.event_time, device, events, device.save_state())
+        for e in events:
+            e.record = record
+        self._local.record = record
+        try:
+            device.des(merged.event_time, *merged.args, **merged.kwargs)
+        finally:
+            self._local.record = None
+        partition.processed.append(record)
+        partition.lvt = record.time
+        self._count("processed")
+        return True
+
+    def _run_partition(self, partition, end_time):
+        """
+        Processes a batch of the partition events, executed by the worker
+        """
+        self._local.partition = partition
+        try:
+            for _ in range(self.batch_size):
+                if not self._process_next(partition, end_time):
+                    break
+        finally:
+            self._local.partition = None
+
+    def _exchange(self):
+        """
+        Delivers the events and anti-messages sent between the partitions
+        during the round, stragglers roll the receivers back
+        """
+        for partition in self.partitions:
+            outbox, partition.outbox = partition.outbox, []
+            for anti_message, event in outbox:
+                if anti_message:
+                    self._cancel(event)
+                elif not event.cancelled:
+                    self._deliver(self._partition(event.device), event)
+
+    def _compute_gvt(self):
+        times = [p.next_time() for p in self.partitions]
+        times = [t for t in times if t is not None]
+        if not times:
+            return None
+        return min(times)
+
+    def _fossil_collect(self, gvt):
+        """
+        Commits everything before gvt and reclaims the saved states
+        """
+        committed = []
+        for partition in self.partitions:
+            keep = []
+            for record in partition.processed:
+                if gvt is None or record.time < gvt:
+                    committed.append(record)
+                else:
+                    keep.append(record)
+            partition.processed = keep
+        committed.sort(key=lambda r: r.time)
+        for record in committed:
+            for device, time, value in record.results:
+                self.simulation.recorder.record(device, time, value)
+
+    def run(self, end_time):
+        """
+        Runs the optimistic simulation until the end_time
+        """
+        logger = get_custom_logger(Loggers.Simulation)
+        start_time = self.simulation.current_time
+        for event in self.simulation.event_queue:
+            self._push(self._partition(event.device), event)
+        self.simulation.event_queue = []
+        self.simulation.event_map = {}
+        # Coalescing slots refer to the events taken over by the engine
+        self.simulation.device_events = {}
+
+        workers = self.max_workers if self.max_workers is not None else 1
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            while True:
+                self._exchange()
+                gvt = self._compute_gvt()
+                if gvt is None or gvt > end_time:
+                    break
+                self.gvt = gvt
+                self._fossil_collect(gvt)
+                # Propagates the exceptions raised by the devices
+                list(
+                    pool.map(
+                        lambda p: self._run_partition(p, end_time), self.partitions
+                    )
+                )
+
+        self._fossil_collect(None)
+        self.simulation.current_time = max(
+            [p.lvt for p in self.partitions] + [start_time]
+        )
+        logger.info(f"Time Warp statistics: {self.statistics}")
+        return self.statistics
+
+    def leftover_events(self):
+        """
+        Events beyond the simulation horizon, which are returned
+        to the simulation queue
+        """
+        events = []
+        for partition in self.partitions:
+            events.extend(e for _, _, e in partition.pending if not e.cancelled)
+            partition.pending = []
+        return sorted(events)
+
+
+class RollbackNotSupportedException(Exception):
+    """
+    Raised when optimistic execution is requested, but some devices
+    don't implement state saving and restoring
+    """
@@ -0,0 +1,106 @@
+import unittest
+
+import numpy as np
+
+from quasi._math.fock import ops
+from quasi.kernel import FockKernel
+
+
+class TestFockKernel(unittest.TestCase):
+
+    def setUp(self):
+        self.kernel = FockKernel()
+        self.kernel.reset()
+        self.cutoff = 6
+
+    def test_per_mode_truncation(self):
+        coherent = self.kernel.add_mode(6)
+        photon = self.kernel.add_mode(2)
+        self.kernel.apply_gate(ops.displacement(0.4, 0.0, self.cutoff), coherent)
+        self.kernel.apply_gate(ops.adagger(self.cutoff), photon)
+        state = self.kernel.get_state()
+        self.assertEqual(state.ket().shape, (6, 2))
+        probs = state.all_fock_probs()
+        np.testing.assert_allclose(probs[:, 0], 0, atol=1e-15)
+        np.testing.assert_allclose(
+            probs[:, 1], np.abs(ops.coherent_state(0.4, 0.0, 6)) ** 2, atol=1e-4
+        )
+
+    def test_channel_mixes_state(self):
+        first = self.kernel.add_mode(3)
+        second = self.kernel.add_mode(2)
+        bs = ops.beamsplitter(np.pi / 4, 0, self.cutoff).transpose((0, 2, 1, 3))
+        self.kernel.apply_gate(ops.adagger(self.cutoff), first)
+        self.kernel.apply_gate(bs, [first, second])
+        self.kernel.apply_channel(ops.lossChannel(0.5, self.cutoff), second)
+        state = self.kernel.get_state()
+        self.assertFalse(state.is_pure)
+        np.testing.assert_allclose(
+            state.all_fock_probs(), [[0.25, 0.25], [0.5, 0], [0, 0]], atol=1e-12
+        )
+
+    def test_groups_merge_and_split(self):
+        modes = [self.kernel.add_mode(3) for _ in range(4)]
+        bs = ops.beamsplitter(np.pi / 4, 0, self.cutoff).transpose((0, 2, 1, 3))
+        inverse = ops.beamsplitter(-np.pi / 4, 0, self.cutoff).transpose(
+            (0, 2, 1, 3)
+        )
+        self.kernel.apply_gate(ops.adagger(self.cutoff), modes[0])
+        self.kernel.apply_gate(ops.displacement(0.2, 0, self.cutoff), modes[3])
+        self.assertEqual(self.kernel.group_sizes(), [1, 1, 1, 1])
+
+        self.kernel.apply_gate(bs, [modes[0], modes[1]])
+        self.assertEqual(sorted(self.kernel.group_sizes()), [1, 1, 2])
+        entangled = self.kernel.get_state().all_fock_probs()
+
+        self.kernel.apply_gate(inverse, [modes[0], modes[1]])
+        self.assertEqual(self.kernel.group_sizes(), [1, 1, 1, 1])
+        probs = self.kernel.get_state().all_fock_probs()
+        # Displacement is truncated, so compare with the total probability
+        np.testing.assert_allclose(probs[1, 0, 0].sum(), probs.sum(), atol=1e-12)
+        np.testing.assert_allclose(
+            entangled[1, 0, 0].sum(), entangled.sum() / 2, atol=1e-12
+        )
+
+    def test_mixed_groups_split(self):
+        first = self.kernel.add_mode(3)
+        second = self.kernel.add_mode(3)
+        self.kernel.apply_channel(ops.lossChannel(0.5, self.cutoff), first)
+        swap = ops.beamsplitter(np.pi / 2, 0, self.cutoff).transpose((0, 2, 1, 3))
+        self.kernel.apply_gate(ops.adagger(self.cutoff), second)
+        self.kernel.apply_gate(swap, [first, second])
+        self.assertEqual(self.kernel.group_sizes(), [1, 1])
+        probs = self.kernel.get_state().all_fock_probs()
+        np.testing.assert_allclose(probs[1, 0], 1, atol=1e-12)
+
+    def test_remove_mode(self):
+        herald = self.kernel.add_mode(3)
+        signal = self.kernel.add_mode(3)
+        bs = ops.beamsplitter(np.pi / 4, 0, self.cutoff).transpose((0, 2, 1, 3))
+        self.kernel.apply_gate(ops.adagger(self.cutoff), herald)
+        self.kernel.apply_gate(bs, [herald, signal])
+        self.kernel.remove_mode(herald, outcome=0)
+        state = self.kernel.get_state()
+        self.assertEqual(state.ket().ndim, 1)
+        np.testing.assert_allclose(state.all_fock_probs(), [0, 1, 0], atol=1e-12)
+
+    def test_remove_mode_compacts_indices(self):
+        photon = self.kernel.add_mode(3)
+        herald = self.kernel.add_mode(2)
+        signal = self.kernel.add_mode(3)
+        bs = ops.beamsplitter(np.pi / 4, 0, self.cutoff).transpose((0, 2, 1, 3))
+        self.kernel.apply_gate(ops.adagger(self.cutoff), photon)
+        self.kernel.apply_gate(bs, [photon, signal])
+        # Herald is alone in its group, the outcome probability is kept
+        self.kernel.apply_gate(ops.displacement(0.3, 0, self.cutoff), herald)
+        self.kernel.remove_mode(herald, outcome=1)
+        self.assertEqual(self.kernel.add_mode(2), 2)
+        # Former signal mode is now mode 1
+        self.kernel.apply_gate(ops.adagger(self.cutoff), 2)
+        state = self.kernel.get_state()
+        self.assertEqual(state.ket().shape, (3, 3, 2))
+        herald_prob = np.abs(ops.displacement(0.3, 0, self.cutoff)[1, 0]) ** 2
+        self.assertAlmostEqual(state.trace, herald_prob)
+        probs = state.all_fock_probs()
+        np.testing.assert_allclose(probs[1, 0, 1], 0.5, atol=1e-12)
+        np.testing.assert_allclose(probs[0, 1, 1], 0.5, atol=1e-12)
@@ -0,0 +1,87 @@
+import unittest
+
+import numpy as np
+
+from quasi._math.fock import ops
+from quasi.experiment import Experiment
+from quasi.experiment.gate_fusion import fuse_operations
+
+
+def random_ket(num_modes, cutoff, rng):
+    shape = [cutoff] * num_modes
+    ket = rng.normal(size=shape) + 1j * rng.normal(size=shape)
+    return ket / np.linalg.norm(ket)
+
+
+def apply_all(operations, state, num_modes):
+    for operator, modes in operations:
+        state = ops.apply_gate_ket(operator, state, modes, num_modes)
+    return state
+
+
+class TestGateFusion(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(4321)
+        self.cutoff = 4
+
+    def bs(self, theta, phi):
+        return ops.beamsplitter(theta, phi, self.cutoff).transpose((0, 2, 1, 3))
+
+    def test_single_mode_run(self):
+        operations = [
+            (ops.displacement(0.3, 0.1, self.cutoff), [0]),
+            (ops.phase(0.4, self.cutoff), [0]),
+            (ops.squeezing(0.2, 0.3, self.cutoff), [0]),
+        ]
+        fused = fuse_operations(operations)
+        self.assertEqual(len(fused), 1)
+        state = random_ket(1, self.cutoff, self.rng)
+        np.testing.assert_allclose(
+            apply_all(fused, state, 1), apply_all(operations, state, 1), atol=1e-12
+        )
+
+    def test_commute_and_reorder(self):
+        operations = [
+            (self.bs(0.4, 0.2), [0, 1]),
+            (ops.phase(0.3, self.cutoff), [2]),
+            (self.bs(0.7, 0.5), [1, 0]),
+            (ops.phase(0.9, self.cutoff), [1]),
+            (ops.displacement(0.2, 0.0, self.cutoff), [2]),
+        ]
+        fused = fuse_operations(operations)
+        self.assertEqual(len(fused), 3)
+        state = random_ket(3, self.cutoff, self.rng)
+        np.testing.assert_allclose(
+            apply_all(fused, state, 3), apply_all(operations, state, 3), atol=1e-12
+        )
+
+
+class TestFusionWithModeCutoffs(unittest.TestCase):
+
+    def setUp(self):
+        self.experiment = Experiment()
+        self.experiment.reset()
+        self.experiment.update_mode_number(2)
+        self.experiment.update_dimensions(6)
+        self.experiment.set_mode_cutoffs([3, 2])
+
+    def tearDown(self):
+        self.experiment.reset()
+
+    def test_fused_matches_unfused(self):
+        exp = self.experiment
+        bs = ops.beamsplitter(0.6, 0.2, 6).transpose((0, 2, 1, 3))
+        exp.state_init(1, [0])
+        exp.add_operation(ops.displacement(0.5, 0.3, 6), 0)
+        exp.add_operation(ops.squeezing(0.3, 0.1, 6), 0)
+        exp.add_operation(bs, [0, 1])
+        exp.add_operation(bs, [1, 0])
+        results = []
+        for fuse_gates in (True, False):
+            exp.set_fuse_gates(fuse_gates)
+            exp.execute()
+            results.append((exp.state.all_fock_probs(), exp.truncation_loss()))
+        np.testing.assert_allclose(results[0][0], results[1][0], atol=1e-12)
+        self.assertAlmostEqual(results[0][1], results[1][1])
+        self.assertGreater(results[1][1], 0)
@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+
+from quasi._math.fock import ops
+from quasi._math.gaussian.hafnian import hafnian, loop_hafnian
+from quasi.backend.fock_first_backend import FockBackendFirst
+from quasi.backend.gaussian_backend import GaussianBackend
+from quasi.simulation import Simulation, SimulationType
+
+
+class TestHafnian(unittest.TestCase):
+
+    def test_all_ones(self):
+        # Number of perfect matchings and of all matchings of 4 vertices
+        self.assertAlmostEqual(hafnian(np.ones((4, 4))), 3)
+        self.assertAlmostEqual(loop_hafnian(np.ones((4, 4))), 10)
+        self.assertAlmostEqual(hafnian(np.ones((3, 3))), 0)
+
+
+class TestGaussianBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.cutoff = 14
+        self.backend = GaussianBackend()
+        self.backend.set_number_of_modes(3)
+        self.backend.initialize()
+
+    def test_matches_fock(self):
+        d = self.cutoff
+        fock_steps = [
+            (ops.squeezing(0.3, 0.4, d), [0]),
+            (ops.displacement(0.5, 0.7, d), [1]),
+            (ops.phase(0.6, d), [0]),
+            (ops.beamsplitter(0.5, 0.3, d).transpose((0, 2, 1, 3)), [0, 1]),
+        ]
+        rho = ops.vacuumStateMixed(2, d)
+        for operator, modes in fock_steps:
+            rho = ops.apply_gate_einsum(operator, rho, modes, 2)
+        rho = sum(ops.apply_gate_einsum(k, rho, [1], 2) for k in ops.lossChannel(0.7, d))
+
+        backend = self.backend
+        backend.apply_operator(backend.squeeze(0.3 * np.exp(0.4j), 0), [0])
+        backend.apply_operator(backend.displace(0.5, 0.7, 2), [2])
+        backend.apply_operator(backend.phase_shift(0.6, 0), [0])
+        backend.apply_operator(backend.beam_splitter(0.5, 0.3), [0, 2])
+        backend.loss(0.7, 2)
+        backend.remove_mode(1)
+
+        state = backend.get_state()
+        for pattern in [(0, 0), (1, 0), (0, 1), (1, 1), (2, 1), (0, 3)]:
+            index = tuple(k for n in pattern for k in (n, n))
+            self.assertAlmostEqual(state.fock_prob(pattern), rho[index].real, places=10)
+        probs = np.einsum("aabb->a", rho).real
+        self.assertAlmostEqual(
+            state.mean_photon(0), np.sum(np.arange(d) * probs), places=6
+        )
+        self.assertAlmostEqual(state.mean_photon(mode=[0]), state.mean_photon(0))
+
+
+class TestSimulationType(unittest.TestCase):
+
+    def setUp(self):
+        self.simulation = Simulation.get_instance()
+        self.saved = (self.simulation.simulation_type, self.simulation.get_backend())
+
+    def tearDown(self):
+        self.simulation.simulation_type, backend = self.saved
+        self.simulation.set_backend(backend)
+
+    def test_switch_back_to_fock(self):
+        fock = FockBackendFirst()
+        self.simulation.set_backend(fock)
+        self.simulation.set_simulation_type(SimulationType.GAUSSIAN)
+        self.assertIsInstance(self.simulation.get_backend(), GaussianBackend)
+        self.simulation.set_simulation_type(SimulationType.FOCK)
+        self.assertIs(self.simulation.get_backend(), fock)
@@ -0,0 +1,73 @@
+import unittest
+
+import numpy as np
+
+from quasi._math.fock import ops
+from quasi._math.fock.mps import MPS
+from quasi.backend.mps_backend import MPSBackend
+
+
+def bs(theta, phi, cutoff):
+    return ops.beamsplitter(theta, phi, cutoff).transpose((0, 2, 1, 3))
+
+
+class TestMPS(unittest.TestCase):
+
+    def setUp(self):
+        self.cutoff = 3
+        self.steps = [
+            (ops.displacement(0.4, 0.1, self.cutoff), [0]),
+            (ops.squeezing(0.2, 0.3, self.cutoff), [3]),
+            (bs(0.6, 0.2, self.cutoff), [3, 0]),
+            (bs(0.3, 0.0, self.cutoff), [1, 4]),
+            (ops.phase(0.5, self.cutoff), [4]),
+            (bs(0.9, 0.4, self.cutoff), [0, 2]),
+        ]
+
+    def reference(self, n):
+        ket = ops.vacuum_state(n, self.cutoff)
+        for operator, modes in self.steps:
+            ket = ops.apply_gate_ket(operator, ket, modes, n)
+        return ket
+
+    def test_exact_without_truncation(self):
+        state = MPS(5, self.cutoff)
+        for operator, modes in self.steps:
+            state.apply_gate(operator, modes)
+        np.testing.assert_allclose(
+            state.to_state().ket(normalize=False), self.reference(5), atol=1e-12
+        )
+        self.assertEqual(state.discarded_weight, 0.0)
+        probs = np.sum(np.abs(self.reference(5)) ** 2, axis=(0, 1, 2, 4))
+        np.testing.assert_allclose(state.fock_probs(3), probs / probs.sum(), atol=1e-12)
+
+    def test_truncation_reports_discarded_weight(self):
+        state = MPS(5, self.cutoff, max_bond=1)
+        for operator, modes in self.steps:
+            state.apply_gate(operator, modes)
+        self.assertTrue(max(state.bond_dimensions()) == 1)
+        self.assertGreater(state.discarded_weight, 0.0)
+
+    def test_remove_mode(self):
+        state = MPS(5, self.cutoff)
+        for operator, modes in self.steps:
+            state.apply_gate(operator, modes)
+        ket = self.reference(5)
+        state.remove_mode(1, outcome=0)
+        state.remove_mode(0)
+        rho = np.einsum("abcd,aefg->bcdefg", ket[:, 0], ket[:, 0].conj())
+        rho = rho.transpose((0, 3, 1, 4, 2, 5))
+        np.testing.assert_allclose(
+            state.to_state().dm(normalize=False), rho, atol=1e-12
+        )
+
+    def test_backend(self):
+        backend = MPSBackend()
+        backend.set_number_of_modes(3)
+        backend.set_dimensions(self.cutoff)
+        backend.initialize()
+        backend.initialize_number_state(1, 0)
+        backend.apply_operator(backend.beam_splitter(np.pi / 4, 0), [0, 2])
+        np.testing.assert_allclose(
+            backend.state.fock_probs(2), [0.5, 0.5, 0], atol=1e-12
+        )
@@ -0,0 +1,65 @@
+import json
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from quasi._math.fock import ops
+from quasi._math.fock.operator_cache import (
+    InvalidCacheException,
+    OperatorCache,
+    UnknownGateException,
+)
+
+
+class TestOperatorCache(unittest.TestCase):
+
+    def test_hits_and_misses(self):
+        cache = OperatorCache(maxsize=2)
+        first = cache.get("beamsplitter", 0.3, 0.1, cutoff=3)
+        second = cache.get("beamsplitter", 0.3 + 1e-15, 0.1, cutoff=3)
+        self.assertIs(first, second)
+        np.testing.assert_allclose(first, ops.beamsplitter(0.3, 0.1, 3))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertFalse(first.flags.writeable)
+
+    def test_eviction(self):
+        cache = OperatorCache(maxsize=2)
+        cache.get("phase", 0.1, cutoff=3)
+        cache.get("phase", 0.2, cutoff=3)
+        cache.get("phase", 0.1, cutoff=3)
+        cache.get("phase", 0.3, cutoff=3)
+        self.assertEqual(len(cache.operators), 2)
+        self.assertIn(cache.key("phase", (0.1,), 3, np.complex128), cache.operators)
+        with self.assertRaises(UnknownGateException):
+            cache.get("rotation", 0.1, cutoff=3)
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "operators.cache"
+            cache = OperatorCache(path=path)
+            cache.get("displacement", 0.2, 0.4, cutoff=4)
+            cache.save()
+            restored = OperatorCache(path=path)
+            restored.load()
+            restored.get("displacement", 0.2, 0.4, cutoff=4)
+            self.assertEqual(restored.stats()["hits"], 1)
+
+    def test_invalid_cache_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "operators.cache"
+            cache = OperatorCache(path=path)
+            cache.get("phase", 0.2, cutoff=4)
+            key = json.dumps([["phase", [0.2], 5, "<c16"]])
+            with open(path, "wb") as file:
+                np.savez(file, keys=np.array(key), op_0=np.eye(4, dtype=np.complex128))
+            with self.assertRaises(InvalidCacheException):
+                cache.load()
+            # Pickled objects are never loaded
+            with open(path, "wb") as file:
+                pickle.dump([(("phase", (0.2,), 4, "<c16"), np.eye(4))], file)
+            with self.assertRaises(InvalidCacheException):
+                cache.load()
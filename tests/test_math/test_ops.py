@@ -0,0 +1,215 @@
+import unittest
+
+import numpy as np
+
+from quasi._math import contractions
+from quasi._math.fock import ops, kernels
+from quasi._math.states import FockState
+
+
+def random_dm(num_modes, cutoff, rng):
+    """
+    Random mixed state with interleaved (ket, bra) axes per mode
+    """
+    dim = cutoff**num_modes
+    x = rng.normal(size=(dim, dim)) + 1j * rng.normal(size=(dim, dim))
+    rho = x @ x.conj().T
+    rho /= np.trace(rho)
+    rho = rho.reshape([cutoff] * (2 * num_modes))
+    transpose_list = [
+        k for m in range(num_modes) for k in (m, m + num_modes)
+    ]
+    return np.transpose(rho, transpose_list)
+
+
+class TestApplyGate(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(1234)
+        self.cutoff = 3
+
+    def test_single_mode_gate(self):
+        state = random_dm(3, self.cutoff, self.rng)
+        gate = ops.displacement(0.3, 0.2, self.cutoff)
+        for mode in range(3):
+            einsum = ops.apply_gate_einsum(gate, state, [mode], 3)
+            blas = ops.apply_gate_BLAS(gate, state, [mode], 3, self.cutoff)
+            np.testing.assert_allclose(blas, einsum, atol=1e-12)
+
+    def test_two_mode_gate(self):
+        state = random_dm(4, self.cutoff, self.rng)
+        gate = ops.beamsplitter(0.4, 0.7, self.cutoff).transpose((0, 2, 1, 3))
+        for modes in ([0, 1], [1, 3], [3, 0]):
+            einsum = ops.apply_gate_einsum(gate, state, modes, 4)
+            blas = ops.apply_gate_BLAS(gate, state, modes, 4, self.cutoff)
+            np.testing.assert_allclose(blas, einsum, atol=1e-12)
+
+    def test_method_selection(self):
+        state = random_dm(2, self.cutoff, self.rng)
+        gate = ops.phase(0.5, self.cutoff)
+        np.testing.assert_allclose(
+            ops.apply_gate(gate, state, [1], 2, self.cutoff, method="blas"),
+            ops.apply_gate(gate, state, [1], 2, self.cutoff, method="einsum"),
+            atol=1e-12,
+        )
+        with self.assertRaises(ValueError):
+            ops.apply_gate(gate, state, [1], 2, self.cutoff, method="loop")
+
+    def test_numba_kernels(self):
+        state = random_dm(3, self.cutoff, self.rng)
+        gate = ops.beamsplitter(0.4, 0.7, self.cutoff).transpose((0, 2, 1, 3))
+        for modes in ([2, 0], [1]):
+            if len(modes) == 1:
+                gate = ops.displacement(0.3, 0.2, self.cutoff)
+            einsum = ops.apply_gate_einsum(gate, state, modes, 3)
+            original = state.copy()
+            numba = ops.apply_gate(gate, state, modes, 3, self.cutoff, method="numba")
+            np.testing.assert_allclose(numba, einsum, atol=1e-12)
+            np.testing.assert_array_equal(state, original)
+            ket = ops.coherent_state(0.4, 0.1, self.cutoff)
+            ket = np.multiply.outer(np.multiply.outer(ket, ket[::-1]), ket)
+            np.testing.assert_allclose(
+                kernels.apply_gate_ket(gate, ket.copy(), modes, 3),
+                ops.apply_gate_ket(gate, ket, modes, 3),
+                atol=1e-12,
+            )
+
+
+class TestBatchBuilders(unittest.TestCase):
+
+    def test_matches_scalar_builders(self):
+        cutoff = 4
+        rs = np.linspace(0, 1, 5)
+        phis = np.array([[0.1], [0.7]])
+        batches = [
+            (ops.beamsplitter_batch, ops.beamsplitter),
+            (ops.displacement_batch, ops.displacement),
+            (ops.squeezing_batch, ops.squeezing),
+        ]
+        for batch, scalar in batches:
+            stacked = batch(rs, phis, cutoff)
+            self.assertEqual(stacked.shape[:2], (2, 5))
+            np.testing.assert_allclose(
+                stacked[1, 3], scalar(rs[3], phis[1, 0], cutoff), atol=1e-14
+            )
+        np.testing.assert_allclose(
+            ops.phase_batch(rs, cutoff)[2], ops.phase(rs[2], cutoff), atol=1e-14
+        )
+
+
+class TestApplyChannel(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(5678)
+        self.cutoff = 3
+
+    def reference(self, kraus_ops, state, modes, n):
+        return sum(ops.apply_gate_einsum(k, state, modes, n) for k in kraus_ops)
+
+    def test_single_mode_superoperator(self):
+        state = random_dm(3, self.cutoff, self.rng)
+        kraus = ops.lossChannel(0.6, self.cutoff)
+        for mode in range(3):
+            np.testing.assert_allclose(
+                ops.apply_superoperator(ops.superoperator(kraus), state, mode, 3),
+                self.reference(kraus, state, [mode], 3),
+                atol=1e-12,
+            )
+
+    def test_two_mode_stacked(self):
+        state = random_dm(3, self.cutoff, self.rng)
+        loss = ops.lossChannel(0.5, self.cutoff)
+        kraus = [
+            np.einsum("ab,cd->abcd", k1, k2) for k1 in loss for k2 in loss
+        ]
+        for modes in ([0, 2], [2, 1]):
+            np.testing.assert_allclose(
+                ops.apply_kraus_stacked(kraus, state, modes, 3),
+                self.reference(kraus, state, modes, 3),
+                atol=1e-12,
+            )
+
+    def test_per_mode_dims(self):
+        dims = [4, 2, 3]
+        dim = int(np.prod(dims))
+        x = self.rng.normal(size=(dim, dim)) + 1j * self.rng.normal(size=(dim, dim))
+        state = (x @ x.conj().T).reshape(dims + dims).transpose((0, 3, 1, 4, 2, 5))
+        loss = ops.lossChannel(0.5, 4)
+        kraus = [
+            ops.truncate_gate(np.einsum("ab,cd->abcd", k1, k2), [3, 4])
+            for k1 in loss
+            for k2 in loss
+        ]
+        np.testing.assert_allclose(
+            ops.apply_kraus_stacked(kraus, state, [2, 0], 3),
+            self.reference(kraus, state, [2, 0], 3),
+            atol=1e-12,
+        )
+
+
+class TestContractions(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(2468)
+        self.cutoff = 3
+
+    def test_partial_trace_and_reduced_dm(self):
+        state = random_dm(3, self.cutoff, self.rng)
+        flat = state.transpose((0, 2, 4, 1, 3, 5))
+        expected = np.einsum("abcdbc->ad", flat)
+        np.testing.assert_allclose(
+            ops.partial_trace(state, 3, [1, 2]), expected, atol=1e-14
+        )
+        fock_state = FockState(state, 3, self.cutoff)
+        np.testing.assert_allclose(fock_state.reduced_dm([0]), expected, atol=1e-14)
+        np.testing.assert_allclose(ops.reduced_dm(fock_state, 0), expected, atol=1e-14)
+        self.assertAlmostEqual(ops.calculate_trace(fock_state), 1.0)
+
+    def test_path_is_cached(self):
+        state = random_dm(2, self.cutoff, self.rng)
+        contractions.einsum_path.cache_clear()
+        for _ in range(3):
+            ops.partial_trace(state, 2, [0])
+        info = contractions.einsum_path.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 2))
+
+    def test_many_modes(self):
+        # Beyond the 26 letters of the einsum string form, density matrices
+        # of that many modes fit in memory only with the trivial cutoff
+        n = 20
+        dm = ops.mix(ops.vacuum_state(n, 1), n)
+        state = FockState(dm, n, 1)
+        self.assertAlmostEqual(ops.calculate_trace(state), 1.0)
+        self.assertEqual(state.reduced_dm([0, 7]).shape, (1, 1, 1, 1))
+        self.assertEqual(ops.partial_trace(dm, n, [3]).ndim, 2 * (n - 1))
+        gate = ops.beamsplitter(0.3, 0, 1).transpose((0, 2, 1, 3))
+        out = ops.apply_gate_einsum(gate, dm, [0, n - 1], n)
+        np.testing.assert_allclose(
+            out, ops.apply_gate_BLAS(gate, dm, [0, n - 1], n, 1), atol=1e-14
+        )
+
+    def test_many_mode_ket(self):
+        n = 20
+        ket = ops.vacuum_state(n, 2)
+        gate = ops.beamsplitter(np.pi / 4, 0, 2).transpose((0, 2, 1, 3))
+        ket = ops.apply_gate_ket(ops.adagger(2), ket, [0], n)
+        ket = ops.apply_gate_ket(gate, ket, [0, n - 1], n)
+        state = FockState(ket, n, 2, pure=True)
+        self.assertAlmostEqual(ops.calculate_trace(state), 1.0)
+        np.testing.assert_allclose(
+            np.diagonal(state.reduced_dm([n - 1])).real, [0.5, 0.5], atol=1e-14
+        )
+
+    def test_per_mode_dims(self):
+        dims = [4, 2, 3]
+        dim = int(np.prod(dims))
+        x = self.rng.normal(size=(dim, dim)) + 1j * self.rng.normal(size=(dim, dim))
+        rho = (x @ x.conj().T).reshape(dims + dims).transpose((0, 3, 1, 4, 2, 5))
+        gate = ops.truncate_gate(
+            ops.beamsplitter(0.3, 0.4, 4).transpose((0, 2, 1, 3)), [4, 3]
+        )
+        np.testing.assert_allclose(
+            ops.apply_gate_BLAS(gate, rho, [0, 2], 3, None),
+            ops.apply_gate_einsum(gate, rho, [0, 2], 3),
+            atol=1e-12,
+        )
@@ -0,0 +1,112 @@
+import unittest
+
+import numpy as np
+
+from quasi._math.fock import ops
+from quasi._math.fock.sectors import SectorState
+from quasi.experiment import Experiment
+from tests.test_math.test_ops import random_dm
+
+
+class TestSectorState(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(99)
+        self.cutoff = 3
+
+    def test_round_trip(self):
+        rho = random_dm(3, self.cutoff, self.rng)
+        state = SectorState.from_dm(rho, 3, self.cutoff)
+        np.testing.assert_allclose(state.to_dm(), rho, atol=1e-14)
+
+    def test_gates_and_channel(self):
+        rho = random_dm(3, self.cutoff, self.rng)
+        state = SectorState.from_dm(rho, 3, self.cutoff)
+        bs = ops.beamsplitter(0.5, 0.2, self.cutoff).transpose((0, 2, 1, 3))
+        steps = [
+            (bs, [2, 0]),
+            (ops.phase(0.7, self.cutoff), [1]),
+            (ops.squeezing(0.1, 0.4, self.cutoff), [2]),
+        ]
+        for operator, modes in steps:
+            rho = ops.apply_gate_einsum(operator, rho, modes, 3)
+            state.apply_gate(operator, modes)
+        kraus = ops.lossChannel(0.6, self.cutoff)
+        rho = sum(ops.apply_gate_einsum(k, rho, [1], 3) for k in kraus)
+        state.apply_kraus(kraus, [1])
+        np.testing.assert_allclose(state.to_dm(), rho, atol=1e-12)
+
+    def test_passive_gates_stay_in_sector(self):
+        state = SectorState.vacuum(2, self.cutoff)
+        state.apply_gate(ops.adagger(self.cutoff), [0])
+        bs = ops.beamsplitter(np.pi / 4, 0, self.cutoff).transpose((0, 2, 1, 3))
+        state.apply_gate(bs, [0, 1])
+        self.assertEqual(list(state.blocks), [(1, 1)])
+        self.assertAlmostEqual(state.trace(), 1.0)
+
+
+class TestSectorExecution(unittest.TestCase):
+
+    def setUp(self):
+        self.experiment = Experiment()
+        self.experiment.reset()
+        self.experiment.update_mode_number(3)
+        self.experiment.update_dimensions(4)
+        bs = ops.beamsplitter(0.5, 0.2, 4).transpose((0, 2, 1, 3))
+        self.experiment.state_init(1, [0])
+        self.experiment.state_init(2, [2])
+        self.experiment.add_operation(bs, [0, 1])
+        self.experiment.add_operation(ops.phase(0.3, 4), [1])
+        self.experiment.add_operation(bs, [1, 2])
+        self.experiment.add_channel(ops.lossChannel(0.7, 4), [2])
+
+    def tearDown(self):
+        self.experiment.reset()
+
+    def test_matches_dense(self):
+        exp = self.experiment
+        exp.execute()
+        dense = exp.state
+        exp.set_use_sectors(True)
+        exp.execute()
+        state = exp.state
+        np.testing.assert_allclose(
+            state.all_fock_probs(), dense.all_fock_probs(), atol=1e-12
+        )
+        self.assertAlmostEqual(state.mean_photon(2), dense.mean_photon(2))
+        # Dense density matrix is assembled only when it is read
+        self.assertIsNone(state._data)
+        np.testing.assert_allclose(
+            state.reduced_dm([0, 1]), dense.reduced_dm([0, 1]), atol=1e-12
+        )
+        np.testing.assert_allclose(state.dm(), dense.dm(), atol=1e-12)
+
+    def test_single_precision(self):
+        exp = self.experiment
+        exp.set_use_sectors(True)
+        exp.set_dtype(np.complex64)
+        exp.execute()
+        self.assertEqual(exp.state.dm().dtype, np.complex64)
+        self.assertAlmostEqual(np.sum(exp.state.all_fock_probs()), 1.0, places=5)
+
+    def test_repeated_preparation(self):
+        exp = self.experiment
+        # a^dagger |1> = sqrt(2) |2>
+        exp.state_init(1, [0])
+        results = []
+        for use_sectors in (False, True):
+            exp.set_use_sectors(use_sectors)
+            exp.execute()
+            results.append((exp.expected_trace, exp.truncation_loss()))
+        self.assertAlmostEqual(results[1][0], 2.0)
+        np.testing.assert_allclose(results[1], results[0], atol=1e-12)
+
+    def test_photon_number_exceeds_cutoff(self):
+        exp = self.experiment
+        exp.state_init(4, [1])
+        for use_sectors in (False, True):
+            exp.set_use_sectors(use_sectors)
+            with self.assertRaisesRegex(
+                ValueError, "Photon number 4 exceeds the cutoff of mode 1"
+            ):
+                exp.execute()
@@ -0,0 +1,197 @@
+import unittest
+
+import numpy as np
+
+from quasi._math.fock import ops
+from quasi._math.states import FockState, diagonal_view
+from quasi.experiment import Experiment
+from tests.test_math.test_ops import random_dm
+
+
+class TestLazyNormalization(unittest.TestCase):
+
+    def test_ket_is_normalized_when_read(self):
+        ket = np.array([3.0, 4.0j, 0.0])
+        state = FockState(ket, 1, 3, pure=True, normalized=False)
+        self.assertFalse(state.is_normalized)
+        self.assertAlmostEqual(state.trace, 25.0)
+        np.testing.assert_allclose(state.all_fock_probs(), [0.36, 0.64, 0.0])
+        self.assertTrue(state.is_normalized)
+        self.assertAlmostEqual(ops.calculate_trace(state), 1.0)
+
+    def test_dm_is_normalized_when_read(self):
+        ket = ops.fock_state(1, 3) * 2
+        state = FockState(ops.mix(ket, 1), 1, 3, normalized=False)
+        np.testing.assert_allclose(ops.calculate_trace(state), 4.0)
+        np.testing.assert_allclose(state.dm(), ops.mix(ket / 2, 1), atol=1e-15)
+
+
+class TestSinglePrecision(unittest.TestCase):
+
+    def setUp(self):
+        self.experiment = Experiment()
+        self.experiment.reset()
+        self.experiment.update_mode_number(3)
+        self.experiment.update_dimensions(5)
+
+    def tearDown(self):
+        self.experiment.reset()
+
+    def test_precision_error(self):
+        exp = self.experiment
+        bs = ops.beamsplitter(0.4, 0.2, 5).transpose((0, 2, 1, 3))
+        exp.state_init(1, [0])
+        exp.add_operation(ops.displacement(0.3, 0.1, 5), [1])
+        exp.add_operation(bs, [0, 1])
+        exp.add_operation(bs, [1, 2])
+        exp.set_dtype(np.complex64)
+        error = exp.precision_error()
+        self.assertEqual(exp.state.ket().dtype, np.complex64)
+        self.assertGreater(error, 0.0)
+        self.assertLess(error, 1e-5)
+
+    def test_reset_restores_settings(self):
+        exp = self.experiment
+        exp.set_dtype(np.complex64)
+        exp.set_use_ket(False)
+        exp.set_gate_method("einsum")
+        exp.reset()
+        self.assertIs(exp.dtype, np.complex128)
+        self.assertTrue(exp.use_ket)
+        self.assertEqual(exp.gate_method, "blas")
+
+
+class TestBatchExecution(unittest.TestCase):
+
+    def setUp(self):
+        self.experiment = Experiment()
+        self.experiment.reset()
+        self.experiment.update_mode_number(2)
+        self.experiment.update_dimensions(4)
+
+    def tearDown(self):
+        self.experiment.reset()
+
+    def test_phase_sweep(self):
+        exp = self.experiment
+        bs = ops.beamsplitter(np.pi / 4, 0, 4).transpose((0, 2, 1, 3))
+        thetas = np.linspace(0, np.pi, 5)
+        exp.state_init(1, [0])
+        exp.add_operation(bs, [0, 1])
+        # Modes recorded as an int, like execute accepts them
+        exp.add_operation(ops.phase_batch(thetas, 4), 0)
+        exp.add_operation(bs, [0, 1])
+        states = exp.execute_batch()
+        self.assertEqual(len(states), len(thetas))
+        for theta, state in zip(thetas, states):
+            # Mach-Zehnder interferometer fringe
+            probs = state.all_fock_probs()
+            self.assertAlmostEqual(probs[1, 0], np.sin(theta / 2) ** 2)
+
+    def test_repeated_preparation(self):
+        exp = self.experiment
+        exp.state_init(1, [0])
+        exp.state_init(1, [0])
+        exp.add_operation(ops.phase_batch(np.linspace(0, np.pi, 3), 4), [0])
+        for use_ket in (True, False):
+            exp.set_use_ket(use_ket)
+            states = exp.execute_batch()
+            # a^dagger |1> = sqrt(2) |2>
+            np.testing.assert_allclose(exp.batch_expected_traces, [2, 2, 2])
+            for state in states:
+                self.assertAlmostEqual(state.trace, 2)
+                self.assertAlmostEqual(state.all_fock_probs()[2, 0], 1)
+
+    def test_photon_number_exceeds_cutoff(self):
+        exp = self.experiment
+        exp.state_init(4, [1])
+        with self.assertRaisesRegex(ValueError, "Photon number 4 exceeds the cutoff of mode 1"):
+            exp.execute_batch()
+        with self.assertRaisesRegex(ValueError, "Photon number 4 exceeds the cutoff of mode 1"):
+            exp.execute()
+
+
+class TestDiagonalView(unittest.TestCase):
+
+    def test_probabilities_and_marginals(self):
+        rng = np.random.default_rng(5)
+        rho = random_dm(3, 3, rng)
+        view = diagonal_view(rho)
+        self.assertTrue(np.shares_memory(view, rho))
+        state = FockState(rho, 3, 3)
+        probs = np.einsum("aabbcc->abc", rho).real
+        np.testing.assert_allclose(state.all_fock_probs(), probs, atol=1e-15)
+        for mode in range(3):
+            np.testing.assert_allclose(
+                state.fock_marginal(mode),
+                np.diagonal(state.reduced_dm(mode)).real,
+                atol=1e-15,
+            )
+        self.assertAlmostEqual(
+            state.mean_photon(1), np.sum(np.arange(3) * probs.sum(axis=(0, 2)))
+        )
+        # Devices pass the modes as a list
+        self.assertAlmostEqual(state.mean_photon(mode=[1]), state.mean_photon(1))
+        np.testing.assert_allclose(state.fock_marginal([2]), state.fock_marginal(2))
+
+
+class TestReducedDm(unittest.TestCase):
+
+    def test_pure_matches_mixed(self):
+        kets = [ops.coherent_state(alpha, 0.3, 4) for alpha in (0.2, 0.5, 0.9)]
+        kets = [k / np.linalg.norm(k) for k in kets]
+        ket = np.einsum("a,b,c->abc", *kets)
+        pure = FockState(ket, 3, 4, pure=True)
+        mixed = FockState(ops.mix(ket, 3), 3, 4)
+        # Unsorted modes, the reduced state follows the mode order
+        reduced = pure.reduced_dm([2, 0])
+        np.testing.assert_allclose(reduced, mixed.reduced_dm([2, 0]), atol=1e-12)
+        expected = np.einsum(
+            "ab,cd->abcd", *(np.outer(k, k.conj()) for k in kets[::2])
+        )
+        np.testing.assert_allclose(reduced, expected, atol=1e-12)
+
+
+class TestSampling(unittest.TestCase):
+
+    def test_sample_frequencies(self):
+        ket = np.zeros((3, 3), dtype=np.complex128)
+        ket[0, 1] = 0.6
+        ket[2, 0] = 0.8j
+        state = FockState(ket, 2, 3, pure=True)
+        samples = state.sample(200000, modes=[1, 0], rng=np.random.default_rng(3))
+        self.assertEqual(samples.shape, (200000, 2))
+        self.assertAlmostEqual(np.mean((samples == [1, 0]).all(axis=1)), 0.36, places=2)
+        self.assertAlmostEqual(np.mean((samples == [0, 2]).all(axis=1)), 0.64, places=2)
+        np.testing.assert_array_equal(
+            state.sample(10, rng=np.random.default_rng(7)),
+            state.sample(10, rng=np.random.default_rng(7)),
+        )
+
+
+class TestNumberStatePreparation(unittest.TestCase):
+
+    def setUp(self):
+        self.experiment = Experiment()
+        self.experiment.reset()
+        self.experiment.update_mode_number(2)
+        self.experiment.update_dimensions(5)
+
+    def tearDown(self):
+        self.experiment.reset()
+
+    def test_fock_operator(self):
+        vacuum = ops.fock_state(0, 5)
+        np.testing.assert_allclose(ops.fock_operator(3, 5) @ vacuum, ops.fock_state(3, 5))
+
+    def test_direct_and_fallback(self):
+        exp = self.experiment
+        exp.state_init(3, [1])
+        exp.state_init(1, [0])
+        exp.state_init(1, [0])
+        for use_ket in (True, False):
+            exp.set_use_ket(use_ket)
+            exp.execute()
+            probs = exp.state.all_fock_probs()
+            self.assertAlmostEqual(probs[2, 3], 1.0)
+            self.assertAlmostEqual(exp.truncation_loss(), 0.0)
@@ -0,0 +1,96 @@
+import unittest
+
+import mpmath
+
+from quasi.simulation import Simulation
+
+
+class Recorder:
+    """
+    Device which records the signals of every des call
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = []
+
+    def des(self, time, *args, **kwargs):
+        self.calls.append((float(time), sorted(kwargs["signals"])))
+
+
+class TestCoalescing(unittest.TestCase):
+
+    def setUp(self):
+        self.simulation = Simulation.get_instance()
+        self.saved = (
+            self.simulation.event_queue,
+            self.simulation.event_map,
+            self.simulation.device_events,
+            self.simulation.current_time,
+            self.simulation.end_time,
+        )
+        self.simulation.event_queue = []
+        self.simulation.event_map = {}
+        self.simulation.device_events = {}
+        self.simulation.current_time = mpmath.mpf(0)
+        self.simulation.end_time = mpmath.mpf(0)
+
+    def tearDown(self):
+        (
+            self.simulation.event_queue,
+            self.simulation.event_map,
+            self.simulation.device_events,
+            self.simulation.current_time,
+            self.simulation.end_time,
+        ) = self.saved
+
+    def schedule(self, quantum):
+        device = Recorder("recorder")
+        self.simulation.set_coalescing_quantum(quantum, device=device)
+        self.addCleanup(self.simulation.device_quanta.pop, device)
+        for time, port in (
+            (3.0009999e-6, "a"),
+            (3.001e-6, "b"),
+            (3.001e-6, "c"),
+            (5e-6, "d"),
+        ):
+            self.simulation.schedule_event(
+                mpmath.mpf(time), device, signals={port: None}
+            )
+        self.simulation.run_des(1e-5)
+        return device.calls
+
+    def test_quantum_merge(self):
+        # The first two events are 1e-13 s apart
+        calls = self.schedule(1e-12)
+        self.assertEqual(
+            calls, [(3.0009999e-6, ["a", "b", "c"]), (5e-6, ["d"])]
+        )
+        self.assertEqual(self.simulation.device_events, {})
+
+    def test_quantum_below_separation(self):
+        calls = self.schedule(1e-15)
+        self.assertEqual(
+            calls, [(3.0009999e-6, ["a"]), (3.001e-6, ["b", "c"]), (5e-6, ["d"])]
+        )
+
+    def test_zero_quantum_is_exact(self):
+        calls = self.schedule(0)
+        self.assertEqual(
+            calls, [(3.0009999e-6, ["a"]), (3.001e-6, ["b", "c"]), (5e-6, ["d"])]
+        )
+        self.assertEqual(self.simulation.device_events, {})
+
+    def test_time_warp_leftover_events(self):
+        device = Recorder("recorder")
+        device.supports_rollback = lambda: True
+        self.simulation.set_coalescing_quantum(1e-3, device=device)
+        self.addCleanup(self.simulation.device_quanta.pop, device)
+        self.simulation.schedule_event(mpmath.mpf(5), device, signals={"a": None})
+        self.simulation.run_time_warp(1, partitions=[[device]])
+        # Event within the quantum of the leftover event
+        self.simulation.schedule_event(
+            mpmath.mpf("5.0001"), device, signals={"b": None}
+        )
+        self.simulation.run_des(10)
+        self.assertEqual(device.calls, [(5.0, ["a", "b"])])
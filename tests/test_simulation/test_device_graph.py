@@ -0,0 +1,105 @@
+import unittest
+
+from quasi.devices.port import Port
+from quasi.signals import GenericBoolSignal
+from quasi.simulation.device_graph import (
+    CyclicDependencyException,
+    DeviceGraph,
+    UnconnectedInputException,
+    execute_graph,
+)
+
+
+class MockDevice:
+    """
+    Device with the named input and output ports, which records
+    the order in which the outputs are computed
+    """
+
+    def __init__(self, name, order, inputs=(), outputs=()):
+        self.name = name
+        self.order = order
+        self.ports = {}
+        for label in inputs:
+            self.ports[label] = Port(label, "input", None, GenericBoolSignal, self)
+        for label in outputs:
+            self.ports[label] = Port(label, "output", None, GenericBoolSignal, self)
+
+    def compute_outputs(self):
+        self.order.append(self.name)
+        for port in self.ports.values():
+            if port.direction == "output" and port.signal is not None:
+                port.signal.set_computed()
+
+
+def connect(source, output, target, input_label):
+    signal = GenericBoolSignal()
+    for device, label in ((source, output), (target, input_label)):
+        port = device.ports[label]
+        signal.register_port(port, device)
+        port.signal = signal
+
+
+def diamond(order):
+    a = MockDevice("a", order, outputs=["x", "y"])
+    b = MockDevice("b", order, inputs=["in"], outputs=["out"])
+    c = MockDevice("c", order, inputs=["in"], outputs=["out"])
+    d = MockDevice("d", order, inputs=["x", "y"])
+    connect(a, "x", b, "in")
+    connect(a, "y", c, "in")
+    connect(b, "out", d, "x")
+    connect(c, "out", d, "y")
+    return a, b, c, d
+
+
+class TestDeviceGraph(unittest.TestCase):
+
+    def test_diamond_waves(self):
+        a, b, c, d = diamond([])
+        # Registration order doesn't follow the dependencies
+        graph = DeviceGraph([d, c, b, a])
+        waves = graph.topological_waves()
+        self.assertEqual([set(w) for w in waves], [{a}, {b, c}, {d}])
+        self.assertEqual(graph.order()[0], a)
+        self.assertEqual(graph.order()[-1], d)
+
+    def test_execution_order(self):
+        for max_workers in (None, 2):
+            order = []
+            devices = diamond(order)
+            execute_graph(DeviceGraph(devices[::-1]), max_workers=max_workers)
+            self.assertEqual(order[0], "a")
+            self.assertEqual(set(order[1:3]), {"b", "c"})
+            self.assertEqual(order[3], "d")
+
+    def test_connected_components(self):
+        order = []
+        a, b, c, d = diamond(order)
+        e = MockDevice("e", order, outputs=["out"])
+        f = MockDevice("f", order, inputs=["in"])
+        connect(e, "out", f, "in")
+        g = MockDevice("g", order)
+        components = DeviceGraph([a, e, b, f, c, g, d]).connected_components()
+        self.assertEqual(
+            sorted(sorted(m.name for m in component) for component in components),
+            [["a", "b", "c", "d"], ["e", "f"], ["g"]],
+        )
+
+    def test_cycle(self):
+        order = []
+        a = MockDevice("a", order, inputs=["in"], outputs=["out"])
+        b = MockDevice("b", order, inputs=["in"], outputs=["out"])
+        connect(a, "out", b, "in")
+        connect(b, "out", a, "in")
+        with self.assertRaises(CyclicDependencyException):
+            DeviceGraph([a, b]).topological_waves()
+
+    def test_unconnected_input(self):
+        order = []
+        a = MockDevice("a", order, inputs=["in"])
+        signal = GenericBoolSignal()
+        signal.register_port(a.ports["in"], a)
+        a.ports["in"].signal = signal
+        with self.assertRaises(UnconnectedInputException):
+            execute_graph(DeviceGraph([a]))
+        self.assertEqual(order, [])
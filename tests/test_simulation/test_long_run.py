@@ -0,0 +1,52 @@
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from quasi.simulation.long_run import ResultRecorder, load_results
+
+
+def mock_device(name):
+    return SimpleNamespace(name=name, ref=SimpleNamespace(uuid=f"{name}-uuid"))
+
+
+class TestResultRecorder(unittest.TestCase):
+
+    def test_not_recorded_without_output_dir(self):
+        recorder = ResultRecorder()
+        recorder.record(mock_device("detector"), 1e-6, 1)
+        self.assertEqual(recorder.records, [])
+        self.assertEqual(recorder.buffered_bytes, 0)
+
+    def test_chunked_round_trip(self):
+        detector = mock_device("detector")
+        counter = mock_device("counter")
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder = ResultRecorder()
+            recorder.set_output_dir(tmp)
+            for i in range(10):
+                recorder.record(detector, i * 1e-6, i)
+                if i % 3 == 2:
+                    recorder.flush()
+            recorder.flush()
+            self.assertEqual(recorder.records, [])
+            self.assertEqual(recorder.chunks, 4)
+            self.assertEqual(recorder.flushed_records, 10)
+
+            # Chunks written by the parallel components
+            component = ResultRecorder()
+            component.set_output_dir(Path(tmp) / "component_000")
+            component.record(counter, 2.5e-6, [1, 0])
+            component.flush()
+
+            records = load_results(tmp)
+        self.assertEqual(len(records), 11)
+        times = [r["time"] for r in records]
+        self.assertEqual(times, sorted(times))
+        self.assertEqual(
+            [r["value"] for r in records if r["name"] == "detector"], list(range(10))
+        )
+        self.assertIn(
+            {"time": 2.5e-6, "device": "counter-uuid", "name": "counter", "value": [1, 0]},
+            records,
+        )
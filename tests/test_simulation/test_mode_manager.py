@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+
+from quasi.backend.fock_first_backend import FockBackendFirst
+from quasi.experiment import Experiment
+from quasi.simulation import ModeManager, Simulation
+
+
+class TestModeRemoval(unittest.TestCase):
+
+    def setUp(self):
+        self.simulation = Simulation.get_instance()
+        self.saved = self.simulation.get_backend()
+        self.backend = FockBackendFirst()
+        self.simulation.set_backend(self.backend)
+        self.experiment = Experiment()
+        self.experiment.reset()
+        self.experiment.update_mode_number(3)
+        self.experiment.update_dimensions(3)
+        self.mm = ModeManager()
+        self.mm.clear_modes()
+
+    def tearDown(self):
+        self.mm.clear_modes()
+        self.experiment.reset()
+        self.simulation.set_backend(self.saved)
+
+    def test_heralded_photon(self):
+        herald, idler, signal = (self.mm.create_new_mode() for _ in range(3))
+        bs = self.backend.beam_splitter(np.pi / 4, 0)
+        self.backend.initialize_number_state(1, [self.mm.get_mode_index(herald)])
+        self.backend.apply_operator(
+            bs, [self.mm.get_mode_index(herald), self.mm.get_mode_index(signal)]
+        )
+        # The detector releases the vacuum mode and the measured herald
+        self.mm.remove_mode(idler)
+        self.assertEqual(self.mm.get_mode_index(signal), 1)
+        self.mm.remove_mode(herald, outcome=0)
+        self.assertEqual(self.mm.modes, {signal: 0})
+
+        self.experiment.execute()
+        state = self.experiment.state
+        self.assertEqual(state.dims, [3])
+        np.testing.assert_allclose(state.fock_marginal(0), [0, 1, 0], atol=1e-12)
+        self.assertAlmostEqual(state.trace, 0.5)
+        self.assertAlmostEqual(self.experiment.expected_trace, 0.5)
@@ -0,0 +1,173 @@
+import tempfile
+import unittest
+
+import mpmath
+
+from quasi.devices.detectors.ideal_detector import IdealDetector
+from quasi.devices.fiber.ideal_fiber import IdealFiber
+from quasi.extra.logging import Loggers, get_custom_logger
+from quasi.signals import GenericFloatSignal, GenericQuantumSignal
+from quasi.simulation import DeviceInformation, Simulation
+from quasi.simulation.long_run import load_results
+from quasi.simulation.parallel import fork_available
+
+
+class Ticker:
+    """
+    Device without ports (every ticker is its own component),
+    which schedules itself periodically
+    """
+
+    ports = {}
+
+    def __init__(self, name, period, ticks):
+        self.name = name
+        self.period = mpmath.mpf(period)
+        self.ticks = ticks
+        self.log = []
+        self.simulation = Simulation.get_instance()
+        self.simulation.register_device(DeviceInformation(name=name, obj_ref=self))
+        self.simulation.schedule_event(mpmath.mpf(0), self)
+
+    @classmethod
+    def supports_component_state(cls):
+        return True
+
+    def save_component_state(self):
+        return list(self.log)
+
+    def restore_component_state(self, state):
+        self.log = list(state)
+
+    def des(self, time, *args, **kwargs):
+        self.log.append(float(time))
+        if len(self.log) < self.ticks:
+            self.simulation.schedule_event(time + self.period, self)
+
+
+class SimulationStateTestCase(unittest.TestCase):
+    """
+    Restores the state of the simulation singleton after the test
+    """
+
+    def setUp(self):
+        self.simulation = Simulation.get_instance()
+        self.saved = (
+            self.simulation.devices,
+            self.simulation.event_queue,
+            self.simulation.event_map,
+            self.simulation.current_time,
+            self.simulation.end_time,
+            self.simulation.processes,
+        )
+
+    def tearDown(self):
+        (
+            self.simulation.devices,
+            self.simulation.event_queue,
+            self.simulation.event_map,
+            self.simulation.current_time,
+            self.simulation.end_time,
+            self.simulation.processes,
+        ) = self.saved
+
+
+@unittest.skipUnless(fork_available(), "worker processes are forked")
+class TestParallelDES(SimulationStateTestCase):
+
+    def run_scheme(self, processes):
+        self.simulation.devices = []
+        self.simulation.event_queue = []
+        self.simulation.event_map = {}
+        self.simulation.current_time = mpmath.mpf(0)
+        self.simulation.end_time = mpmath.mpf(0)
+        self.simulation.set_processes(processes)
+        tickers = [Ticker("fast", 1e-6, 10), Ticker("slow", 1.5e-6, 10)]
+        self.simulation.run_des(3e-6)
+        first = [list(t.log) for t in tickers]
+        pending = len(self.simulation.event_queue)
+        self.simulation.run_des(1e-3)
+        return first, pending, [t.log for t in tickers], self.simulation.current_time
+
+    def test_two_runs(self):
+        sequential = self.run_scheme(None)
+        parallel = self.run_scheme(2)
+        self.assertEqual(parallel, sequential)
+        first, pending, logs, _ = parallel
+        self.assertEqual(pending, 2)
+        self.assertLess(sum(map(len, first)), 20)
+        self.assertEqual(sum(map(len, logs)), 20)
+
+
+class Envelope:
+    """
+    Stand-in for the photon_weave envelope, measuring it returns
+    the number of its photons
+    """
+
+    def __init__(self, photons):
+        self.photons = photons
+        self.composite_envelope = self
+        self.states = [[photons]]
+
+    def measure(self, envelope):
+        return [envelope.photons]
+
+
+@unittest.skipUnless(fork_available(), "worker processes are forked")
+class TestParallelDevices(SimulationStateTestCase):
+
+    def tearDown(self):
+        self.simulation.disable_long_run()
+        super().tearDown()
+
+    def chain(self, name, photons):
+        fiber = IdealFiber(name=f"{name} fiber")
+        detector = IdealDetector(name=f"{name} detector")
+        signal = GenericQuantumSignal()
+        fiber.register_signal(signal=signal, port_label="output")
+        detector.register_signal(signal=signal, port_label="input")
+        length = GenericFloatSignal()
+        length.set_float(1000)
+        self.simulation.schedule_event(
+            mpmath.mpf(0), fiber, signals={"length": length}
+        )
+        for i, n in enumerate(photons):
+            pulse = GenericQuantumSignal()
+            pulse.set_contents(content=Envelope(n))
+            self.simulation.schedule_event(
+                mpmath.mpf(i + 1) * mpmath.mpf("2e-6"), fiber, signals={"input": pulse}
+            )
+
+    def run_chains(self, processes):
+        self.simulation.devices = []
+        self.simulation.event_queue = []
+        self.simulation.event_map = {}
+        self.simulation.current_time = mpmath.mpf(0)
+        self.simulation.end_time = mpmath.mpf(0)
+        self.simulation.set_processes(processes)
+        with tempfile.TemporaryDirectory() as tmp:
+            self.simulation.enable_long_run(tmp, flush_interval=1)
+            self.chain("first", [1, 2, 3])
+            self.chain("second", [0, 4])
+            names = {d.obj_ref.ref.uuid: d.name for d in self.simulation.devices}
+            # Pulses are still in the fibers at the horizon
+            self.simulation.run_des(3e-6)
+            pending = len(self.simulation.event_queue)
+            self.simulation.run_des(1e-3)
+            self.simulation.disable_long_run()
+            records = sorted(
+                (r["time"], names[r["device"]], r["value"])
+                for r in load_results(tmp)
+            )
+        return pending, records
+
+    def test_fiber_detector_chains(self):
+        sequential = self.run_chains(None)
+        with self.assertLogs(get_custom_logger(Loggers.Simulation), "INFO") as logs:
+            parallel = self.run_chains(2)
+        self.assertTrue(any("in parallel" in line for line in logs.output))
+        self.assertEqual(parallel, sequential)
+        pending, records = parallel
+        self.assertGreater(pending, 0)
+        self.assertEqual(sorted(value for _, _, value in records), [0, 1, 2, 3, 4])
@@ -0,0 +1,161 @@
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import mpmath
+
+from quasi.simulation import Simulation
+from quasi.simulation.long_run import load_results
+from quasi.simulation.time_warp import RollbackNotSupportedException
+
+
+class MockDevice:
+    """
+    Device with the rollback hooks, which doesn't need ports
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.ref = SimpleNamespace(uuid=name)
+        self.simulation = Simulation.get_instance()
+
+    @classmethod
+    def supports_rollback(cls):
+        return True
+
+
+class Sink(MockDevice):
+    """
+    Ticks every second and reports the number of processed events
+    """
+
+    def __init__(self, name, logger, last_tick):
+        super().__init__(name)
+        self.logger = logger
+        self.last_tick = last_tick
+        self.count = 0
+
+    def save_state(self):
+        return self.count
+
+    def restore_state(self, state):
+        self.count = state
+
+    def des(self, time, *args, **kwargs):
+        self.count += 1
+        if kwargs.get("tick"):
+            if time < self.last_tick:
+                self.simulation.schedule_event(time + 1, self, tick=True)
+            self.simulation.schedule_event(time, self.logger, value=self.count)
+
+
+class Logger(MockDevice):
+    def __init__(self, name):
+        super().__init__(name)
+        self.log = []
+
+    def save_state(self):
+        return tuple(self.log)
+
+    def restore_state(self, state):
+        self.log = list(state)
+
+    def des(self, time, *args, **kwargs):
+        self.log.append((float(time), kwargs["value"]))
+        self.simulation.record_result(self, time, kwargs["value"])
+
+
+class Emitter(MockDevice):
+    """
+    Steps through a chain of its own events and finally sends
+    a late event to the target
+    """
+
+    def __init__(self, name, target, steps, target_time):
+        super().__init__(name)
+        self.target = target
+        self.steps = steps
+        self.target_time = target_time
+        self.step = 0
+
+    def save_state(self):
+        return self.step
+
+    def restore_state(self, state):
+        self.step = state
+
+    def des(self, time, *args, **kwargs):
+        self.step += 1
+        if self.step < self.steps:
+            self.simulation.schedule_event(time + mpmath.mpf("0.01"), self)
+        else:
+            self.simulation.schedule_event(self.target_time, self.target)
+
+
+class TestTimeWarp(unittest.TestCase):
+
+    def setUp(self):
+        self.simulation = Simulation.get_instance()
+        self.saved = (
+            self.simulation.event_queue,
+            self.simulation.event_map,
+            self.simulation.current_time,
+            self.simulation.end_time,
+            self.simulation.max_workers,
+        )
+        self.simulation.event_queue = []
+        self.simulation.event_map = {}
+        self.simulation.current_time = mpmath.mpf(0)
+        self.simulation.end_time = mpmath.mpf(0)
+
+    def tearDown(self):
+        self.simulation.disable_long_run()
+        (
+            self.simulation.event_queue,
+            self.simulation.event_map,
+            self.simulation.current_time,
+            self.simulation.end_time,
+            self.simulation.max_workers,
+        ) = self.saved
+
+    def scheme(self):
+        logger = Logger("logger")
+        sink = Sink("sink", logger, last_tick=8)
+        emitter = Emitter("emitter", sink, steps=8, target_time=mpmath.mpf("2.5"))
+        self.simulation.current_time = mpmath.mpf(0)
+        self.simulation.end_time = mpmath.mpf(0)
+        self.simulation.schedule_event(mpmath.mpf(1), sink, tick=True)
+        self.simulation.schedule_event(mpmath.mpf(0), emitter)
+        return sink, logger, emitter
+
+    def test_straggler_rollback(self):
+        sink, logger, _ = self.scheme()
+        self.simulation.run_des(100)
+        expected = logger.log
+        self.assertEqual(expected[2], (3.0, 4))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            self.simulation.enable_long_run(tmp, flush_interval=100)
+            self.simulation.set_max_workers(3)
+            sink, logger, emitter = self.scheme()
+            # The sink runs ahead of the late emitter event
+            statistics = self.simulation.run_time_warp(
+                100, partitions=[[sink], [logger], [emitter]], batch_size=4
+            )
+            self.simulation.disable_long_run()
+            records = load_results(tmp)
+
+        self.assertEqual(logger.log, expected)
+        self.assertEqual(sink.count, 9)
+        self.assertGreater(statistics["rollbacks"], 0)
+        # Logger has already processed events, which were cancelled
+        self.assertGreater(statistics["anti_messages"], 0)
+        # Speculative results of the undone events are not committed
+        self.assertEqual([(r["time"], r["value"]) for r in records], expected)
+
+    def test_unsupported_device(self):
+        device = MockDevice("detector")
+        device.supports_rollback = lambda: False
+        self.simulation.schedule_event(mpmath.mpf(0), device)
+        with self.assertRaises(RollbackNotSupportedException):
+            self.simulation.run_time_warp(1, partitions=[[device]])